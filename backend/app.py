@@ -3,15 +3,33 @@
 Hauptanwendungsdatei für die Ollama UI Backend-Anwendung.
 Definiert Flask-Routen und koordiniert die Services.
 """
+import json
 import logging
 import os
-from flask import Flask, request, jsonify, send_from_directory, abort
+from flask import Flask, Response, request, jsonify, send_from_directory, abort, stream_with_context
 from flask_cors import CORS
 import config
-from services.llm_service import query_ollama, get_available_models, query_ollama_with_reasoning
-from services.tts_service import text_to_speech, get_available_voices
-from services.memory_service import save_memory, get_memories
-from services.file_service import parse_uploaded_files, format_files_for_llm
+from services.llm_service import query_ollama, get_available_models, query_ollama_with_reasoning, stream_ollama_with_reasoning, eval_stats
+from services.tts_service import text_to_speech, get_available_voices, is_temp_audio_file
+from services.tts_jobs import (
+    StreamTTSFeeder, create_tts_job, submit_tts_job, get_tts_job, iter_job_audio,
+    DONE as TTS_JOB_DONE, ERROR as TTS_JOB_ERROR
+)
+from services.tts_cache import get_tts_cache
+from services.local_tts import local_engine_stats, preload_local_engine
+from services.file_ingest import get_parse_pool
+from services.upload_store import UPLOAD_CHUNK_SIZE, UploadError, get_upload_store
+from services.parse_cache import get_parse_cache
+from services.document_index import document_index_stats
+from services.token_budget import prompt_budget_stats
+from services.model_service import get_resident_models, model_stats, start_model_warmer
+from services.ollama_router import get_router
+from services.llm_scheduler import AdmissionError, get_scheduler, scheduled_events
+from services.response_cache import get_response_cache
+from services.memory_service import save_memory, get_memories, memory_cache_stats
+from services.memory_retrieval import find_memories
+from services.chat_service import prepare_chat_request, answer_memory_command, open_chat_session, record_chat_turn
+from services.session_service import get_session_store
 
 ## Logging konfigurieren
 logging.basicConfig(
@@ -36,6 +54,15 @@ def get_models():
         logger.error(f"Fehler beim Abrufen der Modelle: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/models/resident', methods=['GET'])
+def get_loaded_models():
+    """Aktuell von Ollama geladene Modelle abrufen."""
+    try:
+        return jsonify({"models": get_resident_models()})
+    except Exception as e:
+        logger.error(f"Fehler beim Abrufen der geladenen Modelle: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/voices', methods=['GET'])
 def get_voices():
     """Verfügbare TTS-Stimmen abrufen."""
@@ -46,6 +73,76 @@ def get_voices():
         logger.error(f"Fehler beim Abrufen der Stimmen: {e}")
         return jsonify({"error": str(e)}), 500
 
+def _tts_options(data):
+    """Stimme, Geschwindigkeit und Tonhöhe aus der Anfrage lesen."""
+    return (
+        data.get('voice', config.DEFAULT_TTS_VOICE),
+        data.get('rate', config.DEFAULT_TTS_RATE),
+        data.get('pitch', config.DEFAULT_TTS_PITCH)
+    )
+
+def _wants_tts_job(data):
+    """TTS als Hintergrundjob statt synchron vor der Antwort?"""
+    return data.get('enable_tts', True) and data.get('tts_async', config.TTS_ASYNC)
+
+def _synthesize_answer(data, reasoning_response):
+    """TTS für die finale Antwort erzeugen, wenn gewünscht."""
+    if not data.get('enable_tts', True):
+        return None
+    
+    voice, rate, pitch = _tts_options(data)
+    
+    # Nur die finale Antwort für TTS verwenden
+    audio_file = text_to_speech(reasoning_response['answer'], voice, rate, pitch, engine=data.get('tts_engine'))
+    
+    if reasoning_response['has_reasoning']:
+        logger.info("Reasoning-LLM Response - TTS nur für Final Answer")
+    
+    return audio_file
+
+def _command_events(command_response):
+    """Direkte Antwort auf einen Memory-Befehl als Stream-Events."""
+    yield {"type": "answer", "content": command_response['answer']}
+    yield {"type": "done", **command_response}
+
+def _stream_chat(data, events, session, history_message=None, prompt_budget=None):
+    """
+    Chat-Antwort als NDJSON-Stream erzeugen.
+    
+    Jede Zeile ist ein JSON-Objekt: Token-Events während der Generierung,
+    am Ende ein "done"-Event mit Reasoning/Answer-Trennung, Audiodatei und
+    Sitzungs-ID (die Runde wird im Sitzungsverlauf abgelegt).
+    Mit "tts_async" wird vorab ein "tts_job"-Event gesendet und die Antwort
+    bereits während des Streams Satz für Satz synthetisiert.
+    """
+    feeder = None
+    try:
+        if _wants_tts_job(data):
+            feeder = StreamTTSFeeder(create_tts_job(*_tts_options(data)))
+            yield json.dumps({"type": "tts_job", **feeder.job.to_dict()}, ensure_ascii=False) + "\n"
+        
+        for event in events:
+            if feeder:
+                feeder.on_event(event)
+            if event['type'] == 'done':
+                if history_message is not None:
+                    record_chat_turn(session, history_message, event)
+                event['session_id'] = session.session_id
+                event['prompt_budget'] = prompt_budget
+                if feeder:
+                    event['audio_file'] = None
+                    event['tts_job'] = feeder.job.to_dict()
+                else:
+                    event['audio_file'] = _synthesize_answer(data, event)
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    except Exception as e:
+        logger.error(f"Fehler beim Chat-Streaming: {e}")
+        yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+    finally:
+        # Auch bei Verbindungsabbruch abschließen, sonst bleibt der Job ewig offen
+        if feeder:
+            feeder.job.finish()
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Chat-Anfrage verarbeiten."""
@@ -53,83 +150,113 @@ def chat():
         data = request.json
         if not data:
             return jsonify({"error": "Keine Daten erhalten"}), 400
-            
-        model = data.get('model', config.DEFAULT_MODEL)
-        message = data.get('message', '')
-        system_prompt = data.get('system_prompt', '')
-        temperature = float(data.get('temperature', config.DEFAULT_TEMPERATURE))
-        context = data.get('context', [])
-        images = data.get('images', [])
-        files = data.get('files', [])
         
-        # Memory-Kontext laden und intelligent verarbeiten
-        from services.memory_service import get_memories
-        try:
-            memories = get_memories()
-            if memories:
-                # Nur die letzten 5 Erinnerungen verwenden
-                recent_memories = memories[-5:]
-                
-                # Memory-Kontext für natürliche Integration vorbereiten
-                memory_texts = []
-                for mem in recent_memories:
-                    timestamp = mem.get('timestamp', '')[:10]
-                    text = mem.get('text', '').strip('"')  # Anführungszeichen entfernen
-                    memory_texts.append(f"• {text}")
-                
-                memory_context = "\n".join(memory_texts)
-                
-                system_prompt += f"""
-
-=== BACKGROUND KNOWLEDGE (Du weißt folgendes) ===
-{memory_context}
-
-ANWEISUNG: Diese Informationen sind Teil deines Wissens. Verwende sie natürlich in Gesprächen, aber zitiere sie nicht wörtlich. Integriere sie wie eigene Erinnerungen und antworte in deinen eigenen Worten.
-"""
-                logger.info(f"Memory-Kontext hinzugefügt: {len(recent_memories)} Erinnerungen")
-        except Exception as memory_error:
-            logger.warning(f"Fehler beim Laden der Erinnerungen: {memory_error}")
+        session = open_chat_session(data)
+        
+        # Memory-Befehle ("merke dir …", "/recall") ohne LLM beantworten
+        command_response = answer_memory_command(data.get('message', ''))
+        chat_request = None
+        history_message = None
+        prompt_budget = None
+        if command_response is None:
+            # Bei voller Warteschlange sofort ablehnen (429), noch vor der Aufbereitung
+            get_scheduler().check_admission(data.get('model', config.DEFAULT_MODEL))
+            chat_request = prepare_chat_request(data, session)
+            prompt_budget = chat_request.pop('prompt_budget')
+            history_message = chat_request.pop('history_message')
         
-        # Dateien verarbeiten falls vorhanden
-        if files:
-            try:
-                processed_files = parse_uploaded_files(files)
-                if processed_files:
-                    file_content = format_files_for_llm(processed_files)
-                    # Datei-Inhalt an die Nachricht anhängen
-                    message = f"{message}\n\n{file_content}"
-                    logger.info(f"Dateien hinzugefügt: {len(processed_files)} Dateien verarbeitet")
-            except Exception as file_error:
-                logger.warning(f"Fehler beim Verarbeiten der Dateien: {file_error}")
+        # ⭐ Streaming-Modus: Tokens sofort weiterleiten (NDJSON)
+        if data.get('stream', False):
+            if command_response is not None:
+                events = _command_events(command_response)
+            else:
+                # Während des Wartens "queued"-Events mit der Position senden
+                events = scheduled_events(get_scheduler(), chat_request['model_name'], data.get('priority'),
+                                          lambda: stream_ollama_with_reasoning(**chat_request))
+            return Response(
+                stream_with_context(_stream_chat(data, events, session, history_message, prompt_budget)),
+                mimetype='application/x-ndjson',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
 
         # ⭐ Reasoning-LLM Support
-        reasoning_response = query_ollama_with_reasoning(model, message, system_prompt, temperature, context, images)
+        if command_response is not None:
+            reasoning_response = command_response
+        else:
+            with get_scheduler().slot(chat_request['model_name'], data.get('priority')) as ticket:
+                reasoning_response = query_ollama_with_reasoning(**chat_request)
+            reasoning_response['queue_wait_ms'] = round(ticket.wait_ms, 1)
+            reasoning_response['prompt_budget'] = prompt_budget
+            record_chat_turn(session, history_message, reasoning_response)
         
         # TTS aktivieren, wenn gewünscht (nur für Final Answer)
         audio_file = None
-        if data.get('enable_tts', True):
-            voice = data.get('voice', config.DEFAULT_TTS_VOICE)
-            rate = data.get('rate', config.DEFAULT_TTS_RATE)
-            pitch = data.get('pitch', config.DEFAULT_TTS_PITCH)
-            
-            # Nur die finale Antwort für TTS verwenden
-            tts_text = reasoning_response['answer']
-            audio_file = text_to_speech(tts_text, voice, rate, pitch)
-            
-            if reasoning_response['has_reasoning']:
-                logger.info("Reasoning-LLM Response - TTS nur für Final Answer")
+        tts_job = None
+        if _wants_tts_job(data):
+            # ⭐ Im Hintergrund synthetisieren, Antwort sofort zurückgeben
+            tts_job = submit_tts_job(reasoning_response['answer'], *_tts_options(data)).to_dict()
+        else:
+            audio_file = _synthesize_answer(data, reasoning_response)
 
         return jsonify({
             "response": reasoning_response['answer'],
             "reasoning": reasoning_response['reasoning'],
             "has_reasoning": reasoning_response['has_reasoning'],
-            "audio_file": audio_file
+            "audio_file": audio_file,
+            "tts_job": tts_job,
+            "memory_action": reasoning_response.get('memory_action'),
+            "session_id": session.session_id,
+            "metrics": reasoning_response.get('metrics'),
+            "queue_wait_ms": reasoning_response.get('queue_wait_ms'),
+            "cached": reasoning_response.get('cached', False),
+            "error": reasoning_response.get('error', False),
+            "prompt_budget": reasoning_response.get('prompt_budget')
         })
         
+    except AdmissionError as e:
+        logger.warning(f"Chat-Anfrage abgewiesen ({e.status}): {e}")
+        return jsonify({"error": str(e)}), e.status, {"Retry-After": str(e.retry_after)}
     except Exception as e:
         logger.error(f"Fehler bei der Chat-Verarbeitung: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    """Sitzung mit Verlauf und Dokument-Index verwerfen (Chat leeren)."""
+    return jsonify({"deleted": get_session_store().drop(session_id)})
+
+@app.route('/api/upload', methods=['POST'])
+def upload_files():
+    """
+    Dateien hochladen, ohne sie vollständig in den Speicher zu laden.
+    
+    multipart/form-data mit einem oder mehreren Feldern "file", oder die Datei
+    direkt als Body (Name über ?name=). Liefert je Datei eine "file_id", die
+    /api/chat unter "file_ids" annimmt.
+    """
+    try:
+        store = get_upload_store()
+        store.check_length(request.content_length)
+        
+        if request.mimetype == 'multipart/form-data':
+            uploads = request.files.getlist('file')
+            if not uploads:
+                return jsonify({"error": "Keine Datei im Feld 'file'"}), 400
+            saved = [
+                store.save(upload.filename, upload.mimetype,
+                           iter(lambda upload=upload: upload.stream.read(UPLOAD_CHUNK_SIZE), b''))
+                for upload in uploads
+            ]
+        else:
+            saved = [store.save(request.args.get('name'), request.mimetype,
+                                iter(lambda: request.stream.read(UPLOAD_CHUNK_SIZE), b''))]
+        return jsonify({"files": saved})
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        logger.error(f"Fehler beim Hochladen: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/memory', methods=['POST'])
 def add_memory():
     """Neue Erinnerung speichern."""
@@ -148,18 +275,97 @@ def add_memory():
 
 @app.route('/api/memories', methods=['GET'])
 def retrieve_memories():
-    """Gespeicherte Erinnerungen abrufen."""
+    """Gespeicherte Erinnerungen abrufen (mit ?q= durchsuchen, ?offset=&limit= blättern)."""
     try:
+        search_term = request.args.get('q', '').strip()
+        if search_term:
+            offset = request.args.get('offset', 0, type=int)
+            limit = request.args.get('limit', 20, type=int)
+            memories, total = find_memories(search_term, offset, limit)
+            return jsonify({"memories": memories, "total": total, "offset": offset, "limit": limit})
+        
         memories = get_memories()
         return jsonify({"memories": memories})
     except Exception as e:
         logger.error(f"Fehler beim Abrufen der Erinnerungen: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/tts', methods=['POST'])
+def create_tts():
+    """Text satzweise als TTS-Job synthetisieren (Audio über stream_url abspielbar)."""
+    try:
+        data = request.json or {}
+        text = data.get('text', '')
+        
+        if not text:
+            return jsonify({"error": "Kein Text angegeben"}), 400
+        
+        job = submit_tts_job(text, *_tts_options(data))
+        return jsonify(job.to_dict())
+    except Exception as e:
+        logger.error(f"Fehler beim Erstellen des TTS-Jobs: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/tts/<job_id>', methods=['GET'])
+def tts_job_status(job_id):
+    """Status eines TTS-Hintergrundjobs abrufen."""
+    job = get_tts_job(job_id)
+    if not job:
+        return jsonify({"error": "Unbekannter TTS-Job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/tts/<job_id>/audio', methods=['GET'])
+def tts_job_audio(job_id):
+    """Fertige Audiodatei eines TTS-Jobs bereitstellen (202 solange in Arbeit)."""
+    job = get_tts_job(job_id)
+    if not job:
+        return jsonify({"error": "Unbekannter TTS-Job"}), 404
+    if job.status == TTS_JOB_ERROR:
+        return jsonify(job.to_dict()), 500
+    if job.status != TTS_JOB_DONE:
+        return jsonify(job.to_dict()), 202
+    return send_from_directory(config.AUDIO_OUTPUT_DIR, job.audio_file, mimetype='audio/mpeg')
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Laufzeit-Kennzahlen (Caches) abrufen."""
+    return jsonify({
+        "tts_cache": get_tts_cache().stats(),
+        "local_tts": local_engine_stats(),
+        "memory_cache": memory_cache_stats(),
+        "sessions": get_session_store().stats(),
+        "llm": eval_stats(),
+        "models": model_stats(),
+        "ollama": get_router().stats(),
+        "scheduler": get_scheduler().stats(),
+        "response_cache": get_response_cache().stats(),
+        "file_parsing": get_parse_pool().stats(),
+        "uploads": get_upload_store().stats(),
+        "parse_cache": get_parse_cache().stats(),
+        "documents": document_index_stats(),
+        "prompt_budget": prompt_budget_stats()
+    })
+
+# Audio eines TTS-Jobs streamen, sobald das erste Segment fertig ist
+@app.route('/assets/audio/stream/<job_id>')
+def stream_audio(job_id):
+    """TTS-Segmente in Lesereihenfolge als fortlaufenden MP3-Stream ausliefern."""
+    job = get_tts_job(job_id)
+    if not job:
+        abort(404)
+    return Response(
+        stream_with_context(iter_job_audio(job)),
+        mimetype='audio/mpeg',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # Audiodateien bereitstellen
 @app.route('/assets/audio/<path:filename>')
 def serve_audio(filename):
     """Audiodateien bereitstellen."""
+    # Halb geschriebene Dateien nie ausliefern
+    if is_temp_audio_file(filename):
+        abort(404)
     try:
         return send_from_directory(config.AUDIO_OUTPUT_DIR, filename)
     except Exception as e:
@@ -179,4 +385,9 @@ def serve_static_files(path):
     return send_from_directory('../frontend', path)
 
 if __name__ == "__main__":
+    # Lokales TTS-Modell vor der ersten Anfrage laden (falls als Engine konfiguriert)
+    preload_local_engine()
+    # Ollama-Knoten überwachen und konfigurierte Modelle im Hintergrund vorladen
+    get_router().start_health_checks(config.OLLAMA_HEALTH_INTERVAL)
+    start_model_warmer()
     app.run(host='127.0.0.1', port=5000)
\ No newline at end of file
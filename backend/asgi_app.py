@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+Asynchroner ASGI-Server für die Ollama UI Backend-Anwendung.
+Stellt dieselben Routen wie app.py bereit, hält aber keinen Thread pro Anfrage:
+Ollama-Aufrufe (aiohttp) und Edge-TTS laufen auf einer persistenten Event-Loop.
+
+Start:
+    uvicorn asgi_app:app --host 127.0.0.1 --port 5001
+"""
+import json
+import logging
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+import config
+from services.llm_service import (
+    get_available_models_async,
+    query_ollama_with_reasoning_async,
+    stream_ollama_with_reasoning_async,
+    eval_stats
+)
+from services.ollama_client import close_async_session
+from services.tts_service import text_to_speech_async, get_voices_async, is_temp_audio_file
+from services.tts_jobs import (
+    StreamTTSFeeder, create_tts_job, submit_tts_job, get_tts_job, aiter_job_audio,
+    DONE as TTS_JOB_DONE, ERROR as TTS_JOB_ERROR
+)
+from services.tts_cache import get_tts_cache
+from services.local_tts import local_engine_stats, preload_local_engine, shutdown_local_engines
+from services.file_ingest import get_parse_pool, shutdown_parse_pool
+from services.upload_store import UPLOAD_CHUNK_SIZE, UploadError, get_upload_store
+from services.parse_cache import get_parse_cache
+from services.document_index import document_index_stats
+from services.token_budget import prompt_budget_stats
+from services.model_service import get_resident_models, model_stats, start_model_warmer, stop_model_warmer
+from services.ollama_router import get_router
+from services.llm_scheduler import AdmissionError, get_scheduler, scheduled_events_async
+from services.response_cache import get_response_cache
+from services.memory_service import save_memory, get_memories, memory_cache_stats
+from services.memory_retrieval import find_memories
+from services.chat_service import prepare_chat_request, answer_memory_command, open_chat_session, record_chat_turn
+from services.session_service import get_session_store
+
+## Logging konfigurieren
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+FRONTEND_DIR = config.PROJECT_ROOT / "frontend"
+audio_files = StaticFiles(directory=config.AUDIO_OUTPUT_DIR, check_dir=False)
+
+async def get_models(request):
+    """Verfügbare Ollama-Modelle abrufen."""
+    try:
+        models = await get_available_models_async()
+        return JSONResponse({"models": models})
+    except Exception as e:
+        logger.error(f"Fehler beim Abrufen der Modelle: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def get_loaded_models(request):
+    """Aktuell von Ollama geladene Modelle abrufen."""
+    try:
+        models = await run_in_threadpool(get_resident_models)
+        return JSONResponse({"models": models})
+    except Exception as e:
+        logger.error(f"Fehler beim Abrufen der geladenen Modelle: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def get_voices(request):
+    """Verfügbare TTS-Stimmen abrufen."""
+    try:
+        voices = await get_voices_async()
+        return JSONResponse({"voices": voices})
+    except Exception as e:
+        logger.error(f"Fehler beim Abrufen der Stimmen: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+def _tts_options(data):
+    """Stimme, Geschwindigkeit und Tonhöhe aus der Anfrage lesen."""
+    return (
+        data.get('voice', config.DEFAULT_TTS_VOICE),
+        data.get('rate', config.DEFAULT_TTS_RATE),
+        data.get('pitch', config.DEFAULT_TTS_PITCH)
+    )
+
+def _wants_tts_job(data):
+    """TTS als Hintergrundjob statt synchron vor der Antwort?"""
+    return data.get('enable_tts', True) and data.get('tts_async', config.TTS_ASYNC)
+
+async def _synthesize_answer(data, reasoning_response):
+    """TTS für die finale Antwort erzeugen, wenn gewünscht."""
+    if not data.get('enable_tts', True):
+        return None
+
+    voice, rate, pitch = _tts_options(data)
+
+    # Nur die finale Antwort für TTS verwenden
+    return await text_to_speech_async(reasoning_response['answer'], voice, rate, pitch, engine=data.get('tts_engine'))
+
+async def _command_events(command_response):
+    """Direkte Antwort auf einen Memory-Befehl als Stream-Events."""
+    yield {"type": "answer", "content": command_response['answer']}
+    yield {"type": "done", **command_response}
+
+async def _stream_chat(data, events, session, history_message=None, prompt_budget=None):
+    """Chat-Antwort als NDJSON-Stream erzeugen (siehe app._stream_chat)."""
+    feeder = None
+    try:
+        if _wants_tts_job(data):
+            feeder = StreamTTSFeeder(create_tts_job(*_tts_options(data)))
+            yield json.dumps({"type": "tts_job", **feeder.job.to_dict()}, ensure_ascii=False) + "\n"
+
+        async for event in events:
+            if feeder:
+                feeder.on_event(event)
+            if event['type'] == 'done':
+                if history_message is not None:
+                    record_chat_turn(session, history_message, event)
+                event['session_id'] = session.session_id
+                event['prompt_budget'] = prompt_budget
+                if feeder:
+                    event['audio_file'] = None
+                    event['tts_job'] = feeder.job.to_dict()
+                else:
+                    event['audio_file'] = await _synthesize_answer(data, event)
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    except Exception as e:
+        logger.error(f"Fehler beim Chat-Streaming: {e}")
+        yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+    finally:
+        # Auch bei Verbindungsabbruch abschließen, sonst bleibt der Job ewig offen
+        if feeder:
+            feeder.job.finish()
+
+async def chat(request):
+    """Chat-Anfrage verarbeiten."""
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        if not data:
+            return JSONResponse({"error": "Keine Daten erhalten"}, status_code=400)
+
+        session = open_chat_session(data)
+
+        # Memory-Befehle ("merke dir …", "/recall") ohne LLM beantworten
+        command_response = await run_in_threadpool(answer_memory_command, data.get('message', ''))
+        chat_request = None
+        history_message = None
+        prompt_budget = None
+        if command_response is None:
+            # Bei voller Warteschlange sofort ablehnen (429), noch vor der Aufbereitung
+            get_scheduler().check_admission(data.get('model', config.DEFAULT_MODEL))
+            # Memory- und Datei-Verarbeitung sind blockierendes I/O bzw. CPU-Arbeit
+            chat_request = await run_in_threadpool(prepare_chat_request, data, session)
+            prompt_budget = chat_request.pop('prompt_budget')
+            history_message = chat_request.pop('history_message')
+
+        if data.get('stream', False):
+            if command_response is not None:
+                events = _command_events(command_response)
+            else:
+                # Während des Wartens "queued"-Events mit der Position senden
+                events = scheduled_events_async(get_scheduler(), chat_request['model_name'], data.get('priority'),
+                                                lambda: stream_ollama_with_reasoning_async(**chat_request))
+            return StreamingResponse(
+                _stream_chat(data, events, session, history_message, prompt_budget),
+                media_type='application/x-ndjson',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        if command_response is not None:
+            reasoning_response = command_response
+        else:
+            async with get_scheduler().slot_async(chat_request['model_name'], data.get('priority')) as ticket:
+                reasoning_response = await query_ollama_with_reasoning_async(**chat_request)
+            reasoning_response['queue_wait_ms'] = round(ticket.wait_ms, 1)
+            reasoning_response['prompt_budget'] = prompt_budget
+            record_chat_turn(session, history_message, reasoning_response)
+
+        audio_file = None
+        tts_job = None
+        if _wants_tts_job(data):
+            tts_job = submit_tts_job(reasoning_response['answer'], *_tts_options(data)).to_dict()
+        else:
+            audio_file = await _synthesize_answer(data, reasoning_response)
+
+        return JSONResponse({
+            "response": reasoning_response['answer'],
+            "reasoning": reasoning_response['reasoning'],
+            "has_reasoning": reasoning_response['has_reasoning'],
+            "audio_file": audio_file,
+            "tts_job": tts_job,
+            "memory_action": reasoning_response.get('memory_action'),
+            "session_id": session.session_id,
+            "metrics": reasoning_response.get('metrics'),
+            "queue_wait_ms": reasoning_response.get('queue_wait_ms'),
+            "cached": reasoning_response.get('cached', False),
+            "error": reasoning_response.get('error', False),
+            "prompt_budget": reasoning_response.get('prompt_budget')
+        })
+
+    except AdmissionError as e:
+        logger.warning(f"Chat-Anfrage abgewiesen ({e.status}): {e}")
+        return JSONResponse({"error": str(e)}, status_code=e.status, headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        logger.error(f"Fehler bei der Chat-Verarbeitung: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def upload_files(request):
+    """Dateien hochladen (multipart "file" oder roher Body mit ?name=), blockweise auf die Festplatte."""
+    try:
+        store = get_upload_store()
+        store.check_length(request.headers.get('content-length'))
+        content_type = request.headers.get('content-type', '').split(';')[0].strip()
+        saved = []
+
+        if content_type == 'multipart/form-data':
+            # Starlette legt Datei-Felder ab 1 MB in temporären Dateien ab
+            async with request.form() as form:
+                uploads = [upload for upload in form.getlist('file') if not isinstance(upload, str)]
+                if not uploads:
+                    return JSONResponse({"error": "Keine Datei im Feld 'file'"}, status_code=400)
+                for upload in uploads:
+                    with store.begin(upload.filename, upload.content_type) as writer:
+                        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                            await run_in_threadpool(writer.write, chunk)
+                        saved.append(await run_in_threadpool(writer.commit))
+        else:
+            with store.begin(request.query_params.get('name'), content_type or None) as writer:
+                async for chunk in request.stream():
+                    await run_in_threadpool(writer.write, chunk)
+                saved.append(await run_in_threadpool(writer.commit))
+        return JSONResponse({"files": saved})
+    except UploadError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status)
+    except Exception as e:
+        logger.error(f"Fehler beim Hochladen: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def add_memory(request):
+    """Neue Erinnerung speichern."""
+    try:
+        data = await request.json()
+        memory_text = data.get('text', '')
+
+        if not memory_text:
+            return JSONResponse({"error": "Keine Erinnerung angegeben"}, status_code=400)
+
+        await run_in_threadpool(save_memory, memory_text)
+        return JSONResponse({"success": True})
+    except Exception as e:
+        logger.error(f"Fehler beim Speichern der Erinnerung: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def retrieve_memories(request):
+    """Gespeicherte Erinnerungen abrufen (mit ?q= durchsuchen, ?offset=&limit= blättern)."""
+    try:
+        search_term = request.query_params.get('q', '').strip()
+        if search_term:
+            try:
+                offset = int(request.query_params.get('offset', 0))
+                limit = int(request.query_params.get('limit', 20))
+            except ValueError:
+                return JSONResponse({"error": "offset und limit müssen Zahlen sein"}, status_code=400)
+            memories, total = await run_in_threadpool(find_memories, search_term, offset, limit)
+            return JSONResponse({"memories": memories, "total": total, "offset": offset, "limit": limit})
+
+        memories = await run_in_threadpool(get_memories)
+        return JSONResponse({"memories": memories})
+    except Exception as e:
+        logger.error(f"Fehler beim Abrufen der Erinnerungen: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def create_tts(request):
+    """Text satzweise als TTS-Job synthetisieren (Audio über stream_url abspielbar)."""
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        text = (data or {}).get('text', '')
+
+        if not text:
+            return JSONResponse({"error": "Kein Text angegeben"}, status_code=400)
+
+        job = submit_tts_job(text, *_tts_options(data))
+        return JSONResponse(job.to_dict())
+    except Exception as e:
+        logger.error(f"Fehler beim Erstellen des TTS-Jobs: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+async def delete_session(request):
+    """Sitzung mit Verlauf und Dokument-Index verwerfen (Chat leeren)."""
+    return JSONResponse({"deleted": get_session_store().drop(request.path_params['session_id'])})
+
+async def tts_job_status(request):
+    """Status eines TTS-Hintergrundjobs abrufen."""
+    job = get_tts_job(request.path_params['job_id'])
+    if not job:
+        return JSONResponse({"error": "Unbekannter TTS-Job"}, status_code=404)
+    return JSONResponse(job.to_dict())
+
+async def tts_job_audio(request):
+    """Fertige Audiodatei eines TTS-Jobs bereitstellen (202 solange in Arbeit)."""
+    job = get_tts_job(request.path_params['job_id'])
+    if not job:
+        return JSONResponse({"error": "Unbekannter TTS-Job"}, status_code=404)
+    if job.status == TTS_JOB_ERROR:
+        return JSONResponse(job.to_dict(), status_code=500)
+    if job.status != TTS_JOB_DONE:
+        return JSONResponse(job.to_dict(), status_code=202)
+    return FileResponse(config.AUDIO_OUTPUT_DIR / job.audio_file, media_type='audio/mpeg')
+
+async def get_stats(request):
+    """Laufzeit-Kennzahlen (Caches) abrufen."""
+    return JSONResponse({
+        "tts_cache": get_tts_cache().stats(),
+        "local_tts": local_engine_stats(),
+        "memory_cache": memory_cache_stats(),
+        "sessions": get_session_store().stats(),
+        "llm": eval_stats(),
+        "models": model_stats(),
+        "ollama": get_router().stats(),
+        "scheduler": get_scheduler().stats(),
+        "response_cache": get_response_cache().stats(),
+        "file_parsing": get_parse_pool().stats(),
+        "uploads": get_upload_store().stats(),
+        "parse_cache": get_parse_cache().stats(),
+        "documents": document_index_stats(),
+        "prompt_budget": prompt_budget_stats()
+    })
+
+async def stream_audio(request):
+    """TTS-Segmente in Lesereihenfolge als fortlaufenden MP3-Stream ausliefern."""
+    job = get_tts_job(request.path_params['job_id'])
+    if not job:
+        return JSONResponse({"error": "Unbekannter TTS-Job"}, status_code=404)
+    return StreamingResponse(
+        aiter_job_audio(job),
+        media_type='audio/mpeg',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+async def serve_audio(request):
+    """Audiodateien bereitstellen (halb geschriebene Dateien nie)."""
+    filename = request.path_params['filename']
+    if is_temp_audio_file(filename):
+        return JSONResponse({"error": "Nicht gefunden"}, status_code=404)
+    return await audio_files.get_response(filename, request.scope)
+
+async def serve_index(request):
+    """Hauptseite der Anwendung."""
+    return FileResponse(FRONTEND_DIR / "index.html")
+
+@asynccontextmanager
+async def lifespan(app):
+    """Lokales TTS-Modell und Ollama-Modelle vorladen; beim Herunterfahren Verbindungen und Worker (TTS, Dateien) schließen."""
+    await run_in_threadpool(preload_local_engine)
+    get_router().start_health_checks(config.OLLAMA_HEALTH_INTERVAL)
+    start_model_warmer()
+    yield
+    stop_model_warmer()
+    get_router().stop_health_checks()
+    await close_async_session()
+    shutdown_local_engines()
+    shutdown_parse_pool()
+
+app = Starlette(
+    routes=[
+        Route('/api/models', get_models, methods=['GET']),
+        Route('/api/models/resident', get_loaded_models, methods=['GET']),
+        Route('/api/voices', get_voices, methods=['GET']),
+        Route('/api/chat', chat, methods=['POST']),
+        Route('/api/sessions/{session_id}', delete_session, methods=['DELETE']),
+        Route('/api/upload', upload_files, methods=['POST']),
+        Route('/api/memory', add_memory, methods=['POST']),
+        Route('/api/memories', retrieve_memories, methods=['GET']),
+        Route('/api/tts', create_tts, methods=['POST']),
+        Route('/api/tts/{job_id}', tts_job_status, methods=['GET']),
+        Route('/api/tts/{job_id}/audio', tts_job_audio, methods=['GET']),
+        Route('/api/stats', get_stats, methods=['GET']),
+        Route('/assets/audio/stream/{job_id}', stream_audio, methods=['GET']),
+        # Audiodateien bereitstellen
+        Route('/assets/audio/{filename:path}', serve_audio, methods=['GET', 'HEAD']),
+        Route('/', serve_index),
+        # Andere statische Dateien bereitstellen
+        Mount('/', app=StaticFiles(directory=FRONTEND_DIR)),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=config.HOST, port=config.ASGI_PORT)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Parsen hochgeladener Dateien im Request-Thread vs. in Worker-Prozessen.
+
+Erzeugt PDFs (mehrere Seiten Text), eine Excel-Datei und ein Word-Dokument
+und parst sie einmal nacheinander im aufrufenden Thread (wie bisher) und
+einmal parallel im Datei-Pool. Gemessen werden Gesamtdauer und die
+CPU-Zeit des aufrufenden Prozesses (die bei Workern frei bleibt). Zum
+Schluss dieselben Dateien zweimal über parse_uploaded_files: beim zweiten
+Mal kommt der Text aus dem Parse-Cache.
+
+Aufruf:
+    python benchmark_file_ingest.py --pdfs 4 --pages 200 --workers 4
+"""
+import argparse
+import base64
+import io
+import os
+import tempfile
+import time
+
+import config
+from services.file_ingest import FileParsePool
+from services.file_service import parse_file_content, parse_uploaded_files
+
+def make_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    """Minimales PDF mit Text auf jeder Seite (ohne zusätzliche Bibliothek)."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in range(pages):
+        lines = " ".join(f"(Seite {page + 1}, Zeile {line + 1}: Lorem ipsum dolor sit amet, consectetur.) Tj T*"
+                         for line in range(lines_per_page))
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {lines} ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+def make_xlsx(rows: int) -> bytes:
+    import openpyxl
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for row in range(rows):
+        sheet.append([row, f"Artikel {row}", row * 1.5, "Lager A"])
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+def make_docx(paragraphs: int) -> bytes:
+    from docx import Document
+    document = Document()
+    for paragraph in range(paragraphs):
+        document.add_paragraph(f"Absatz {paragraph + 1}: Lorem ipsum dolor sit amet, consectetur adipiscing elit.")
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+def run(label, pool, jobs):
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    results = pool.run(parse_file_content, jobs)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    chars = sum(len(result or "") for result, _ in results)
+    errors = sum(1 for _, error in results if error)
+    print(f"{label:<22} {elapsed * 1000:>10.0f} {cpu * 1000:>14.0f} {chars:>10} {errors:>7}")
+
+def run_upload(label, files):
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    results = parse_uploaded_files(files)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    chars = sum(len(result["content"]) for result in results)
+    print(f"{label:<22} {elapsed * 1000:>10.0f} {cpu * 1000:>14.0f} {chars:>10} {len(files) - len(results):>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", type=int, default=4, help="Anzahl PDF-Dateien")
+    parser.add_argument("--pages", type=int, default=200, help="Seiten je PDF")
+    parser.add_argument("--rows", type=int, default=20000, help="Zeilen der Excel-Datei")
+    parser.add_argument("--paragraphs", type=int, default=2000, help="Absätze des Word-Dokuments")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker-Prozesse")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Zeitgrenze je Datei (Sekunden)")
+    args = parser.parse_args()
+
+    jobs = [(make_pdf(args.pages), f"bericht{i}.pdf", ".pdf") for i in range(args.pdfs)]
+    jobs.append((make_xlsx(args.rows), "tabelle.xlsx", ".xlsx"))
+    jobs.append((make_docx(args.paragraphs), "dokument.docx", ".docx"))
+    total_mb = sum(len(content) for content, _, _ in jobs) / (1024 * 1024)
+    print(f"{len(jobs)} Dateien, {total_mb:.1f} MB, {args.workers} Worker\n")
+    print(f"{'Modus':<22} {'Dauer (ms)':>10} {'CPU Server (ms)':>14} {'Zeichen':>10} {'Fehler':>7}")
+    print("-" * 68)
+
+    run("Request-Thread", FileParsePool(0, args.timeout, 0), jobs)
+    pool = FileParsePool(args.workers, args.timeout, 1024)
+    # Erster Lauf startet die Prozesse, der zweite zeigt den Dauerbetrieb
+    run("Worker (Start)", pool, jobs)
+    run("Worker (warm)", pool, jobs)
+    pool.shutdown()
+
+    # parse_uploaded_files mit eigenem (leerem) Cache-Verzeichnis
+    config.FILE_PARSE_WORKERS = args.workers
+    config.PARSE_CACHE_DIR = tempfile.mkdtemp(prefix="parse_cache_")
+    files = [{"name": name, "type": "", "data": base64.b64encode(content).decode()} for content, name, _ in jobs]
+    run_upload("Parse-Cache (kalt)", files)
+    run_upload("Parse-Cache (Treffer)", files)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Dokument-Abschnitte nach Relevanz gegenüber "die ersten 5000 Zeichen".
+
+Erzeugt ein langes Dokument im Format des PDF-Parsers (Seitenmarken,
+Füllabsätze) mit eingestreuten Fakten und stellt zu jedem Fakt eine Frage.
+Gemessen werden, ob der Fakt im Prompt landet (Recall), die geschätzten
+Prompt-Tokens für den Datei-Block und die Dauer von Indizierung und Auswahl.
+
+Aufruf:
+    python benchmark_file_retrieval.py --pages 300 --queries 200
+    python benchmark_file_retrieval.py --pages 300 --hash-embeddings
+"""
+import argparse
+import random
+import time
+
+from services.document_index import DocumentIndex
+from services.search_index import HashingEmbedder
+from services.token_budget import CHARS_PER_TOKEN, estimate_tokens
+
+WORDS = ["Umsatz", "Quartal", "Projekt", "Vertrag", "Lieferung", "Kunde", "Bericht", "Planung", "Budget",
+         "Termin", "Abteilung", "Ergebnis", "Prüfung", "Anlage", "Verfahren", "Zeitraum", "Standort"]
+PRODUCTS = ["Kolibri", "Merkur", "Polaris", "Saturn", "Orion", "Vega", "Atlas", "Lyra", "Nova", "Titan"]
+
+def _sentence(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+
+def build_document(pages, query_count, seed=42):
+    """Seiten mit Füllabsätzen erzeugen und Fakten auf zufällige Seiten verteilen."""
+    rng = random.Random(seed)
+    page_texts = [["\n".join(_sentence(rng) for _ in range(4)) for _ in range(5)] for _ in range(pages)]
+    queries = []
+    for number in range(query_count):
+        product = f"{rng.choice(PRODUCTS)}-{number}"
+        value = rng.randint(100, 99999)
+        page = rng.randrange(pages)
+        fact = f"Die Seriennummer von {product} lautet SN{value}."
+        page_texts[page].insert(rng.randrange(len(page_texts[page]) + 1), fact)
+        queries.append((f"Wie lautet die Seriennummer von {product}?", f"SN{value}"))
+    text = "\n\n".join(f"--- Page {page + 1} ---\n" + "\n\n".join(paragraphs)
+                       for page, paragraphs in enumerate(page_texts))
+    return text, queries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300, help="Seiten des Dokuments")
+    parser.add_argument("--queries", type=int, default=200, help="Anzahl Fragen (je ein Fakt)")
+    parser.add_argument("--budget", type=int, default=2000, help="Token-Budget des Datei-Blocks")
+    parser.add_argument("--chunk-tokens", type=int, default=200, help="Höchstlänge eines Abschnitts")
+    parser.add_argument("--hash-embeddings", action="store_true", help="zusätzlich lokale Hashing-Embeddings")
+    args = parser.parse_args()
+
+    text, queries = build_document(args.pages, args.queries)
+    file_data = {"name": "bericht.pdf", "extension": ".pdf", "size": len(text), "content": text}
+    print(f"Dokument: {args.pages} Seiten, {len(text)} Zeichen (~{estimate_tokens(text)} Tokens), "
+          f"{len(queries)} Fragen\n")
+
+    # Bisher: die ersten 5000 Zeichen jeder Datei
+    truncated = text[:5000]
+    baseline_recall = sum(1 for _, answer in queries if answer in truncated) / len(queries)
+
+    embedder = HashingEmbedder() if args.hash_embeddings else None
+    index = DocumentIndex(args.chunk_tokens * CHARS_PER_TOKEN, len(text) * 2, embedder)
+    start = time.perf_counter()
+    key = index.add(file_data)
+    index_ms = (time.perf_counter() - start) * 1000
+
+    found = 0
+    tokens = 0
+    latencies = []
+    for number, (question, answer) in enumerate(queries):
+        start = time.perf_counter()
+        # Erste Frage mit frisch angehängtem Dokument, danach Folgefragen der Sitzung
+        selection = index.select(question, [key] if number == 0 else [], args.budget)
+        block = index.format(selection)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += answer in block
+        tokens += estimate_tokens(block)
+    latencies.sort()
+
+    print(f"{'Modus':<28} {'Recall':>8} {'Tokens/Frage':>13} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    print("-" * 71)
+    print(f"{'Erste 5000 Zeichen':<28} {baseline_recall:>8.1%} {estimate_tokens(truncated):>13} {'-':>9} {'-':>9}")
+    print(f"{'Abschnitte nach Relevanz':<28} {found / len(queries):>8.1%} {tokens // len(queries):>13} "
+          f"{latencies[len(latencies) // 2]:>9.2f} {latencies[int(len(latencies) * 0.95)]:>9.2f}")
+    print(f"\nIndizierung: {index_ms:.0f} ms")
+
+if __name__ == "__main__":
+    main()
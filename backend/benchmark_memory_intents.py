@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-Benchmark: Erkennung von Memory-Befehlen pro Chat-Nachricht.
+
+Vergleicht die bisherige Erkennung (Nachricht kleinschreiben, bis zu 16
+unkompilierte Muster nacheinander mit re.search prüfen) mit dem einen
+vorkompilierten Ausdruck des MemoryManagers.
+
+Aufruf:
+    python benchmark_memory_intents.py
+    python benchmark_memory_intents.py --messages 20000 --long-ratio 0.2
+"""
+import argparse
+import random
+import re
+import time
+
+from services.memory_manager import MemoryManager
+
+# Muster der bisherigen Implementierung (Speichern, dann Abrufen)
+LEGACY_SAVE_PATTERNS = [
+    r'(?:merke?\s+dir|erinner[e]?\s+dich|behalte?|speicher[e]?)\s+(.+)',
+    r'(?:vergiss\s+nicht|notier[e]?)\s+(.+)',
+    r'(?:das\s+ist\s+wichtig|wichtig\s+zu\s+wissen)[:\s]*(.+)',
+    r'(?:remember|recall|keep\s+in\s+mind|note\s+that|save\s+this)\s+(.+)',
+    r'(?:don\'t\s+forget|make\s+sure\s+to\s+remember)\s+(.+)',
+    r'(?:this\s+is\s+important|important\s+to\s+know)[:\s]*(.+)',
+    r'/remember\s+(.+)',
+    r'/merken\s+(.+)',
+    r'/save\s+(.+)'
+]
+LEGACY_RECALL_PATTERNS = [
+    r'(?:was\s+)?(?:weißt\s+du\s+noch|erinnerst\s+du\s+dich)\s*(?:an\s+)?(.+)?',
+    r'(?:was\s+hast\s+du\s+dir\s+)?(?:gemerkt|gespeichert)\s*(?:über\s+)?(.+)?',
+    r'(?:what\s+do\s+you\s+)?(?:remember|recall)\s*(?:about\s+)?(.+)?',
+    r'(?:what\s+did\s+you\s+)?(?:save|store|note)\s*(?:about\s+)?(.+)?',
+    r'/recall(?:\s+(.+))?',
+    r'/memory(?:\s+(.+))?',
+    r'/memories'
+]
+
+COMMANDS = [
+    "Merke dir, dass mein Hund Bello heißt",
+    "/remember Der Server läuft auf Port 8080",
+    "/recall Bello",
+    "/memories",
+    "Remember: I prefer dark mode",
+]
+QUESTIONS = [
+    "Wie spät ist es in Tokio?",
+    "Kannst du mir eine Funktion in Python schreiben, die Primzahlen findet?",
+    "Erkläre mir bitte den Unterschied zwischen TCP und UDP.",
+    "What is the capital of Australia?",
+    "Fasse den folgenden Text in drei Sätzen zusammen.",
+    "Wie speichere ich eine Datei mit pandas als CSV?",
+]
+
+def legacy_detect(message):
+    """Bisherige Erkennung (should_save_memory, dann should_recall_memory)."""
+    message_lower = message.lower().strip()
+    for pattern in LEGACY_SAVE_PATTERNS:
+        if re.search(pattern, message_lower, re.IGNORECASE):
+            return "save"
+    for pattern in LEGACY_RECALL_PATTERNS:
+        if re.search(pattern, message_lower, re.IGNORECASE):
+            return "recall"
+    return None
+
+def build_messages(count, command_ratio, long_ratio, seed=42):
+    """Nachrichten-Mix; lange Nachrichten enthalten angehängten Dateiinhalt."""
+    rng = random.Random(seed)
+    filler = " ".join(rng.choice(["Daten", "Zeile", "Wert", "Tabelle", "Spalte", "Bericht"]) for _ in range(800))
+    messages = []
+    for _ in range(count):
+        if rng.random() < command_ratio:
+            message = rng.choice(COMMANDS)
+        else:
+            message = rng.choice(QUESTIONS)
+        if rng.random() < long_ratio:
+            message = f"{message}\n\n=== Datei: bericht.txt ===\n{filler}"
+        messages.append(message)
+    return messages
+
+def measure(label, detect, messages, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        detected = sum(1 for message in messages if detect(message))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<32} {best / len(messages) * 1e6:>10.2f} µs {detected:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10000, help="Anzahl Nachrichten")
+    parser.add_argument("--command-ratio", type=float, default=0.05, help="Anteil Memory-Befehle")
+    parser.add_argument("--long-ratio", type=float, default=0.1, help="Anteil langer Nachrichten (mit Dateiinhalt)")
+    parser.add_argument("--repeats", type=int, default=5, help="Wiederholungen (bester Lauf zählt)")
+    args = parser.parse_args()
+
+    messages = build_messages(args.messages, args.command_ratio, args.long_ratio)
+    manager = MemoryManager()
+    print(f"{len(messages)} Nachrichten, {args.command_ratio:.0%} Befehle, {args.long_ratio:.0%} lang\n")
+    print(f"{'Erkennung':<32} {'pro Nachricht':>13} {'erkannt':>10}")
+    print("-" * 58)
+    measure("bisher (16x re.search)", legacy_detect, messages, args.repeats)
+    measure("vorkompiliert (1x match)", lambda message: manager.match_intent(message)[0], messages, args.repeats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Relevanz-Suche im Langzeitgedächtnis gegenüber "die letzten 5".
+
+Erzeugt einen synthetischen Bestand (Füll-Erinnerungen plus eingestreute Fakten)
+und stellt zu jedem Fakt eine passende Frage. Gemessen werden Recall@k (ist der
+gesuchte Fakt unter den ausgewählten Erinnerungen?) und die Latenz pro Abfrage.
+Zusätzlich wird die Volltextsuche des MemoryManagers (Teilstring, Wortanfang,
+Tippfehler) gegen den bisherigen linearen Durchlauf gemessen.
+
+Aufruf:
+    python benchmark_memory_retrieval.py --memories 100000 --queries 500
+    python benchmark_memory_retrieval.py --memories 20000 --hash-embeddings
+"""
+import argparse
+import random
+import time
+
+from services.memory_retrieval import MemoryRetriever
+from services.search_index import HashingEmbedder
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "ve", "zo", "ber", "din", "gus", "han", "mar", "tor"]
+TOPICS = ["Urlaub", "Arbeit", "Projekt", "Termin", "Rezept", "Buch", "Film", "Sport", "Garten", "Auto",
+          "Lieblingsfarbe", "Geburtstag", "Hund", "Katze", "Musik", "Server", "Python", "Reise", "Kaffee", "Wetter"]
+VERBS = ["mag", "plant", "kauft", "liest", "repariert", "besucht", "erwähnt", "vergisst", "sucht", "lernt"]
+
+FACTS = [
+    ("Die Lieblingsfarbe von {name} ist {value}.", "Welche Lieblingsfarbe hat {name}?"),
+    ("{name} hat am {value} Geburtstag.", "Wann hat {name} Geburtstag?"),
+    ("Der Hund von {name} heißt {value}.", "Wie heißt der Hund von {name}?"),
+    ("{name} arbeitet als {value}.", "Als was arbeitet {name}?"),
+]
+VALUES = ["blau", "grün", "12. März", "3. Juli", "Bello", "Rex", "Lehrerin", "Ingenieur", "Bäcker", "violett"]
+
+def _name(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+
+def _filler(rng):
+    return f"{_name(rng)} {rng.choice(VERBS)} {rng.choice(TOPICS)} und {rng.choice(TOPICS)} am {rng.randint(1, 28)}. Tag."
+
+def build_dataset(memory_count, query_count, seed=42):
+    """Füll-Erinnerungen und Fakten mit zugehörigen Fragen erzeugen."""
+    rng = random.Random(seed)
+    memories = [{"id": i + 1, "timestamp": "", "text": _filler(rng)} for i in range(memory_count)]
+
+    queries = []
+    fact_positions = rng.sample(range(memory_count), min(query_count, memory_count))
+    for position in fact_positions:
+        template, question = rng.choice(FACTS)
+        name = _name(rng) + str(position)
+        memories[position]["text"] = template.format(name=name, value=rng.choice(VALUES))
+        queries.append((question.format(name=name), memories[position]["id"]))
+    return memories, queries
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+def evaluate(label, select, queries):
+    """Recall@k und Latenzen einer Auswahlstrategie messen."""
+    hits = 0
+    latencies = []
+    for query, expected_id in queries:
+        start = time.perf_counter()
+        selected = select(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(memory["id"] == expected_id for memory in selected)
+    print(f"{label:<28} {hits / len(queries):>9.1%} {percentile(latencies, 0.5):>9.2f} "
+          f"{percentile(latencies, 0.95):>9.2f} {percentile(latencies, 0.99):>9.2f}")
+
+def _typo(word, rng):
+    """Zwei benachbarte Buchstaben vertauschen."""
+    position = rng.randrange(1, len(word) - 2)
+    return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+
+def benchmark_text_search(retriever, memories, queries, seed=7):
+    """Index-Suche gegen den linearen Durchlauf (bisheriges search_memories) messen."""
+    rng = random.Random(seed)
+    # Namen der Fakten enden auf ihre Position und sind dadurch eindeutig
+    names = [next(word for word in question.rstrip("?").split() if word[-1].isdigit()) for question, _ in queries]
+    cases = [
+        ("Teilstring", [name[1:-1].lower() for name in names]),
+        ("Wortanfang", [name[:-1] for name in names]),
+        ("Tippfehler", [_typo(name, rng) for name in names]),
+    ]
+
+    def linear(term):
+        term = term.lower()
+        return [memory for memory in memories if term in memory.get('text', '').lower()]
+
+    print(f"\n{'Volltextsuche':<28} {'Treffer':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    print("-" * 68)
+    for label, terms in cases:
+        for variant, search in (("linear", linear), ("Index", lambda term: retriever.find(term, 0, 20)[0])):
+            hits = 0
+            latencies = []
+            for term, (_, expected_id) in zip(terms, queries):
+                start = time.perf_counter()
+                results = search(term)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += any(memory["id"] == expected_id for memory in results)
+            print(f"{label + ' (' + variant + ')':<28} {hits / len(terms):>9.1%} {percentile(latencies, 0.5):>9.2f} "
+                  f"{percentile(latencies, 0.95):>9.2f} {percentile(latencies, 0.99):>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--memories", type=int, default=100000, help="Anzahl Erinnerungen")
+    parser.add_argument("--queries", type=int, default=500, help="Anzahl Fragen")
+    parser.add_argument("-k", type=int, default=5, help="Erinnerungen im Prompt")
+    parser.add_argument("--budget", type=int, default=500, help="Token-Budget")
+    parser.add_argument("--hash-embeddings", action="store_true", help="Zusätzlich BM25 + Hashing-Embeddings messen")
+    args = parser.parse_args()
+
+    memories, queries = build_dataset(args.memories, args.queries)
+    print(f"{len(memories)} Erinnerungen, {len(queries)} Fragen, k={args.k}, Budget={args.budget} Tokens\n")
+
+    strategies = [("Neueste (bisher)", None)]
+    strategies.append(("BM25", MemoryRetriever()))
+    if args.hash_embeddings:
+        strategies.append(("BM25 + Hashing-Embeddings", MemoryRetriever(HashingEmbedder(dim=256))))
+
+    print(f"{'Strategie':<28} {'Recall@k':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    print("-" * 68)
+    for label, retriever in strategies:
+        if retriever is None:
+            evaluate(label, lambda query: memories[-args.k:], queries)
+            continue
+        start = time.perf_counter()
+        retriever.load(memories)
+        build_seconds = time.perf_counter() - start
+        evaluate(label, lambda query: retriever.retrieve(query, args.k, args.budget), queries)
+        print(f"{'':<28} Indexaufbau: {build_seconds:.1f}s")
+
+    benchmark_text_search(strategies[1][1], memories, queries[:100])
+
+if __name__ == "__main__":
+    main()
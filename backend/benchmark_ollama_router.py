@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Lasttest: Verteilung über mehrere Ollama-Instanzen mit lokalen Fake-Servern.
+
+Startet N simulierte Ollama-Server (fake_ollama.py: jeweils begrenzte
+Parallelität, feste Antwortzeit, Ladezeit für noch nicht geladene Modelle) und schickt
+gleichzeitige /api/chat-Anfragen über den OllamaRouter. Ein Knoten kann als
+ausgefallen simuliert werden (--dead), um Ausschluss und Failover zu prüfen.
+
+Aufruf:
+    python benchmark_ollama_router.py --nodes 3 --requests 300 --concurrency 24
+    python benchmark_ollama_router.py --nodes 3 --dead 1 --models 2
+"""
+import argparse
+import random
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_ollama import start_in_thread
+from services.ollama_router import OllamaRouter
+
+def start_fakes(count, models, parallel, latency, load_time):
+    """Fake-Ollama-Instanzen mit fester Antwortzeit (ein Token, keine Token-Verzögerung)."""
+    return start_in_thread(port=[0] * count, models=models, parallel=parallel, latency=latency,
+                           load_time=load_time, tokens=1, token_delay=0.0)
+
+def _dead_url():
+    """URL eines Ports, auf dem niemand lauscht."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+def run(label, router, models, request_count, concurrency, seed=3):
+    rng = random.Random(seed)
+    chosen = [rng.choice(models) for _ in range(request_count)]
+    latencies = []
+    errors = 0
+
+    def one(model):
+        start = time.perf_counter()
+        body = {"model": model, "messages": [{"role": "user", "content": "Hallo"}], "stream": False}
+        with router.request("POST", "/api/chat", model=model, json=body) as response:
+            response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(one, model) for model in chosen]:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {request_count / elapsed:>8.1f} {percentile(latencies, 0.5) * 1000:>9.0f} "
+          f"{percentile(latencies, 0.95) * 1000:>9.0f} {errors:>7} {router.failovers:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=3, help="Anzahl simulierter Ollama-Instanzen")
+    parser.add_argument("--dead", type=int, default=0, help="Zusätzliche ausgefallene Instanzen")
+    parser.add_argument("--models", type=int, default=1, help="Anzahl verschiedener Modelle")
+    parser.add_argument("--requests", type=int, default=300, help="Anzahl Anfragen")
+    parser.add_argument("--concurrency", type=int, default=24, help="Gleichzeitige Anfragen")
+    parser.add_argument("--parallel", type=int, default=4, help="Parallele Anfragen je Instanz (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Antwortzeit je Anfrage (Sekunden)")
+    parser.add_argument("--load-time", type=float, default=0.5, help="Ladezeit eines kalten Modells (Sekunden)")
+    args = parser.parse_args()
+
+    models = [f"modell{i}:7b" for i in range(args.models)]
+    print(f"{args.requests} Anfragen, {args.concurrency} gleichzeitig, {len(models)} Modell(e), "
+          f"{args.parallel} parallel je Instanz\n")
+    print(f"{'Aufbau':<22} {'Anfr./s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'Fehler':>7} {'Failover':>10}")
+    print("-" * 70)
+
+    single, = start_fakes(1, models, args.parallel, args.latency, args.load_time)
+    run("1 Instanz", OllamaRouter([single.url]), models, args.requests, args.concurrency)
+
+    fakes = start_fakes(args.nodes, models, args.parallel, args.latency, args.load_time)
+    urls = [fake.url for fake in fakes] + [_dead_url() for _ in range(args.dead)]
+    router = OllamaRouter(urls, max_failures=2, eject_seconds=30)
+    # Auch ausgefallene Knoten boten die Modelle an (sie waren vorher erreichbar)
+    for node in router.nodes:
+        router.update_available(node, models)
+    label = f"{args.nodes} Instanzen" + (f" + {args.dead} tot" if args.dead else "")
+    run(label, router, models, args.requests, args.concurrency)
+
+    print("\nVerteilung:")
+    for node in router.nodes:
+        fake = next((fake for fake in fakes if fake.url == node.url), None)
+        handled = f"{fake.handled:>5} bearbeitet, {fake.loads} Ladevorgänge" if fake else "ausgefallen"
+        print(f"  {node.url:<28} {node.requests:>5} zugeteilt, {handled}, ausgeschlossen: {node.stats()['ejected']}")
+
+if __name__ == "__main__":
+    main()
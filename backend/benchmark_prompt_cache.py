@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Prompt-Eval-Zeit über ein mehrstufiges Gespräch (echtes Ollama nötig).
+
+Vergleicht zwei Prompt-Layouts bei wechselnden Erinnerungen je Runde:
+  bisher  - Erinnerungen am Ende des System-Prompts (Präfix ändert sich jede Runde)
+  stabil  - System-Prompt und Verlauf vorne, Erinnerungen direkt vor der Frage
+Gemessen werden prompt_eval_count und prompt_eval_duration aus Ollamas Antwort.
+
+Aufruf:
+    python benchmark_prompt_cache.py --model llama3.2 --turns 8
+    OLLAMA_BASE_URL=http://gpu-host:11434 python benchmark_prompt_cache.py --model qwen2.5:7b
+"""
+import argparse
+import random
+
+from services.llm_service import _build_reasoning_request, _endpoint, _eval_metrics, _response_text
+from services.ollama_client import ollama_post
+from services.prompt_builder import format_memory_block
+
+SYSTEM_PROMPT = ("Du bist ein hilfreicher Assistent. Antworte knapp und sachlich auf Deutsch. "
+                 "Wenn du etwas nicht weißt, sag es ehrlich. ") * 8
+QUESTIONS = [
+    "Wie heißt mein Hund?", "Was ist meine Lieblingsfarbe?", "Wo arbeite ich?",
+    "Wann habe ich Geburtstag?", "Welches Buch lese ich gerade?", "Was koche ich heute?",
+    "Wohin reise ich im Sommer?", "Welche Sprache lerne ich?", "Wie heißt meine Katze?",
+    "Welchen Sport mache ich?",
+]
+MEMORIES = [
+    "Der Hund heißt Bello.", "Die Lieblingsfarbe ist Blau.", "Arbeitet als Ingenieurin in Köln.",
+    "Hat am 12. März Geburtstag.", "Liest gerade Der Zauberberg.", "Kocht heute Linsensuppe.",
+    "Reist im Sommer nach Lissabon.", "Lernt Portugiesisch.", "Die Katze heißt Minka.", "Spielt Tennis.",
+]
+
+def run_conversation(model, layout, turns, max_tokens, seed=1):
+    """Gespräch führen und die Messwerte je Runde liefern."""
+    rng = random.Random(seed)
+    history = []
+    results = []
+    for turn in range(turns):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        background = format_memory_block([{"text": text} for text in rng.sample(MEMORIES, 3)])
+        if layout == "bisher":
+            request_data = _build_reasoning_request(model, question, f"{SYSTEM_PROMPT}\n\n{background}", 0.0,
+                                                    context=history)
+        else:
+            request_data = _build_reasoning_request(model, question, SYSTEM_PROMPT, 0.0,
+                                                    context=history, background=background)
+        request_data['options']['num_predict'] = max_tokens
+        response = ollama_post(_endpoint(request_data), json=request_data)
+        response.raise_for_status()
+        data = response.json()
+        history += [{"role": "user", "content": question}, {"role": "assistant", "content": _response_text(data)}]
+        results.append(_eval_metrics(data))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", required=True, help="Ollama-Modell")
+    parser.add_argument("--turns", type=int, default=8, help="Runden pro Gespräch")
+    parser.add_argument("--max-tokens", type=int, default=48, help="Höchstzahl generierter Tokens je Antwort")
+    args = parser.parse_args()
+
+    # Aufwärmen: Modell laden, damit load_duration nicht in die erste Messung fällt
+    run_conversation(args.model, "stabil", 1, 1)
+
+    print(f"{'Layout':<8} {'Runde':>5} {'Prompt-Tokens':>14} {'Prompt-Eval (ms)':>17} {'Eval (ms)':>10}")
+    print("-" * 58)
+    for layout in ("bisher", "stabil"):
+        results = run_conversation(args.model, layout, args.turns, args.max_tokens)
+        for turn, metrics in enumerate(results, 1):
+            print(f"{layout:<8} {turn:>5} {metrics['prompt_eval_count']:>14} {metrics['prompt_eval_ms']:>17.1f} "
+                  f"{metrics['eval_ms']:>10.1f}")
+        total = sum(metrics['prompt_eval_ms'] for metrics in results)
+        print(f"{layout:<8} {'Summe':>5} {sum(m['prompt_eval_count'] for m in results):>14} {total:>17.1f}\n")
+
+if __name__ == "__main__":
+    main()
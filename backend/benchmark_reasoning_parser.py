@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: bisherige Regex-Kaskade gegen die lineare Pattern-Auswertung
+(parse_reasoning_text) und den inkrementellen ReasoningStreamParser auf
+großen Antworten (50-200 KB).
+
+Aufruf:
+    python benchmark_reasoning_parser.py [--runs 5] [--token-size 4]
+"""
+import argparse
+import logging
+import re
+import time
+
+from services.reasoning_parser import ReasoningStreamParser, parse_reasoning_text
+
+SIZES_KB = [50, 100, 200]
+
+SENTENCE = "Let us compare the values step by step and check each digit carefully. "
+
+def build_samples(size_kb):
+    """Testantworten in verschiedenen Formaten erzeugen."""
+    body = (SENTENCE * (size_kb * 1024 // len(SENTENCE) + 1))[:size_kb * 1024]
+    answer = "The answer is 42."
+    return {
+        "thinking-tags": f"<thinking>{body}</thinking>\n\n{answer}",
+        "markdown-markers": f"**Reasoning:** {body}\n\n**Answer:** {answer}",
+        "unclosed-tag": f"<reasoning>{body}",
+        "no-markers": body.replace(". ", ".\n\n") + answer,
+    }
+
+# Bisherige Implementierung von parse_reasoning_response als Vergleichsbasis
+LEGACY_PATTERNS = [
+    r'<thinking>(.*?)</thinking>(.*?)$',
+    r'<reasoning>(.*?)</reasoning>(.*?)$',
+    r'\*\*Reasoning:\*\*(.*?)\*\*Answer:\*\*(.*?)$',
+    r'\*\*Thinking:\*\*(.*?)\*\*Response:\*\*(.*?)$',
+    r'(Let me think.*?(?=\n\n|\[|Final|Answer))(.*?)$',
+    r'Reasoning:(.*?)Answer:(.*?)$',
+    r'^(To determine.*?(?=\n\n|\d+\.|So the answer|Therefore))(.*?)$',
+    r'^(.*?(?:step by step|digit by digit|compare).*?(?=So the answer|Therefore|The answer is))(.*?)$',
+]
+
+def run_regex(text):
+    for pattern in LEGACY_PATTERNS:
+        match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
+        if match:
+            reasoning = match.group(1).strip()
+            answer = match.group(2).strip()
+            if reasoning and answer and len(reasoning) > 50:
+                return {"reasoning": reasoning, "answer": answer, "has_reasoning": True}
+
+    if len(text) > 300:
+        lines = text.split('\n\n')
+        if len(lines) >= 2:
+            mid_point = len(lines) // 2
+            reasoning = '\n\n'.join(lines[:mid_point])
+            answer = '\n\n'.join(lines[mid_point:])
+            if len(reasoning) > 100 and len(answer) > 50:
+                return {"reasoning": reasoning, "answer": answer, "has_reasoning": True}
+
+    return {"reasoning": "", "answer": text, "has_reasoning": False}
+
+def run_linear(text):
+    return parse_reasoning_text(text)
+
+def run_stream(text, token_size):
+    parser = ReasoningStreamParser()
+    for start in range(0, len(text), token_size):
+        parser.feed(text[start:start + token_size])
+    return parser.result()
+
+def measure(func, runs):
+    """Beste Laufzeit aus `runs` Durchläufen in Millisekunden."""
+    best = float("inf")
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Durchläufe pro Messung")
+    parser.add_argument("--token-size", type=int, default=4, help="Zeichen pro simuliertem Stream-Token")
+    parser.add_argument("--skip-regex", action="store_true", help="Regex-Kaskade nicht messen (kann Minuten dauern)")
+    args = parser.parse_args()
+
+    # Parser-Logs würden die Messung verfälschen
+    logging.disable(logging.CRITICAL)
+
+    print("Stream: Summe aller feed()-Aufrufe bei "
+          f"{args.token_size} Zeichen pro Token, verteilt über die Generierung")
+    print(f"{'Format':<18} {'Größe':>7} {'Regex (ms)':>12} {'Linear (ms)':>12} {'Stream (ms)':>12} {'Gleich':>7}")
+    print("-" * 73)
+    for size_kb in SIZES_KB:
+        for name, text in build_samples(size_kb).items():
+            linear_ms, linear_result = measure(lambda: run_linear(text), args.runs)
+            stream_ms, stream_result = measure(lambda: run_stream(text, args.token_size), args.runs)
+            same = linear_result == stream_result
+
+            if args.skip_regex:
+                regex_column = "-"
+            else:
+                regex_ms, regex_result = measure(lambda: run_regex(text), args.runs)
+                regex_column = f"{regex_ms:.2f}"
+                same = same and regex_result == linear_result
+
+            print(f"{name:<18} {size_kb:>5}KB {regex_column:>12} {linear_ms:>12.2f} {stream_ms:>12.2f} "
+                  f"{'ja' if same else 'nein':>7}")
+
+if __name__ == "__main__":
+    main()
@@ -21,20 +21,140 @@ print(f"🔍 MEMORIES_DIR: {MEMORIES_DIR}")
 OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
 DEFAULT_MODEL = "llama2"
 DEFAULT_TEMPERATURE = 0.7
-DEFAULT_MAX_TOKENS = 2000
+DEFAULT_MAX_TOKENS = int(os.environ.get("DEFAULT_MAX_TOKENS", "2000"))  # beim Prompt-Budget für die Antwort freigehalten
+
+# Kontextfenster je Anfrage (num_ctx); ohne feste Angabe schneidet Ollama zu lange
+# Prompts stillschweigend ab. Je Modell überschreibbar über
+# OLLAMA_MODEL_CONTEXT="llama3:8b=8192,qwen2.5=32768"
+CONTEXT_WINDOW = int(os.environ.get("CONTEXT_WINDOW", "8192"))
+MODEL_CONTEXT_OVERRIDES = {
+    name.strip(): int(size)
+    for name, size in (
+        entry.rsplit("=", 1) for entry in os.environ.get("OLLAMA_MODEL_CONTEXT", "").split(",") if "=" in entry
+    )
+}
+# Optionale Tokenizer für exakte Zählung: <Modellfamilie>.json (Paket "tokenizers")
+TOKENIZER_DIR = Path(os.environ.get("TOKENIZER_DIR", str(DATA_DIR / "tokenizers")))
+
+# Ollama-Verbindung (gemeinsamer Connection-Pool für alle Aufrufe)
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "5"))    # Sekunden
+OLLAMA_READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", "300"))        # Sekunden zwischen zwei Bytes
+OLLAMA_MAX_RETRIES = int(os.environ.get("OLLAMA_MAX_RETRIES", "3"))              # bei Verbindungsfehlern und 503
+OLLAMA_RETRY_BACKOFF = float(os.environ.get("OLLAMA_RETRY_BACKOFF", "0.5"))      # 0.5s, 1s, 2s, ...
+OLLAMA_POOL_CONNECTIONS = int(os.environ.get("OLLAMA_POOL_CONNECTIONS", "4"))    # Anzahl Host-Pools
+OLLAMA_POOL_MAXSIZE = int(os.environ.get("OLLAMA_POOL_MAXSIZE", "32"))           # Verbindungen pro Host
+
+# Mehrere Ollama-Instanzen (kommagetrennt); leer = nur OLLAMA_BASE_URL
+OLLAMA_ENDPOINTS = [url.strip() for url in os.environ.get("OLLAMA_ENDPOINTS", "").split(",") if url.strip()]
+OLLAMA_EJECT_FAILURES = int(os.environ.get("OLLAMA_EJECT_FAILURES", "3"))        # Fehler in Folge bis zum Ausschluss
+OLLAMA_EJECT_SECONDS = float(os.environ.get("OLLAMA_EJECT_SECONDS", "30"))       # Dauer des Ausschlusses
+OLLAMA_HEALTH_INTERVAL = float(os.environ.get("OLLAMA_HEALTH_INTERVAL", "10"))   # Sekunden zwischen Health-Checks
+
+# Wie lange Ollama ein Modell nach der letzten Anfrage geladen hält ("30m", "1h",
+# Sekunden; -1 = dauerhaft, 0 = sofort entladen). Je Modell überschreibbar über
+# OLLAMA_MODEL_KEEP_ALIVE="llama3:8b=1h,qwen2.5=-1"
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+MODEL_KEEP_ALIVE = dict(
+    entry.strip().rsplit("=", 1)
+    for entry in os.environ.get("OLLAMA_MODEL_KEEP_ALIVE", "").split(",")
+    if "=" in entry
+)
+
+# Modelle vorladen (kommagetrennt) und erneut laden, sobald Ollama sie entladen hat
+PRELOAD_MODELS = [name.strip() for name in os.environ.get("OLLAMA_PRELOAD_MODELS", "").split(",") if name.strip()]
+MODEL_WARM_INTERVAL = int(os.environ.get("MODEL_WARM_INTERVAL", "300"))  # Sekunden zwischen Prüfungen, 0 = nur beim Start
+MODEL_LIST_TTL = int(os.environ.get("MODEL_LIST_TTL", "60"))             # Sekunden, die /api/tags zwischengespeichert wird
+
+# Zulassungssteuerung: gleichzeitige Anfragen je Modell (über alle Ollama-Instanzen),
+# je Modell überschreibbar über OLLAMA_MODEL_CONCURRENCY="llama3:70b=1,qwen2.5=8"
+MODEL_CONCURRENCY = int(os.environ.get("MODEL_CONCURRENCY", "4"))
+MODEL_CONCURRENCY_OVERRIDES = {
+    name.strip(): int(limit)
+    for name, limit in (
+        entry.rsplit("=", 1) for entry in os.environ.get("OLLAMA_MODEL_CONCURRENCY", "").split(",") if "=" in entry
+    )
+}
+MAX_QUEUE_PER_MODEL = int(os.environ.get("MAX_QUEUE_PER_MODEL", "32"))   # wartende Anfragen je Modell, darüber 429
+QUEUE_TIMEOUT = float(os.environ.get("QUEUE_TIMEOUT", "30"))             # Sekunden Wartezeit, danach 503
+
+# Antwort-Cache für Anfragen mit temperature == 0 (gleicher Request = gleiche Antwort)
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE", "False").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1000"))  # im Arbeitsspeicher
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", str(24 * 3600)))           # Sekunden je Eintrag
+RESPONSE_CACHE_DISK = os.environ.get("RESPONSE_CACHE_DISK", "False").lower() == "true"   # zusätzlich auf der Festplatte
+RESPONSE_CACHE_DIR = DATA_DIR / "response_cache"
+RESPONSE_CACHE_MAX_DISK_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_DISK_ENTRIES", "10000"))
+
+# Datei-Uploads (PDF/DOCX/XLSX werden parallel in Worker-Prozessen geparst)
+FILE_PARSE_WORKERS = int(os.environ.get("FILE_PARSE_WORKERS", str(os.cpu_count() or 1)))  # 0 = im Request-Thread
+FILE_PARSE_TIMEOUT = float(os.environ.get("FILE_PARSE_TIMEOUT", "30"))       # Sekunden je Datei
+FILE_PARSE_MEMORY_MB = int(os.environ.get("FILE_PARSE_MEMORY_MB", "1024"))   # Speichergrenze je Worker (0 = keine)
+FILE_MAX_TOTAL_BYTES = int(os.environ.get("FILE_MAX_TOTAL_MB", "50")) * 1024 * 1024  # alle Dateien einer Anfrage
+FILE_MAX_CHARS = int(os.environ.get("FILE_MAX_CHARS", "1000000"))            # extrahierter Text je Datei, danach Abbruch
+
+# Dokument-Abschnitte im Prompt (statt jede Datei nach 5000 Zeichen abzuschneiden)
+FILE_TOKEN_BUDGET = int(os.environ.get("FILE_TOKEN_BUDGET", "2000"))    # geschätzte Tokens aller Abschnitte
+FILE_CHUNK_TOKENS = int(os.environ.get("FILE_CHUNK_TOKENS", "200"))     # Höchstlänge eines Abschnitts
+FILE_INDEX_MAX_CHARS = int(os.environ.get("FILE_INDEX_MAX_CHARS", "2000000"))  # Dokumente je Sitzung (älteste fliegen raus)
+FILE_EMBEDDINGS = os.environ.get("FILE_EMBEDDINGS", "none")             # "none", "hash" oder "ollama" (wie MEMORY_EMBEDDINGS)
+FILE_EMBEDDING_MODEL = os.environ.get("FILE_EMBEDDING_MODEL", "nomic-embed-text")
+UPLOAD_DIR = DATA_DIR / "uploads"                                             # per /api/upload hochgeladene Dateien
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_MB", "100")) * 1024 * 1024  # je Upload-Anfrage
+UPLOAD_TTL = int(os.environ.get("UPLOAD_TTL", "3600"))                        # Sekunden, die ein Upload abrufbar bleibt
+
+# Cache für extrahierten Dateitext (Schlüssel: SHA-256 der Datei + Parser-Version)
+PARSE_CACHE_ENABLED = os.environ.get("PARSE_CACHE", "True").lower() == "true"
+PARSE_CACHE_MAX_CHARS = int(os.environ.get("PARSE_CACHE_MAX_CHARS", "50000000"))  # Text im Arbeitsspeicher
+PARSE_CACHE_DISK = os.environ.get("PARSE_CACHE_DISK", "True").lower() == "true"   # zusätzlich komprimiert auf der Festplatte
+PARSE_CACHE_DIR = DATA_DIR / "parse_cache"
+PARSE_CACHE_MAX_DISK_BYTES = int(os.environ.get("PARSE_CACHE_MAX_DISK_MB", "500")) * 1024 * 1024
 
 # TTS-Einstellungen
 DEFAULT_TTS_VOICE = "de-DE-KatjaNeural"
 DEFAULT_TTS_RATE = "1.0"
 DEFAULT_TTS_PITCH = "1.0"
+TTS_ASYNC = os.environ.get("TTS_ASYNC", "False").lower() == "true"  # TTS als Hintergrundjob (Standard je Anfrage)
+TTS_SEGMENT_MIN_CHARS = 40   # Mindestlänge eines Satz-Segments
+TTS_MAX_JOBS = 200           # Anzahl gemerkter TTS-Jobs
+TTS_MAX_PARALLEL_SEGMENTS = int(os.environ.get("TTS_MAX_PARALLEL_SEGMENTS", "3"))  # gleichzeitige Segment-Synthesen pro Job
+TTS_STREAM_TIMEOUT = 60      # Sekunden Wartezeit auf ein Segment beim Audio-Streaming
+TTS_ENGINE = os.environ.get("TTS_ENGINE", "edge")  # "edge", "whisper" oder "coqui"
+
+# Lokale TTS-Engines (Worker-Prozesse, nur CPU, Modell einmal pro Prozess geladen)
+LOCAL_TTS_WORKERS = int(os.environ.get("LOCAL_TTS_WORKERS", "1"))
+LOCAL_TTS_BATCH_SIZE = 8       # Anfragen pro Batch
+LOCAL_TTS_BATCH_WAIT = 0.02    # Sekunden Wartezeit auf weitere Anfragen für einen Batch
+WHISPER_TTS_MODEL = os.environ.get("WHISPER_TTS_MODEL", "openai/whisper-large-v2")
+COQUI_TTS_MODEL = os.environ.get("COQUI_TTS_MODEL", "tts_models/de/thorsten/tacotron2-DDC")
+
+# TTS-Cache (gleicher Text + Stimme + Rate + Tonhöhe = gleiche Audiodatei)
+TTS_CACHE_ENABLED = os.environ.get("TTS_CACHE_ENABLED", "True").lower() == "true"
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_MB", "200")) * 1024 * 1024
+TTS_CACHE_MAX_AGE = int(os.environ.get("TTS_CACHE_MAX_AGE_DAYS", "7")) * 24 * 3600  # auch für alte TTS-Dateien
+TTS_CACHE_SWEEP_INTERVAL = 600  # Sekunden zwischen Abgleichen des Audio-Verzeichnisses
 
 # Server-Einstellungen
 HOST = "127.0.0.1"  # Localhost nur - wie du es geändert hast
 PORT = 5000
+ASGI_PORT = int(os.environ.get("ASGI_PORT", "5001"))  # asgi_app.py (async Modus)
 DEBUG = os.environ.get("DEBUG", "False").lower() == "true"
 
 # Chat-Einstellungen
-MAX_CONTEXT_MESSAGES = 200
+MAX_CONTEXT_MESSAGES = 200    # Höchstzahl Nachrichten im Verlauf einer Sitzung
+
+# Serverseitige Chat-Sitzungen (Verlauf wird über Ollamas /api/chat übergeben)
+SESSION_TOKEN_BUDGET = int(os.environ.get("SESSION_TOKEN_BUDGET", "4000"))  # geschätzte Tokens des Verlaufs
+SESSION_IDLE_TIMEOUT = int(os.environ.get("SESSION_IDLE_TIMEOUT", "1800"))  # Sekunden bis zum Verwerfen
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "500"))
+
+# Langzeitgedächtnis: "sqlite" (Standard, übernimmt die JSON-Datei einmalig) oder "json" (alt)
+MEMORY_BACKEND = os.environ.get("MEMORY_BACKEND", "sqlite")
+
+# Auswahl der Erinnerungen für den Chat-Kontext (nach Relevanz statt der neuesten)
+MEMORY_TOP_K = 5              # Maximale Anzahl Erinnerungen im Prompt
+MEMORY_TOKEN_BUDGET = 500     # Maximale (geschätzte) Tokens für Erinnerungen
+MEMORY_EMBEDDINGS = os.environ.get("MEMORY_EMBEDDINGS", "none")  # "none", "hash" (lokaler Stub) oder "ollama"
+MEMORY_EMBEDDING_MODEL = os.environ.get("MEMORY_EMBEDDING_MODEL", "nomic-embed-text")
 
 # Verzeichnisse erstellen
 def ensure_directories():
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Fake-Ollama-Server für Last- und Integrationstests ohne echtes Modell.
+Emuliert /api/tags, /api/ps, /api/version, /api/generate und /api/chat (mit
+und ohne Streaming) mit einstellbarer Latenz, begrenzter Parallelität und
+Ladezeit für noch nicht geladene Modelle.
+
+Aufruf:
+    python fake_ollama.py --port 11435 --latency 0.5 --tokens 50 --token-delay 0.02
+    python fake_ollama.py --port 11435 --port 11436   # mehrere Instanzen
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import threading
+import time
+from typing import List
+
+from aiohttp import web
+
+RESPONSE_TEXT = (
+    "<thinking>Der Benutzer möchte eine kurze Antwort. Ich prüfe die Frage Schritt für Schritt, "
+    "vergleiche die Möglichkeiten und formuliere dann eine knappe, hilfreiche Antwort.</thinking>"
+    "Das ist eine Testantwort des Fake-Ollama-Servers. Sie besteht aus mehreren Sätzen. "
+    "So lassen sich Streaming, Reasoning-Trennung und TTS ohne echtes Modell testen."
+)
+
+def _tokenize(text, count):
+    """Text in etwa `count` gleich große Tokens zerlegen."""
+    size = max(1, len(text) // max(1, count))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+class FakeOllama:
+    """Zustand und Handler einer Fake-Ollama-Instanz."""
+
+    def __init__(self, args, port):
+        self.args = args
+        self.port = port
+        self.loaded_models = {}
+        self.requests = 0
+        self.handled = 0
+        self.loads = 0
+        # Wie OLLAMA_NUM_PARALLEL: weitere Anfragen warten auf einen freien Platz (0 = unbegrenzt)
+        self._slots = asyncio.Semaphore(args.parallel) if args.parallel > 0 else contextlib.nullcontext()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.args.host}:{self.port}"
+
+    def _maybe_fail(self):
+        if random.random() < self.args.fail_rate:
+            raise web.HTTPServiceUnavailable(text=json.dumps({"error": "fake failure"}))
+
+    async def _load(self, model):
+        """Modell als geladen markieren; ein kaltes Modell kostet --load-time."""
+        cold = model not in self.loaded_models
+        self.loaded_models[model] = time.time()
+        if cold:
+            self.loads += 1
+            await asyncio.sleep(self.args.load_time)
+
+    async def tags(self, request):
+        models = [{"name": name, "size": 0} for name in self.args.models]
+        return web.json_response({"models": models})
+
+    async def ps(self, request):
+        models = [{"name": name, "model": name} for name in self.loaded_models]
+        return web.json_response({"models": models})
+
+    async def version(self, request):
+        return web.json_response({"version": "fake"})
+
+    async def generate(self, request):
+        data = await request.json()
+        prompt = data.get("prompt", "")
+        return await self._respond(request, data, prompt, lambda text: {"response": text},
+                                   {"context": list(range(len(prompt) // 4 + self.args.tokens))})
+
+    async def chat(self, request):
+        data = await request.json()
+        prompt = "".join(message.get("content", "") for message in data.get("messages") or [])
+        return await self._respond(request, data, prompt,
+                                   lambda text: {"message": {"role": "assistant", "content": text}},
+                                   {"done_reason": "stop"})
+
+    async def _respond(self, request, data, prompt, wrap, extra):
+        """
+        Antwort im Format von /api/generate bzw. /api/chat erzeugen.
+
+        Args:
+            wrap: Bettet einen Textteil in eine Antwortzeile ein
+            extra: Zusätzliche Felder der letzten Zeile
+        """
+        self.requests += 1
+        self._maybe_fail()
+        model = data.get("model", "fake")
+
+        async with self._slots:
+            await self._load(model)
+            # Leerer Prompt = Modell laden (Preload)
+            if not prompt:
+                await asyncio.sleep(self.args.latency)
+                return web.json_response({"model": model, **wrap(""), "done": True})
+
+            await asyncio.sleep(self.args.latency)
+            tokens = _tokenize(RESPONSE_TEXT, self.args.tokens)
+            final = {
+                "model": model,
+                "done": True,
+                **extra,
+                "prompt_eval_count": len(prompt) // 4,
+                "prompt_eval_duration": int(self.args.latency * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int(self.args.token_delay * len(tokens) * 1e9),
+                "instance": self.port,
+            }
+
+            if not data.get("stream", True):
+                await asyncio.sleep(self.args.token_delay * len(tokens))
+                self.handled += 1
+                return web.json_response({**final, **wrap(RESPONSE_TEXT)})
+
+            response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+            await response.prepare(request)
+            for token in tokens:
+                await asyncio.sleep(self.args.token_delay)
+                line = json.dumps({"model": model, **wrap(token), "done": False})
+                await response.write((line + "\n").encode("utf-8"))
+            await response.write((json.dumps({**final, **wrap("")}) + "\n").encode("utf-8"))
+            await response.write_eof()
+            self.handled += 1
+            return response
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get("/api/tags", self.tags)
+        app.router.add_get("/api/ps", self.ps)
+        app.router.add_get("/api/version", self.version)
+        app.router.add_post("/api/generate", self.generate)
+        app.router.add_post("/api/chat", self.chat)
+        return app
+
+async def _start(args) -> list:
+    """Alle Instanzen starten; Port 0 wählt einen freien Port."""
+    instances = []
+    for port in args.port:
+        fake = FakeOllama(args, port)
+        runner = web.AppRunner(fake.make_app())
+        await runner.setup()
+        await web.TCPSite(runner, args.host, port).start()
+        fake.port = runner.addresses[0][1]
+        fake.runner = runner
+        instances.append(fake)
+    return instances
+
+async def serve(args):
+    instances = await _start(args)
+    for fake in instances:
+        print(f"Fake-Ollama läuft auf {fake.url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for fake in instances:
+            await fake.runner.cleanup()
+
+def start_in_thread(**options) -> List[FakeOllama]:
+    """
+    Fake-Instanzen in einem Hintergrund-Thread starten (für Benchmarks).
+
+    Args:
+        **options: Kommandozeilen-Optionen als Schlüsselwörter, z.B.
+                   port=[0, 0], latency=0.05, parallel=4
+
+    Returns:
+        List[FakeOllama]: Laufende Instanzen (URL unter .url)
+    """
+    args = build_parser().parse_args([])
+    for name, value in options.items():
+        setattr(args, name, value)
+    args.port = args.port or [0]
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(_start(args), loop).result()
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, action="append", help="Port (mehrfach angebbar), Standard 11435")
+    parser.add_argument("--latency", type=float, default=0.5, help="Sekunden bis zum ersten Token")
+    parser.add_argument("--tokens", type=int, default=50, help="Anzahl Tokens pro Antwort")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Sekunden pro Token")
+    parser.add_argument("--parallel", type=int, default=0,
+                        help="Parallele Anfragen je Instanz (OLLAMA_NUM_PARALLEL, 0 = unbegrenzt)")
+    parser.add_argument("--load-time", type=float, default=0.0, help="Ladezeit eines kalten Modells (Sekunden)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Anteil der Anfragen mit HTTP 503")
+    parser.add_argument("--models", nargs="+", default=["llama2", "fake-reasoning"], help="Angebotene Modelle")
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+    args.port = args.port or [11435]
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Lasttest für /api/chat: vergleicht Requests/s und Latenzen (p50/p95/p99)
+zwischen dem Flask-Server (app.py) und dem ASGI-Server (asgi_app.py).
+
+Beispiel mit Fake-Ollama (kein Modell nötig):
+    python fake_ollama.py --port 11435 --latency 1.0
+    OLLAMA_BASE_URL=http://127.0.0.1:11435 python app.py
+    OLLAMA_BASE_URL=http://127.0.0.1:11435 uvicorn asgi_app:app --port 5001
+    python loadtest.py --url http://127.0.0.1:5000 --url http://127.0.0.1:5001 -n 500 -c 200
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+
+def percentile(values, fraction):
+    """Perzentil einer sortierten Liste (nächster Rang)."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+def _has_error(body: bytes, stream: bool) -> bool:
+    """Fehler im Antworttext erkennen (HTTP 200 mit "error"-Feld bzw. "error"-Event)."""
+    if stream:
+        return any(json.loads(line).get("type") == "error" for line in body.splitlines() if line.strip())
+    return bool(json.loads(body).get("error"))
+
+async def _one_request(session, url, payload, stream):
+    """Eine Chat-Anfrage senden, liefert (Latenz, Zeit bis zum ersten Byte, ok)."""
+    start = time.perf_counter()
+    first_byte = None
+    try:
+        async with session.post(f"{url}/api/chat", json=payload) as response:
+            if stream:
+                chunks = []
+                async for chunk in response.content.iter_any():
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - start
+                    chunks.append(chunk)
+                body = b"".join(chunks)
+            else:
+                body = await response.read()
+                first_byte = time.perf_counter() - start
+            ok = response.status == 200 and not _has_error(body, stream)
+    except Exception:
+        ok = False
+    return time.perf_counter() - start, first_byte, ok
+
+async def run_load(url, total, concurrency, payload, stream):
+    """Lasttest gegen eine Server-URL ausführen."""
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=None)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def bounded():
+            async with semaphore:
+                return await _one_request(session, url, payload, stream)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded() for _ in range(total)))
+        duration = time.perf_counter() - start
+
+    latencies = sorted(r[0] for r in results if r[2])
+    first_bytes = sorted(r[1] for r in results if r[2] and r[1] is not None)
+    return {
+        "url": url,
+        "ok": len(latencies),
+        "errors": total - len(latencies),
+        "rps": len(latencies) / duration if duration else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "ttfb_p50": percentile(first_bytes, 0.50),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", action="append", help="Server-URL (mehrfach angebbar)")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="Anzahl Anfragen pro Server")
+    parser.add_argument("-c", "--concurrency", type=int, default=50, help="Gleichzeitige Anfragen")
+    parser.add_argument("--model", default="llama2")
+    parser.add_argument("--message", default="Hallo, wie geht es dir?")
+    parser.add_argument("--stream", action="store_true", help="Streaming-Modus von /api/chat verwenden")
+    parser.add_argument("--tts", action="store_true", help="TTS aktivieren (benötigt Internet für Edge-TTS)")
+    args = parser.parse_args()
+    urls = args.url or ["http://127.0.0.1:5000", "http://127.0.0.1:5001"]
+
+    payload = {
+        "model": args.model,
+        "message": args.message,
+        "enable_tts": args.tts,
+        "stream": args.stream,
+    }
+
+    print(f"{args.requests} Anfragen, {args.concurrency} gleichzeitig, Payload: {json.dumps(payload)}")
+    print(f"{'Server':<28} {'OK':>5} {'Fehler':>7} {'Req/s':>8} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8} {'TTFB p50':>9}")
+    print("-" * 90)
+    for url in urls:
+        r = asyncio.run(run_load(url, args.requests, args.concurrency, payload, args.stream))
+        print(f"{r['url']:<28} {r['ok']:>5} {r['errors']:>7} {r['rps']:>8.1f} "
+              f"{r['p50']:>8.2f} {r['p95']:>8.2f} {r['p99']:>8.2f} {r['ttfb_p50']:>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Chat-Service: Gemeinsame Aufbereitung von Chat-Anfragen.
+Wird vom Flask-Server (app.py) und vom ASGI-Server (asgi_app.py) genutzt.
+"""
+import logging
+from typing import Dict, Any, List, Optional
+import config
+from services.memory_manager import MemoryManager
+from services.memory_retrieval import retrieve_memories
+from services.prompt_builder import format_memory_block
+from services.session_service import ChatSession, get_session_store
+from services.file_service import parse_uploaded_files
+from services.document_index import DocumentIndex, create_document_index
+from services.token_budget import MESSAGE_OVERHEAD, PromptBudget, allocate, record_budget
+
+logger = logging.getLogger(__name__)
+
+_memory_manager = MemoryManager()
+
+def answer_memory_command(message: str) -> Optional[Dict[str, Any]]:
+    """
+    Memory-Befehle ("merke dir …", "/remember …", "/recall …") direkt beantworten.
+    
+    Returns:
+        dict: Antwort im Format von query_ollama_with_reasoning plus
+              "memory_action", oder None für normale Nachrichten
+    """
+    intent, answer = _memory_manager.handle_command(message)
+    if intent is None:
+        return None
+    logger.info(f"Memory-Befehl ohne LLM beantwortet: {intent}")
+    return {"reasoning": "", "answer": answer, "has_reasoning": False, "memory_action": intent}
+
+def open_chat_session(data: Dict[str, Any]) -> ChatSession:
+    """
+    Sitzung zur Anfrage öffnen (über "session_id", sonst eine neue).
+    
+    Hat die Sitzung noch keinen Verlauf (neue Sitzung, Serverneustart), wird
+    der vom Client gesendete "context" übernommen.
+    """
+    session = get_session_store().get(data.get('session_id'))
+    context = data.get('context') or []
+    if context:
+        session.seed(context)
+    return session
+
+def record_chat_turn(session: ChatSession, message: str, response: Dict[str, Any]):
+    """
+    Frage und Antwort im Sitzungsverlauf ablegen (nicht bei Fehlern).
+    
+    Abgelegt wird die reine Nachricht ("history_message" aus
+    prepare_chat_request); Datei-Abschnitte wählt jede Runde neu aus dem
+    Dokument-Index aus, sie gehören nicht in den Verlauf.
+    """
+    if response.get('error') or not response.get('answer'):
+        return
+    session.add_turn(message, response['answer'])
+
+def prepare_chat_request(data: Dict[str, Any], session: Optional[ChatSession] = None) -> Dict[str, Any]:
+    """
+    Chat-Anfrage vorbereiten: Memory-Kontext und Dateien einbinden.
+    
+    Alle Teile des Prompts werden gegen das Kontextfenster des Modells
+    gezählt (siehe services.token_budget): System-Prompt und Nachricht
+    zuerst, der Rest wird fair auf Erinnerungen, Datei-Abschnitte und
+    Verlauf verteilt und jeder Teil auf seinen Anteil gekürzt.
+    
+    Args:
+        data: JSON-Daten der /api/chat-Anfrage
+        session: Sitzung, deren Verlauf als Kontext dient (sonst "context" der Anfrage)
+        
+    Returns:
+        dict: Argumente für die Ollama-Anfrage plus "prompt_budget"
+              (Aufteilung des Kontextfensters) und "history_message"
+              (Nachricht ohne Datei-Abschnitte für den Verlauf), beide
+              vor dem Aufruf entfernen
+    """
+    model = data.get('model', config.DEFAULT_MODEL)
+    message = data.get('message', '')
+    system_prompt = data.get('system_prompt', '')
+    temperature = float(data.get('temperature', config.DEFAULT_TEMPERATURE))
+    context = session.history() if session is not None else data.get('context', [])
+    images = data.get('images', [])
+    files = data.get('files', [])
+    file_ids = data.get('file_ids', [])
+    
+    # System-Prompt höchstens das halbe Fenster, die Nachricht den Rest
+    budget = PromptBudget(model)
+    system_prompt = budget.fit_text("system", system_prompt, budget.remaining // 2)
+    message = budget.fit_text("message", message, budget.remaining)
+    history_message = message
+    
+    # Erinnerungen wechseln von Runde zu Runde: Sie kommen hinter den Verlauf,
+    # damit System-Prompt und Verlauf als Präfix im Ollama-Cache bleiben
+    relevant_memories = []
+    try:
+        # Die zur Nachricht passendsten Erinnerungen innerhalb des Token-Budgets
+        relevant_memories = retrieve_memories(message)
+    except Exception as memory_error:
+        logger.warning(f"Fehler beim Laden der Erinnerungen: {memory_error}")
+    
+    # Dateien verarbeiten falls vorhanden (Base64 im JSON oder per /api/upload hochgeladen)
+    # und im Dokument-Index der Sitzung ablegen
+    documents = session.documents if session is not None else None
+    new_documents = []
+    if files or file_ids:
+        try:
+            processed_files = parse_uploaded_files(files, file_ids)
+            if processed_files:
+                if documents is None:
+                    documents = session.document_index() if session is not None else create_document_index()
+                new_documents = [documents.add(file_data) for file_data in processed_files]
+                logger.info(f"Dateien hinzugefügt: {len(processed_files)} Dateien verarbeitet")
+        except Exception as file_error:
+            logger.warning(f"Fehler beim Verarbeiten der Dateien: {file_error}")
+    
+    # Die zur Nachricht passendsten Abschnitte (auch früher hochgeladener Dokumente)
+    file_content = ""
+    if documents is not None and len(documents):
+        try:
+            file_content = _select_file_content(budget, documents, message, new_documents, config.FILE_TOKEN_BUDGET)
+        except Exception as document_error:
+            logger.warning(f"Fehler bei der Auswahl der Dokument-Abschnitte: {document_error}")
+    
+    # Restliches Fenster fair verteilen und jeden Teil auf seinen Anteil kürzen
+    shares = allocate(budget.remaining, {
+        "memories": budget.count(format_memory_block(relevant_memories)),
+        "files": budget.count(file_content),
+        "history": sum(budget.count(entry.get('content', '')) + MESSAGE_OVERHEAD for entry in context),
+    })
+    
+    background = _fit_memories(budget, relevant_memories, shares["memories"])
+    
+    if file_content and budget.count(file_content) > shares["files"]:
+        budget.truncated.append("files")
+        file_content = _select_file_content(budget, documents, message, new_documents, shares["files"])
+    if file_content:
+        budget.spend("files", budget.count(file_content))
+        # Datei-Abschnitte an die Nachricht anhängen
+        message = f"{message}\n\n{file_content}"
+        logger.info("Dokument-Kontext hinzugefügt")
+    
+    context = budget.fit_history(context, shares["history"])
+    
+    report = budget.report()
+    record_budget(report)
+    logger.info(f"Prompt-Budget {model}: {report['total']}/{report['context_window']} Tokens {report['sections']}"
+                + (f", gekürzt: {', '.join(report['truncated'])}" if report['truncated'] else ""))
+    
+    return {
+        "model_name": model,
+        "prompt": message,
+        "system_prompt": system_prompt,
+        "temperature": temperature,
+        "context": context,
+        "images": images,
+        "background": background,
+        "prompt_budget": report,
+        "history_message": history_message
+    }
+
+def _select_file_content(budget: PromptBudget, documents: DocumentIndex, message: str,
+                         new_documents: List[str], max_tokens: int) -> str:
+    """Datei-Block mit den passendsten Abschnitten, der höchstens max_tokens belegt."""
+    select_tokens = max_tokens
+    # Die Auswahl rechnet mit geschätzten Tokens; bei exakter Zählung nachregeln
+    for _ in range(3):
+        if select_tokens <= 0:
+            break
+        file_content = documents.format(documents.select(message, new_documents, select_tokens))
+        tokens = budget.count(file_content)
+        if tokens <= max_tokens:
+            return file_content
+        select_tokens = int(select_tokens * max_tokens / tokens * 0.9)
+    return ""
+
+def _fit_memories(budget: PromptBudget, memories: List[dict], max_tokens: int) -> str:
+    """Erinnerungen in Relevanzreihenfolge übernehmen, solange der Block in max_tokens passt."""
+    selected = []
+    block = ""
+    for memory in memories:
+        candidate = format_memory_block(selected + [memory])
+        if budget.count(candidate) > max_tokens:
+            continue
+        selected.append(memory)
+        block = candidate
+    if len(selected) < len(memories):
+        budget.truncated.append("memories")
+    if selected:
+        logger.info(f"Memory-Kontext hinzugefügt: {len(selected)} Erinnerungen")
+    budget.spend("memories", budget.count(block))
+    return block
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Abschnittssuche in hochgeladenen Dokumenten.
+Statt jede Datei hart nach 5000 Zeichen abzuschneiden, wird der extrahierte
+Text entlang seiner Struktur (Seiten, Tabellenblätter, Überschriften,
+Absätze) in Abschnitte zerlegt und pro Sitzung indiziert (BM25, optional
+Embeddings). In den Prompt kommen die zur Nachricht passendsten Abschnitte
+innerhalb eines Token-Budgets; passt ein Dokument vollständig hinein, wird
+es ganz übernommen. Spätere Fragen derselben Sitzung finden Abschnitte
+früher hochgeladener Dokumente, ohne dass diese erneut gesendet werden.
+"""
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from services.search_index import BM25Index, VectorIndex, combine_scores, create_embedder
+from services.token_budget import CHARS_PER_TOKEN, MESSAGE_OVERHEAD, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Abschnittsmarken der Parser ("--- Page 3 ---", "--- Sheet: Umsatz ---") und Markdown-Überschriften
+_SECTION_PATTERN = re.compile(r"^(?:--- (?P<marker>.+?) ---|(?P<heading>#{1,6} .+))$", re.MULTILINE)
+_PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+
+# Abschnitte mit weniger als diesem Anteil des besten Scores kommen nicht in den Prompt
+_MIN_RELATIVE_SCORE = 0.4
+
+def _split_sections(text: str) -> List[Tuple[Optional[str], str]]:
+    """Text an Abschnittsmarken und Überschriften in (Bezeichnung, Text) zerlegen."""
+    sections = []
+    label = None
+    start = 0
+    for match in _SECTION_PATTERN.finditer(text):
+        sections.append((label, text[start:match.start()]))
+        if match.group("marker"):
+            label = match.group("marker").strip()
+            start = match.end()
+        else:
+            # Überschriften bleiben Teil des Texts
+            label = match.group("heading").lstrip("#").strip()
+            start = match.start()
+    sections.append((label, text[start:]))
+    return [(label, body.strip()) for label, body in sections if body.strip()]
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    """Zu langen Absatz zeilenweise, zu lange Zeilen an Leerzeichen aufteilen."""
+    pieces = []
+    for line in text.split("\n"):
+        while len(line) > max_chars:
+            cut = line.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(line[:cut])
+            line = line[cut:].lstrip()
+        pieces.append(line)
+    return pieces
+
+def chunk_document(text: str, max_chars: int) -> List[Dict[str, Any]]:
+    """
+    Extrahierten Text strukturerhaltend in Abschnitte zerlegen.
+
+    Seiten, Tabellenblätter und Überschriften beginnen immer einen neuen
+    Abschnitt; darin werden Absätze (zu lange Absätze zeilenweise) bis
+    max_chars zusammengefasst. Bei Tabellenblättern steht die erste Zeile
+    (meist die Spaltenüberschriften) vor jedem weiteren Abschnitt.
+
+    Returns:
+        List[dict]: {"label": Seite/Blatt/Überschrift oder None, "text": str}
+    """
+    chunks = []
+    for label, body in _split_sections(text):
+        header = None
+        if label and label.startswith("Sheet:"):
+            header = body.split("\n", 1)[0]
+
+        # (Text, Trennzeichen davor): Zeilen eines Absatzes bleiben einfach umbrochen
+        parts = []
+        for paragraph in _PARAGRAPH_PATTERN.split(body):
+            if len(paragraph) > max_chars:
+                lines = _split_long(paragraph, max_chars)
+                parts.extend((line, "\n\n" if i == 0 else "\n") for i, line in enumerate(lines) if line.strip())
+            elif paragraph.strip():
+                parts.append((paragraph, "\n\n"))
+
+        text = ""
+        for part, separator in parts:
+            if text and len(text) + len(separator) + len(part) > max_chars:
+                chunks.append({"label": label, "text": text})
+                text = header if header and part != header else ""
+                separator = "\n"
+            text = f"{text}{separator}{part}" if text else part
+        if text:
+            chunks.append({"label": label, "text": text})
+    return chunks
+
+class DocumentIndex:
+    """
+    Abschnitte aller Dokumente einer Sitzung mit BM25- und optionalem Vektor-Index.
+
+    Args:
+        chunk_chars: Höchstlänge eines Abschnitts in Zeichen
+        max_chars: Höchstgröße aller Dokumente zusammen (die ältesten fliegen raus)
+        embedder: Optionaler Embedder (siehe search_index.create_embedder)
+        embedding_weight: Gewicht der Embedding-Ähnlichkeit gegenüber BM25
+    """
+
+    def __init__(self, chunk_chars: int, max_chars: int, embedder=None, embedding_weight: float = 1.0):
+        self.chunk_chars = chunk_chars
+        self.max_chars = max_chars
+        self.embedder = embedder
+        self.embedding_weight = embedding_weight
+        self._bm25 = BM25Index()
+        self._vectors = VectorIndex() if embedder else None
+        self._documents: "OrderedDict[str, dict]" = OrderedDict()  # Schlüssel -> Metadaten und Abschnitte
+        self._size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, file_data: Dict[str, Any]) -> str:
+        """
+        Verarbeitete Datei (siehe file_service.parse_uploaded_files) indizieren.
+
+        Returns:
+            str: Schlüssel des Dokuments (SHA-256 des Texts); bereits
+                 indizierte Dokumente werden nicht erneut zerlegt
+        """
+        content = file_data.get('content', '')
+        key = hashlib.sha256(content.encode("utf-8", errors="replace")).hexdigest()
+        with self._lock:
+            if key in self._documents:
+                self._documents.move_to_end(key)
+                return key
+
+        chunks = chunk_document(content, self.chunk_chars)
+        for position, chunk in enumerate(chunks):
+            chunk["position"] = position
+            chunk["tokens"] = estimate_tokens(chunk["text"]) + MESSAGE_OVERHEAD
+        vectors = self._embed(chunks)
+
+        with self._lock:
+            self._documents[key] = {
+                "name": file_data.get('name', 'Unknown'),
+                "extension": file_data.get('extension', ''),
+                "size": file_data.get('size', 0),
+                "chars": len(content),
+                "chunks": chunks,
+            }
+            self._size += len(content)
+            for chunk in chunks:
+                # Dateiname und Bezeichnung mitindizieren ("Was steht in bericht.pdf auf Seite 3?")
+                self._bm25.add((key, chunk["position"]),
+                               f"{file_data.get('name', '')} {chunk['label'] or ''}\n{chunk['text']}")
+            if vectors is not None and self._vectors is not None:
+                self._vectors.add_many([(key, chunk["position"]) for chunk in chunks], vectors)
+            while self._size > self.max_chars and len(self._documents) > 1:
+                self._remove_oldest()
+        _record(documents=1, chunks=len(chunks))
+        logger.info(f"Dokument indiziert: {file_data.get('name')} ({len(chunks)} Abschnitte)")
+        return key
+
+    def _embed(self, chunks: List[dict]):
+        if self.embedder is None or not chunks:
+            return None
+        try:
+            return self.embedder.embed([chunk["text"] for chunk in chunks])
+        except Exception as e:
+            # Ohne Embeddings weiter mit BM25 allein
+            logger.warning(f"Embeddings nicht verfügbar, verwende nur BM25: {e}")
+            self.embedder = None
+            self._vectors = None
+            return None
+
+    def _remove_oldest(self):
+        key, document = self._documents.popitem(last=False)
+        self._size -= document["chars"]
+        for chunk in document["chunks"]:
+            self._bm25.remove((key, chunk["position"]))
+            if self._vectors is not None:
+                self._vectors.remove((key, chunk["position"]))
+        logger.debug(f"Dokument aus dem Sitzungsindex entfernt: {document['name']}")
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[Tuple[str, int], float]]:
+        """
+        Die k relevantesten Abschnitte aller Dokumente suchen.
+
+        Returns:
+            List[Tuple[(Dokument, Position), float]]: Absteigend nach Relevanz
+        """
+        query_vector = None
+        if self._vectors is not None and query.strip():
+            try:
+                query_vector = self.embedder.embed([query])[0]
+            except Exception as e:
+                logger.warning(f"Embedding der Anfrage fehlgeschlagen: {e}")
+
+        with self._lock:
+            rankings = [self._bm25.search(query, k)]
+            weights = [1.0]
+            if query_vector is not None and self._vectors is not None:
+                rankings.append(self._vectors.search(query_vector, k))
+                weights.append(self.embedding_weight)
+            ranked = combine_scores(*rankings, weights=weights)
+            return [(chunk_id, score) for chunk_id, score in ranked[:k] if chunk_id[0] in self._documents]
+
+    def select(self, query: str, keys: List[str], token_budget: int) -> List[Tuple[str, List[dict]]]:
+        """
+        Abschnitte für den Prompt auswählen.
+
+        Passen die neu angehängten Dokumente (keys) vollständig ins Budget,
+        werden sie ganz übernommen. Sonst kommt von jedem neuen Dokument der
+        Anfang (als Überblick), danach die relevantesten Abschnitte aller
+        Dokumente der Sitzung (ab 40 % des besten Scores), solange das
+        Budget reicht. Ohne neue Dokumente
+        werden nur Abschnitte mit Treffer ausgewählt.
+
+        Returns:
+            List[Tuple[str, List[dict]]]: (Dokument, Abschnitte in Dokumentreihenfolge)
+        """
+        with self._lock:
+            keys = [key for key in dict.fromkeys(keys) if key in self._documents]
+            full_tokens = sum(chunk["tokens"] for key in keys for chunk in self._documents[key]["chunks"])
+            if keys and full_tokens <= token_budget:
+                _record(full_documents=len(keys), selected_tokens=full_tokens,
+                        selected_chunks=sum(len(self._documents[key]["chunks"]) for key in keys))
+                return [(key, list(self._documents[key]["chunks"])) for key in keys]
+
+        candidates = [(key, 0) for key in keys]
+        ranked = self.search(query, max(20, token_budget * CHARS_PER_TOKEN // self.chunk_chars * 2))
+        # Schwache Treffer weglassen: gezielte Fragen kosten dann weniger als das volle Budget
+        cutoff = ranked[0][1] * _MIN_RELATIVE_SCORE if ranked else 0.0
+        candidates += [chunk_id for chunk_id, score in ranked if score >= cutoff]
+
+        selected: Dict[str, Dict[int, dict]] = OrderedDict()
+        used = 0
+        with self._lock:
+            for key, position in candidates:
+                document = self._documents.get(key)
+                if document is None or not document["chunks"] or position in selected.get(key, {}):
+                    continue
+                chunk = document["chunks"][position]
+                if used + chunk["tokens"] > token_budget:
+                    continue
+                selected.setdefault(key, {})[position] = chunk
+                used += chunk["tokens"]
+
+        _record(retrievals=1, selected_tokens=used, selected_chunks=sum(len(chunks) for chunks in selected.values()))
+        return [(key, [chunks[position] for position in sorted(chunks)]) for key, chunks in selected.items()]
+
+    def format(self, selection: List[Tuple[str, List[dict]]]) -> str:
+        """Ausgewählte Abschnitte als Datei-Block für das LLM formatieren."""
+        if not selection:
+            return ""
+        formatted_content = "\n=== UPLOADED FILES ===\n"
+        with self._lock:
+            for i, (key, chunks) in enumerate(selection, 1):
+                document = self._documents.get(key)
+                if document is None:
+                    continue
+                total = len(document["chunks"])
+                shown = "" if len(chunks) == total else f", {len(chunks)} of {total} sections shown"
+                formatted_content += (f"\n--- File {i}: {document['name']} "
+                                      f"({document['extension'].upper()}, {document['size']} bytes{shown}) ---\n")
+                previous = -1
+                for chunk in chunks:
+                    if chunk["position"] != previous + 1:
+                        formatted_content += "[...]\n"
+                    if chunk["label"]:
+                        formatted_content += f"[{chunk['label']}]\n"
+                    formatted_content += chunk["text"] + "\n"
+                    previous = chunk["position"]
+                if previous != total - 1:
+                    formatted_content += "[...]\n"
+                formatted_content += "-" * 50 + "\n"
+        formatted_content += "\n=== END FILES ===\n"
+        return formatted_content
+
+def create_document_index() -> DocumentIndex:
+    """Leeren Dokument-Index mit den Einstellungen aus config erstellen."""
+    return DocumentIndex(
+        chunk_chars=config.FILE_CHUNK_TOKENS * CHARS_PER_TOKEN,
+        max_chars=config.FILE_INDEX_MAX_CHARS,
+        embedder=create_embedder(config.FILE_EMBEDDINGS, config.FILE_EMBEDDING_MODEL)
+    )
+
+# Kennzahlen über alle Sitzungen
+_stats = {"documents": 0, "chunks": 0, "retrievals": 0, "full_documents": 0,
+          "selected_chunks": 0, "selected_tokens": 0}
+_stats_lock = threading.Lock()
+
+def _record(**counts):
+    with _stats_lock:
+        for name, value in counts.items():
+            _stats[name] += value
+
+def document_index_stats() -> dict:
+    """Kennzahlen der Dokument-Indizes (indizierte Dokumente, ausgewählte Abschnitte)."""
+    with _stats_lock:
+        return dict(_stats)
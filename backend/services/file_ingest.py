@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Parallele Verarbeitung hochgeladener Dateien.
+CPU-lastige Parser (PDF, DOCX, XLSX) laufen in einem Pool von
+Worker-Prozessen: Mehrere Dateien nutzen alle Kerne, und ein großes PDF
+blockiert keinen Request-Thread (und nicht das GIL). Jede Datei hat eine
+Zeitgrenze, jeder Worker eine Speichergrenze (beides nur unter Unix
+erzwungen); ein abgestürzter Worker betrifft nur die eigene Datei.
+"""
+import concurrent.futures
+import logging
+import math
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Zusätzliche Wartezeit im Server-Prozess, falls der Worker die Zeitgrenze nicht selbst durchsetzen kann
+_GRACE_SECONDS = 5.0
+
+# --- Im Worker-Prozess ---
+
+class _ParseTimeout(BaseException):
+    """Zeitgrenze überschritten (BaseException: Parser fangen Exception pro Seite ab)."""
+
+_deadline_active = False
+
+def _on_alarm(signum, frame):
+    if _deadline_active:
+        raise _ParseTimeout()
+
+def _init_worker(memory_mb: int):
+    """Initializer der Worker-Prozesse: Speichergrenze setzen (falls unterstützt)."""
+    if memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        logger.debug(f"Speichergrenze für Datei-Worker nicht gesetzt: {e}")
+
+def _timeout_error(timeout: float) -> str:
+    return f"Zeitlimit von {timeout:g}s überschritten"
+
+def _run_limited(func: Callable, args: tuple, timeout: float) -> Tuple[Optional[str], Optional[str], bool]:
+    """
+    func(*args) mit Zeitgrenze ausführen.
+
+    Returns:
+        tuple: (Ergebnis, Fehlermeldung, Zeitgrenze überschritten)
+    """
+    global _deadline_active
+    use_alarm = timeout > 0 and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        _deadline_active = True
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        result = func(*args)
+        _deadline_active = False
+        return result, None, False
+    except _ParseTimeout:
+        return None, _timeout_error(timeout), True
+    except MemoryError:
+        return None, "Speichergrenze überschritten", False
+    finally:
+        _deadline_active = False
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+# --- Im Server-Prozess ---
+
+class FileParsePool:
+    """
+    Worker-Prozesse für das Parsen von Dateien (wird beim ersten Aufruf gestartet).
+
+    Args:
+        workers: Anzahl Worker-Prozesse (0 = alles im aufrufenden Thread)
+        timeout: Sekunden je Datei
+        memory_mb: Speichergrenze je Worker in MB (0 = keine)
+    """
+
+    def __init__(self, workers: int, timeout: float, memory_mb: int):
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.files = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.parse_seconds = 0.0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn statt fork: keine geerbten Threads/Event-Loops im Worker
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.memory_mb,)
+                )
+                logger.info(f"Datei-Worker gestartet ({self.workers} Prozesse)")
+            return self._pool
+
+    def _reset_pool(self, broken: ProcessPoolExecutor):
+        """Abgestürzten Pool verwerfen; der nächste Aufruf startet einen neuen."""
+        with self._lock:
+            if self._pool is broken:
+                self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, func: Callable, jobs: List[tuple]) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        func für alle Argument-Tupel parallel in den Workern ausführen.
+
+        Args:
+            func: Auf Modulebene definierte Funktion (wird per Namen an die Worker übergeben)
+            jobs: Argumente je Aufruf
+
+        Returns:
+            List[tuple]: (Ergebnis, Fehlermeldung) je Job, in der Reihenfolge von jobs
+        """
+        if not jobs:
+            return []
+        start = time.perf_counter()
+        if self.workers <= 0:
+            results = [_run_limited(func, args, 0) for args in jobs]
+        else:
+            results = self._run_in_workers(func, jobs)
+        with self._lock:
+            self.files += len(jobs)
+            self.timeouts += sum(1 for *_, timed_out in results if timed_out)
+            self.parse_seconds += time.perf_counter() - start
+        return [(result, error) for result, error, _ in results]
+
+    def _run_in_workers(self, func: Callable, jobs: List[tuple]) -> List[Tuple[Optional[str], Optional[str], bool]]:
+        pool = self._get_pool()
+        try:
+            futures = [pool.submit(_run_limited, func, args, self.timeout) for args in jobs]
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._reset_pool(pool)
+            return [(None, f"Worker-Fehler: {e}", False)] * len(jobs)
+
+        # Sicherheitsnetz, falls der Worker die Zeitgrenze nicht selbst durchsetzt (z.B. Windows)
+        rounds = math.ceil(len(jobs) / self.workers)
+        deadline = time.monotonic() + rounds * self.timeout + _GRACE_SECONDS if self.timeout > 0 else None
+        results = []
+        for future in futures:
+            try:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                result = future.result(timeout=remaining)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                result = (None, _timeout_error(self.timeout), True)
+            except BrokenProcessPool as e:
+                # Worker abgestürzt (z.B. Speicher): nur die betroffenen Dateien gehen verloren
+                with self._lock:
+                    self.crashes += 1
+                logger.error(f"Datei-Worker abgestürzt, starte Pool neu: {e}")
+                self._reset_pool(pool)
+                result = (None, "Worker abgestürzt", False)
+            except Exception as e:
+                result = (None, f"Worker-Fehler: {e}", False)
+            results.append(result)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._pool is not None,
+                "files": self.files,
+                "timeouts": self.timeouts,
+                "crashes": self.crashes,
+                "parse_seconds": round(self.parse_seconds, 2),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+_parse_pool: Optional[FileParsePool] = None
+_parse_pool_lock = threading.Lock()
+
+def get_parse_pool() -> FileParsePool:
+    """Gemeinsamen Datei-Pool abrufen (Worker starten erst beim ersten Parsen)."""
+    global _parse_pool
+    if _parse_pool is None:
+        with _parse_pool_lock:
+            if _parse_pool is None:
+                _parse_pool = FileParsePool(config.FILE_PARSE_WORKERS, config.FILE_PARSE_TIMEOUT,
+                                            config.FILE_PARSE_MEMORY_MB)
+    return _parse_pool
+
+def shutdown_parse_pool():
+    """Worker-Prozesse beenden."""
+    if _parse_pool is not None:
+        _parse_pool.shutdown()
@@ -4,60 +4,123 @@ File-Service für die Verarbeitung verschiedener Dateitypen.
 """
 import logging
 import os
+import io
+import hashlib
 import mimetypes
-from typing import Dict, List, Any, Optional
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Union
 import base64
 
+import config
+from services.file_ingest import get_parse_pool
+from services.parse_cache import get_parse_cache
+from services.upload_store import get_upload_store
+
 logger = logging.getLogger(__name__)
 
 # Text-basierte Dateien
 TEXT_EXTENSIONS = {'.txt', '.md', '.py', '.js', '.html', '.css', '.json', '.xml', 
                   '.yaml', '.yml', '.log', '.sql', '.sh', '.bat', '.ps1', '.csv'}
 
-def parse_uploaded_files(files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+# CPU-lastige Formate, die in Worker-Prozessen geparst (und im Parse-Cache abgelegt) werden
+WORKER_EXTENSIONS = {'.pdf', '.docx', '.doc', '.xlsx', '.xls'}
+
+# Erhöhen, wenn sich die Ausgabe der Parser ändert (macht den Parse-Cache ungültig)
+PARSER_VERSION = 2
+
+# Platzhalter statt Inhalt (fehlende Bibliothek, Parser-Fehler): nicht cachen
+_PLACEHOLDER_PREFIXES = ('[PDF-Datei:', '[Word-Datei:', '[Excel-Datei:')
+
+def parse_uploaded_files(files: List[Dict[str, Any]], file_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     Verarbeitet hochgeladene Dateien und extrahiert den Inhalt.
     
+    PDF-, Word- und Excel-Dateien werden gleichzeitig in Worker-Prozessen
+    geparst (siehe services.file_ingest), Textdateien direkt. Bereits
+    extrahierte Dokumente kommen aus dem Parse-Cache (gleicher SHA-256). Base64-Dateien,
+    mit denen die Anfrage FILE_MAX_TOTAL_BYTES überschreiten würde, werden
+    übersprungen. Per /api/upload hochgeladene Dateien (file_ids) werden von
+    der Festplatte gelesen, ohne sie vollständig in den Speicher zu laden.
+    
     Args:
         files: Liste von Datei-Dictionaries mit 'name', 'type', 'data'
+        file_ids: IDs aus /api/upload
         
     Returns:
         Liste von verarbeiteten Dateien mit Inhalt
     """
-    processed_files = []
+    # (Name, Typ, Erweiterung, Inhalt oder Pfad, Größe, SHA-256 falls bekannt)
+    sources = []
+    total_bytes = 0
     
     for file_data in files:
+        file_name = file_data.get('name', 'unknown')
+        file_type = file_data.get('type', 'unknown')
+        file_content_b64 = file_data.get('data', '')
+        
+        logger.info(f"Verarbeite Datei: {file_name} ({file_type})")
+        
+        # Größe vor dem Dekodieren prüfen (Base64: 4 Zeichen je 3 Bytes)
+        if total_bytes + len(file_content_b64) * 3 // 4 > config.FILE_MAX_TOTAL_BYTES:
+            logger.warning(f"Datei {file_name} übersprungen: Gesamtgröße über {config.FILE_MAX_TOTAL_BYTES // (1024 * 1024)} MB")
+            continue
+        
+        # Base64 dekodieren
         try:
-            file_name = file_data.get('name', 'unknown')
-            file_type = file_data.get('type', 'unknown')
-            file_content_b64 = file_data.get('data', '')
-            
-            logger.info(f"Verarbeite Datei: {file_name} ({file_type})")
-            
-            # Base64 dekodieren
-            try:
-                file_content = base64.b64decode(file_content_b64)
-            except Exception as e:
-                logger.error(f"Fehler beim Dekodieren von {file_name}: {e}")
-                continue
-            
-            # Dateierweiterung ermitteln
-            file_ext = os.path.splitext(file_name)[1].lower()
-            
-            # Datei verarbeiten basierend auf Typ
-            parsed_content = None
-            
-            if file_ext in TEXT_EXTENSIONS:
-                parsed_content = parse_text_file(file_content, file_name)
-            elif file_ext == '.pdf':
-                parsed_content = parse_pdf_file(file_content, file_name)
-            elif file_ext in {'.docx', '.doc'}:
-                parsed_content = parse_word_file(file_content, file_name)
-            elif file_ext in {'.xlsx', '.xls'}:
-                parsed_content = parse_excel_file(file_content, file_name)
+            file_content = base64.b64decode(file_content_b64)
+        except Exception as e:
+            logger.error(f"Fehler beim Dekodieren von {file_name}: {e}")
+            continue
+        
+        total_bytes += len(file_content)
+        # Dateierweiterung ermitteln
+        file_ext = os.path.splitext(file_name)[1].lower()
+        sources.append((file_name, file_type, file_ext, file_content, len(file_content), None))
+    
+    for file_id in file_ids or []:
+        upload = get_upload_store().get(file_id)
+        if upload is None:
+            logger.warning(f"Upload {file_id} unbekannt oder abgelaufen")
+            continue
+        logger.info(f"Verarbeite Upload: {upload['name']} ({upload['type']})")
+        file_ext = os.path.splitext(upload['name'])[1].lower()
+        sources.append((upload['name'], upload['type'], file_ext, upload['path'], upload['size'], upload.get('sha256')))
+    
+    # Bereits extrahierte Dokumente aus dem Cache holen
+    cache_keys = {}
+    cached = {}
+    if config.PARSE_CACHE_ENABLED:
+        for index, (_, _, file_ext, source, _, digest) in enumerate(sources):
+            if file_ext in WORKER_EXTENSIONS:
+                cache_keys[index] = _parse_cache_key(_content_hash(source, digest), file_ext)
+                text = get_parse_cache().get(cache_keys[index])
+                if text is not None:
+                    cached[index] = text
+    
+    # CPU-lastige Formate parallel in den Workern, den Rest direkt
+    worker_indexes = [index for index, entry in enumerate(sources)
+                      if entry[2] in WORKER_EXTENSIONS and index not in cached]
+    worker_results = dict(zip(worker_indexes, get_parse_pool().run(
+        parse_file_content, [(source, name, ext) for name, _, ext, source, _, _ in (sources[index] for index in worker_indexes)]
+    )))
+    
+    for index, (parsed_content, error) in worker_results.items():
+        if index in cache_keys and parsed_content and not error and not parsed_content.startswith(_PLACEHOLDER_PREFIXES):
+            get_parse_cache().put(cache_keys[index], parsed_content)
+    
+    processed_files = []
+    for index, (file_name, file_type, file_ext, source, size, _) in enumerate(sources):
+        try:
+            if index in cached:
+                logger.info(f"Datei aus dem Parse-Cache: {file_name}")
+                parsed_content = cached[index]
+            elif index in worker_results:
+                parsed_content, error = worker_results[index]
+                if error:
+                    logger.error(f"Fehler beim Verarbeiten der Datei {file_name}: {error}")
+                    parsed_content = f"[Datei: {file_name} - {error}]"
             else:
-                # Versuche als Text zu lesen
-                parsed_content = parse_text_file(file_content, file_name)
+                parsed_content = parse_file_content(source, file_name, file_ext)
             
             if parsed_content:
                 processed_files.append({
@@ -65,7 +128,7 @@ def parse_uploaded_files(files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
                     'type': file_type,
                     'extension': file_ext,
                     'content': parsed_content,
-                    'size': len(file_content)
+                    'size': size
                 })
                 
         except Exception as e:
@@ -75,6 +138,64 @@ def parse_uploaded_files(files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     logger.info(f"Erfolgreich {len(processed_files)} Dateien verarbeitet")
     return processed_files
 
+def _content_hash(source: Union[bytes, str], digest: Optional[str] = None) -> str:
+    """SHA-256 des Dateiinhalts (Dateien auf der Festplatte blockweise gelesen)."""
+    if digest:
+        return digest
+    if not isinstance(source, str):
+        return hashlib.sha256(source).hexdigest()
+    sha = hashlib.sha256()
+    with open(source, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def _parse_cache_key(content_hash: str, file_ext: str) -> str:
+    """Schlüssel im Parse-Cache: Inhalt, Dateityp, Parser-Version und Textgrenze bestimmen das Ergebnis."""
+    return hashlib.sha256(f"{PARSER_VERSION}:{file_ext}:{config.FILE_MAX_CHARS}:{content_hash}".encode()).hexdigest()
+
+def parse_file_content(source: Union[bytes, str], file_name: str, file_ext: str) -> Optional[str]:
+    """
+    Inhalt einer Datei passend zum Dateityp extrahieren (läuft auch in den Worker-Prozessen).
+    
+    Args:
+        source: Dateiinhalt oder Pfad einer hochgeladenen Datei
+    """
+    if file_ext == '.pdf':
+        return parse_pdf_file(source, file_name)
+    elif file_ext in {'.docx', '.doc'}:
+        return parse_word_file(source, file_name)
+    elif file_ext in {'.xlsx', '.xls'}:
+        return parse_excel_file(source, file_name)
+    else:
+        # Textdateien; unbekannte Typen ebenfalls als Text versuchen
+        return parse_text_file(_read_bytes(source), file_name)
+
+def _read_bytes(source: Union[bytes, str]) -> bytes:
+    """Inhalt als Bytes; von Dateien auf der Festplatte nur so viel, wie für FILE_MAX_CHARS Zeichen nötig ist."""
+    if not isinstance(source, str):
+        return source
+    limit = config.FILE_MAX_CHARS * 4  # UTF-8: höchstens 4 Bytes je Zeichen
+    with open(source, 'rb') as f:
+        content = f.read(limit + 1)
+    if len(content) > limit:
+        # An einem Zeilenende abschneiden, damit kein UTF-8-Zeichen zerteilt wird
+        content = content[:content.rfind(b'\n', 0, limit) + 1 or limit]
+    return content
+
+@contextmanager
+def _open_source(source: Union[bytes, str]):
+    """
+    Dateiinhalt als BytesIO, hochgeladene Dateien als geöffnete Datei: Die
+    Parser lesen daraus nur die benötigten Teile (PyPDF2 würde einen Pfad
+    vollständig einlesen).
+    """
+    if not isinstance(source, str):
+        yield io.BytesIO(source)
+        return
+    with open(source, 'rb') as f:
+        yield f
+
 def parse_text_file(content: bytes, filename: str) -> Optional[str]:
     """Verarbeitet Text-Dateien."""
     try:
@@ -92,28 +213,35 @@ def parse_text_file(content: bytes, filename: str) -> Optional[str]:
         logger.error(f"Fehler beim Lesen der Text-Datei {filename}: {e}")
         return None
 
-def parse_pdf_file(content: bytes, filename: str) -> Optional[str]:
+def parse_pdf_file(source: Union[bytes, str], filename: str) -> Optional[str]:
     """Verarbeitet PDF-Dateien."""
     try:
         import PyPDF2
-        import io
         
-        # PDF aus Bytes lesen
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
-        
-        text_content = []
-        for page_num, page in enumerate(pdf_reader.pages):
-            try:
-                page_text = page.extract_text()
-                if page_text.strip():
-                    text_content.append(f"--- Page {page_num + 1} ---\n{page_text}")
-            except Exception as e:
-                logger.warning(f"Fehler beim Lesen von Seite {page_num + 1} in {filename}: {e}")
-                continue
+        with _open_source(source) as stream:
+            # Seiten werden erst beim Zugriff geparst
+            pdf_reader = PyPDF2.PdfReader(stream)
+            page_count = len(pdf_reader.pages)
+            
+            text_content = []
+            extracted_chars = 0
+            for page_num, page in enumerate(pdf_reader.pages):
+                # Genug Text: restliche Seiten gar nicht erst parsen
+                if extracted_chars >= config.FILE_MAX_CHARS:
+                    text_content.append(f"... ({page_count - page_num} more pages not read)")
+                    break
+                try:
+                    page_text = page.extract_text()
+                    if page_text.strip():
+                        text_content.append(f"--- Page {page_num + 1} ---\n{page_text}")
+                        extracted_chars += len(page_text)
+                except Exception as e:
+                    logger.warning(f"Fehler beim Lesen von Seite {page_num + 1} in {filename}: {e}")
+                    continue
         
         if text_content:
             result = "\n\n".join(text_content)
-            logger.info(f"PDF erfolgreich verarbeitet: {filename} ({len(pdf_reader.pages)} Seiten)")
+            logger.info(f"PDF erfolgreich verarbeitet: {filename} ({page_count} Seiten)")
             return result
         else:
             return f"[PDF-Datei: {filename} - Kein Text extrahierbar (möglicherweise nur Bilder)]"
@@ -125,19 +253,24 @@ def parse_pdf_file(content: bytes, filename: str) -> Optional[str]:
         logger.error(f"Fehler beim Lesen der PDF-Datei {filename}: {e}")
         return f"[PDF-Datei: {filename} - Fehler beim Parsen: {str(e)}]"
 
-def parse_word_file(content: bytes, filename: str) -> Optional[str]:
+def parse_word_file(source: Union[bytes, str], filename: str) -> Optional[str]:
     """Verarbeitet Word-Dateien."""
     try:
         from docx import Document
-        import io
         
-        # Word-Dokument aus Bytes lesen
-        doc = Document(io.BytesIO(content))
+        # Word-Dokument lesen
+        with _open_source(source) as stream:
+            doc = Document(stream)
         
         text_content = []
         for paragraph in doc.paragraphs:
             if paragraph.text.strip():
-                text_content.append(paragraph.text)
+                # Überschriften als Abschnittsmarke (wie Seiten und Tabellenblätter)
+                style = getattr(paragraph.style, 'name', '') or ''
+                if style.startswith(('Heading', 'Title', 'Überschrift', 'Titel')):
+                    text_content.append(f"--- {paragraph.text.strip()} ---")
+                else:
+                    text_content.append(paragraph.text)
         
         if text_content:
             result = "\n\n".join(text_content)
@@ -153,31 +286,40 @@ def parse_word_file(content: bytes, filename: str) -> Optional[str]:
         logger.error(f"Fehler beim Lesen der Word-Datei {filename}: {e}")
         return f"[Word-Datei: {filename} - Fehler beim Parsen: {str(e)}]"
 
-def parse_excel_file(content: bytes, filename: str) -> Optional[str]:
+def parse_excel_file(source: Union[bytes, str], filename: str) -> Optional[str]:
     """Verarbeitet Excel-Dateien."""
     try:
         import openpyxl
-        import io
-        
-        # Excel-Datei aus Bytes lesen
-        workbook = openpyxl.load_workbook(io.BytesIO(content))
         
         text_content = []
-        for sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            text_content.append(f"--- Sheet: {sheet_name} ---")
-            
-            # Zelldaten lesen (erste 50 Zeilen)
-            rows_data = []
-            for row_num, row in enumerate(sheet.iter_rows(max_row=50, values_only=True), 1):
-                if any(cell is not None for cell in row):
-                    row_str = " | ".join(str(cell) if cell is not None else "" for cell in row)
-                    rows_data.append(f"Row {row_num}: {row_str}")
-            
-            text_content.append("\n".join(rows_data))
-            
-            if sheet.max_row > 50:
-                text_content.append(f"\n... ({sheet.max_row - 50} more rows)")
+        # read_only liest Zeilen beim Iterieren, statt die ganze Arbeitsmappe in den Speicher zu laden
+        with _open_source(source) as stream:
+            workbook = openpyxl.load_workbook(stream, read_only=True)
+            try:
+                extracted_chars = 0
+                for sheet in workbook.worksheets:
+                    text_content.append(f"--- Sheet: {sheet.title} ---")
+                    
+                    # Zelldaten lesen, bis FILE_MAX_CHARS erreicht ist (der Dokument-Index
+                    # wählt später die passenden Zeilen aus)
+                    rows_data = []
+                    last_row = 0
+                    for row_num, row in enumerate(sheet.iter_rows(values_only=True), 1):
+                        if extracted_chars >= config.FILE_MAX_CHARS:
+                            break
+                        last_row = row_num
+                        if any(cell is not None for cell in row):
+                            row_str = " | ".join(str(cell) if cell is not None else "" for cell in row)
+                            rows_data.append(f"Row {row_num}: {row_str}")
+                            extracted_chars += len(rows_data[-1])
+                    
+                    text_content.append("\n".join(rows_data))
+                    
+                    # max_row stammt aus der Dimensionsangabe der Datei (fehlt sie, ist es None)
+                    if sheet.max_row and sheet.max_row > last_row:
+                        text_content.append(f"\n... ({sheet.max_row - last_row} more rows)")
+            finally:
+                workbook.close()
         
         result = "\n\n".join(text_content)
         logger.info(f"Excel-Datei erfolgreich verarbeitet: {filename}")
@@ -189,35 +331,3 @@ def parse_excel_file(content: bytes, filename: str) -> Optional[str]:
     except Exception as e:
         logger.error(f"Fehler beim Lesen der Excel-Datei {filename}: {e}")
         return f"[Excel-Datei: {filename} - Fehler beim Parsen: {str(e)}]"
-
-def format_files_for_llm(files: List[Dict[str, Any]]) -> str:
-    """
-    Formatiert verarbeitete Dateien für das LLM.
-    
-    Args:
-        files: Liste verarbeiteter Dateien
-        
-    Returns:
-        Formatierter String für das LLM
-    """
-    if not files:
-        return ""
-    
-    formatted_content = "\n=== UPLOADED FILES ===\n"
-    
-    for i, file_data in enumerate(files, 1):
-        name = file_data.get('name', 'Unknown')
-        content = file_data.get('content', '')
-        size = file_data.get('size', 0)
-        ext = file_data.get('extension', '')
-        
-        formatted_content += f"\n--- File {i}: {name} ({ext.upper()}, {size} bytes) ---\n"
-        formatted_content += content[:5000]  # Limit auf 5000 Zeichen pro Datei
-        
-        if len(content) > 5000:
-            formatted_content += "\n... [Content truncated] ..."
-        
-        formatted_content += "\n" + "-" * 50 + "\n"
-    
-    formatted_content += "\n=== END FILES ===\n"
-    return formatted_content
\ No newline at end of file
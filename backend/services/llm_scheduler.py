@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+Zulassungssteuerung für LLM-Anfragen.
+Pro Modell laufen höchstens MODEL_CONCURRENCY Anfragen gleichzeitig; weitere
+warten in einer begrenzten Warteschlange (nach Priorität, sonst FIFO). Ist
+die Warteschlange voll, wird sofort abgelehnt (429); wer länger als
+QUEUE_TIMEOUT wartet, wird ebenfalls abgewiesen (503). So bleibt Ollama bei
+Lastspitzen im effizienten Bereich, statt alle Anfragen gemeinsam zu bremsen.
+
+Synchron (Flask, Threads) und asynchron (ASGI, asyncio) teilen sich dieselbe
+Warteschlange.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+class AdmissionError(Exception):
+    """Anfrage wurde nicht zugelassen (status: 429 bei voller Warteschlange, 503 nach Ablauf der Wartezeit)."""
+
+    def __init__(self, message: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class Ticket:
+    """Platz einer Anfrage in der Warteschlange eines Modells."""
+
+    def __init__(self, queue: "_ModelQueue", priority: int, seq: int, deadline: float):
+        self.queue = queue
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.deadline = deadline
+        self.granted = False
+        self.done = False
+        self.wait_ms = 0.0
+        self._event = threading.Event()
+        self._waiters: List[Callable[[], None]] = []
+        self._granted_future: Optional[asyncio.Future] = None
+
+    def __lt__(self, other: "Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    @property
+    def position(self) -> int:
+        """Position in der Warteschlange (0 = läuft bereits)."""
+        return self.queue.position(self)
+
+    def wait(self, timeout: float) -> bool:
+        """Höchstens timeout Sekunden auf die Zulassung warten."""
+        return self._event.wait(timeout)
+
+    async def wait_async(self, timeout: float) -> bool:
+        """Asynchrone Variante von wait (blockiert die Event-Loop nicht)."""
+        if self.granted:
+            return True
+        if self._granted_future is None:
+            # Nur einmal registrieren, spätere Aufrufe warten auf dasselbe Future
+            loop = asyncio.get_running_loop()
+            future = self._granted_future = loop.create_future()
+
+            def wake():
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(True))
+
+            self.queue.add_waiter(self, wake)
+        try:
+            await asyncio.wait_for(asyncio.shield(self._granted_future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.granted
+
+    def _grant(self):
+        self.granted = True
+        self.wait_ms = (time.monotonic() - self.enqueued_at) * 1000
+        self._event.set()
+        for wake in self._waiters:
+            wake()
+
+    def check_deadline(self):
+        """Nach Ablauf der Wartezeit abweisen (503), außer der Platz wurde inzwischen vergeben."""
+        if self.queue.expire(self):
+            raise AdmissionError("Server ausgelastet, bitte später erneut versuchen", 503,
+                                 max(1, int(config.QUEUE_TIMEOUT / 2)))
+
+    def release(self):
+        """Platz freigeben (nach der Anfrage oder beim Abbruch während des Wartens)."""
+        self.queue.release(self)
+
+class _ModelQueue:
+    """Laufende und wartende Anfragen eines Modells."""
+
+    def __init__(self, model: str, concurrency: int, max_queue: int, lock: threading.Lock):
+        self.model = model
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting: List[Ticket] = []  # Heap nach (Priorität, Reihenfolge)
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_depth = 0
+        self.wait_samples = deque(maxlen=1000)
+        self._lock = lock
+
+    def enqueue(self, priority: int, seq: int, timeout: float) -> Ticket:
+        with self._lock:
+            if len(self.waiting) >= self.max_queue and self.active >= self.concurrency:
+                self.rejected += 1
+                raise AdmissionError(f"Warteschlange für {self.model} ist voll", 429, 1)
+            ticket = Ticket(self, priority, seq, time.monotonic() + timeout)
+            heapq.heappush(self.waiting, ticket)
+            self.max_depth = max(self.max_depth, len(self.waiting))
+            self._dispatch()
+            return ticket
+
+    def _dispatch(self):
+        while self.waiting and self.active < self.concurrency:
+            ticket = heapq.heappop(self.waiting)
+            self.active += 1
+            self.admitted += 1
+            ticket._grant()
+            self.wait_samples.append(ticket.wait_ms)
+
+    def position(self, ticket: Ticket) -> int:
+        with self._lock:
+            if ticket.granted:
+                return 0
+            return 1 + sum(1 for other in self.waiting if other < ticket)
+
+    def add_waiter(self, ticket: Ticket, wake: Callable[[], None]):
+        with self._lock:
+            ticket._waiters.append(wake)
+            if ticket.granted:
+                wake()
+
+    def expire(self, ticket: Ticket) -> bool:
+        """Wartende Anfrage nach Ablauf der Frist entfernen; True, wenn sie abgelaufen ist."""
+        with self._lock:
+            if ticket.granted or ticket.done or time.monotonic() < ticket.deadline:
+                return False
+            self.timed_out += 1
+            self._remove(ticket)
+            return True
+
+    def release(self, ticket: Ticket):
+        with self._lock:
+            if ticket.done:
+                return
+            if ticket.granted:
+                ticket.done = True
+                self.active -= 1
+                self._dispatch()
+            else:
+                self._remove(ticket)
+
+    def _remove(self, ticket: Ticket):
+        ticket.done = True
+        self.waiting.remove(ticket)
+        heapq.heapify(self.waiting)
+
+    def stats(self) -> dict:
+        samples = sorted(self.wait_samples)
+        return {
+            "active": self.active,
+            "queued": len(self.waiting),
+            "max_queued": self.max_depth,
+            "concurrency": self.concurrency,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(sum(samples) / len(samples), 1) if samples else 0.0,
+            "p95_wait_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 1) if samples else 0.0,
+        }
+
+class LLMScheduler:
+    """
+    Warteschlangen je Modell.
+
+    Args:
+        concurrency: Gleichzeitige Anfragen je Modell (Standard)
+        max_queue: Höchstzahl wartender Anfragen je Modell
+        timeout: Höchste Wartezeit in Sekunden
+        model_concurrency: Abweichende Grenzen je Modell
+    """
+
+    def __init__(self, concurrency: int, max_queue: int, timeout: float,
+                 model_concurrency: Optional[Dict[str, int]] = None):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.model_concurrency = model_concurrency or {}
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _queue(self, model: str) -> _ModelQueue:
+        with self._lock:
+            queue = self._queues.get(model)
+            if queue is None:
+                concurrency = self.model_concurrency.get(model,
+                                                         self.model_concurrency.get(model.split(':')[0], self.concurrency))
+                queue = self._queues[model] = _ModelQueue(model, int(concurrency), self.max_queue, self._lock)
+            return queue
+
+    def check_admission(self, model: str):
+        """Vorab prüfen, ob noch Platz ist (429 sonst), ohne sich einzureihen."""
+        queue = self._queue(model)
+        with self._lock:
+            if len(queue.waiting) >= queue.max_queue and queue.active >= queue.concurrency:
+                queue.rejected += 1
+                raise AdmissionError(f"Warteschlange für {model} ist voll", 429, 1)
+
+    def enqueue(self, model: str, priority: Optional[str] = None) -> Ticket:
+        """
+        Anfrage einreihen.
+
+        Args:
+            model: Modellname
+            priority: "high", "normal" (Standard) oder "low"
+
+        Raises:
+            AdmissionError: Warteschlange voll (429)
+        """
+        return self._queue(model).enqueue(PRIORITIES.get(priority, PRIORITIES["normal"]), next(self._seq), self.timeout)
+
+    @contextmanager
+    def slot(self, model: str, priority: Optional[str] = None) -> Iterator[Ticket]:
+        """Auf einen freien Platz warten (synchron) und ihn danach wieder freigeben."""
+        ticket = self.enqueue(model, priority)
+        try:
+            while not ticket.wait(max(0.0, ticket.deadline - time.monotonic())):
+                ticket.check_deadline()
+            yield ticket
+        finally:
+            ticket.release()
+
+    @asynccontextmanager
+    async def slot_async(self, model: str, priority: Optional[str] = None) -> AsyncIterator[Ticket]:
+        """Asynchrone Variante von slot."""
+        ticket = self.enqueue(model, priority)
+        try:
+            while not await ticket.wait_async(max(0.0, ticket.deadline - time.monotonic())):
+                ticket.check_deadline()
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {model: queue.stats() for model, queue in self._queues.items()}
+
+def scheduled_events(scheduler: LLMScheduler, model: str, priority: Optional[str],
+                     start_events: Callable[[], Iterator[dict]], interval: float = 1.0) -> Iterator[dict]:
+    """
+    Stream-Events einer Anfrage erst nach der Zulassung erzeugen.
+
+    Während des Wartens wird regelmäßig {"type": "queued", "position": n}
+    geliefert; nach Ablauf der Wartezeit ein "error"-Event mit Status 503.
+    Der Platz wird mit dem "done"- bzw. "error"-Event freigegeben, bei
+    vorzeitigem Abbruch spätestens beim Schließen des Generators.
+    """
+    try:
+        ticket = scheduler.enqueue(model, priority)
+    except AdmissionError as e:
+        yield {"type": "error", "error": str(e), "status": e.status}
+        return
+    try:
+        while not ticket.granted:
+            yield {"type": "queued", "position": ticket.position}
+            if not ticket.wait(min(interval, max(0.0, ticket.deadline - time.monotonic()))):
+                ticket.check_deadline()
+        for event in start_events():
+            if event['type'] == 'done':
+                event['queue_wait_ms'] = round(ticket.wait_ms, 1)
+            if event['type'] in ('done', 'error'):
+                # Ollama ist fertig: Platz sofort freigeben, nicht erst nach TTS und Senden
+                ticket.release()
+            yield event
+    except AdmissionError as e:
+        yield {"type": "error", "error": str(e), "status": e.status}
+    finally:
+        ticket.release()
+
+async def scheduled_events_async(scheduler: LLMScheduler, model: str, priority: Optional[str],
+                                 start_events: Callable[[], AsyncIterator[dict]], interval: float = 1.0) -> AsyncIterator[dict]:
+    """Asynchrone Variante von scheduled_events."""
+    try:
+        ticket = scheduler.enqueue(model, priority)
+    except AdmissionError as e:
+        yield {"type": "error", "error": str(e), "status": e.status}
+        return
+    try:
+        while not ticket.granted:
+            yield {"type": "queued", "position": ticket.position}
+            if not await ticket.wait_async(min(interval, max(0.0, ticket.deadline - time.monotonic()))):
+                ticket.check_deadline()
+        async for event in start_events():
+            if event['type'] == 'done':
+                event['queue_wait_ms'] = round(ticket.wait_ms, 1)
+            if event['type'] in ('done', 'error'):
+                # Ollama ist fertig: Platz sofort freigeben, nicht erst nach TTS und Senden
+                ticket.release()
+            yield event
+    except AdmissionError as e:
+        yield {"type": "error", "error": str(e), "status": e.status}
+    finally:
+        ticket.release()
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> LLMScheduler:
+    """Gemeinsamen Scheduler abrufen (wird beim ersten Aufruf erstellt)."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler(config.MODEL_CONCURRENCY, config.MAX_QUEUE_PER_MODEL,
+                                          config.QUEUE_TIMEOUT, config.MODEL_CONCURRENCY_OVERRIDES)
+    return _scheduler
@@ -4,101 +4,39 @@ LLM-Service für die Ollama-Integration.
 Verwaltet die Kommunikation mit dem Ollama-Backend.
 """
 import logging
-import requests
 import json
-import re
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator
 import config
+from services.ollama_router import get_router
+from services.reasoning_parser import ReasoningStreamParser, parse_reasoning_text
+from services.prompt_builder import assemble_prompt
+from services.model_service import get_model_catalog, keep_alive_for
+from services.response_cache import get_response_cache, is_cacheable, response_cache_key
+from services.token_budget import context_window
 
 logger = logging.getLogger(__name__)
 
 def get_available_models() -> List[str]:
     """
-    Verfügbare Ollama-Modelle abrufen.
+    Verfügbare Ollama-Modelle abrufen (zwischengespeichert, siehe model_service).
     
     Returns:
         List[str]: Liste der verfügbaren Modellnamen
     """
-    try:
-        response = requests.get(f"{config.OLLAMA_BASE_URL}/api/tags")
-        if response.status_code == 200:
-            models_data = response.json()
-            return [model["name"] for model in models_data.get("models", [])]
-        else:
-            logger.error(f"Fehler beim Abrufen der Modelle: {response.status_code} {response.text}")
-            return []
-    except Exception as e:
-        logger.error(f"Fehler bei der Verbindung zu Ollama: {e}")
-        return []
+    return get_model_catalog().get()
 
 def parse_reasoning_response(response_text: str) -> dict:
     """
     Parst Reasoning-LLM Antworten und trennt Reasoning von Final Answer.
-    """
-    
-    # Verschiedene Reasoning-Pattern erkennen
-    reasoning_patterns = [
-        # <thinking>...</thinking>
-        r'<thinking>(.*?)</thinking>(.*?)$',
-        # <reasoning>...</reasoning>
-        r'<reasoning>(.*?)</reasoning>(.*?)$',
-        # **Reasoning:** ... **Answer:**
-        r'\*\*Reasoning:\*\*(.*?)\*\*Answer:\*\*(.*?)$',
-        # **Thinking:** ... **Response:**
-        r'\*\*Thinking:\*\*(.*?)\*\*Response:\*\*(.*?)$',
-        # Let me think... [final answer]
-        r'(Let me think.*?(?=\n\n|\[|Final|Answer))(.*?)$',
-        # Reasoning: ... Answer:
-        r'Reasoning:(.*?)Answer:(.*?)$',
-        # ⭐ PHI-4 Pattern: "To determine..." (first paragraph as reasoning)
-        r'^(To determine.*?(?=\n\n|\d+\.|So the answer|Therefore))(.*?)$',
-        # ⭐ Step-by-step Pattern
-        r'^(.*?(?:step by step|digit by digit|compare).*?(?=So the answer|Therefore|The answer is))(.*?)$',
-    ]
     
+    Die Pattern-Kaskade läuft in linearer Zeit (siehe services.reasoning_parser),
+    auch bei sehr langen Antworten ohne passende Marker.
+    """
     # Debug: Log die ersten 200 Zeichen der Response
     logger.debug(f"Response Preview: {response_text[:200]}...")
     
-    for i, pattern in enumerate(reasoning_patterns):
-        match = re.search(pattern, response_text, re.DOTALL | re.IGNORECASE)
-        if match:
-            reasoning = match.group(1).strip()
-            answer = match.group(2).strip()
-            
-            if reasoning and answer and len(reasoning) > 50:  # Mindestlänge für Reasoning
-                logger.info(f"Reasoning-LLM Response erkannt (Pattern {i+1}) - Reasoning und Answer getrennt")
-                logger.debug(f"Reasoning: {reasoning[:100]}...")
-                logger.debug(f"Answer: {answer[:100]}...")
-                return {
-                    "reasoning": reasoning,
-                    "answer": answer,
-                    "has_reasoning": True
-                }
-    
-    # ⭐ Fallback: Wenn mehr als 300 Zeichen, versuche automatische Trennung
-    if len(response_text) > 300:
-        lines = response_text.split('\n\n')
-        if len(lines) >= 2:
-            # Erste Hälfte als Reasoning, letzte Hälfte als Answer
-            mid_point = len(lines) // 2
-            reasoning = '\n\n'.join(lines[:mid_point])
-            answer = '\n\n'.join(lines[mid_point:])
-            
-            if len(reasoning) > 100 and len(answer) > 50:
-                logger.info("Reasoning-LLM Response erkannt (Fallback-Trennung)")
-                return {
-                    "reasoning": reasoning,
-                    "answer": answer,
-                    "has_reasoning": True
-                }
-    
-    # Kein Reasoning-Pattern gefunden
-    logger.debug("Kein Reasoning-Pattern erkannt - normale Response")
-    return {
-        "reasoning": "",
-        "answer": response_text,
-        "has_reasoning": False
-    }
+    return parse_reasoning_text(response_text)
 
 def query_ollama(
     model_name: str, 
@@ -123,31 +61,7 @@ def query_ollama(
         str: Antwort des Modells (nur die finale Antwort)
     """
     try:
-        # Basis-Anfragedaten
-        request_data = {
-            'model': model_name,
-            'prompt': prompt,
-            'stream': False,
-            'options': {
-                'temperature': temperature,
-                'num_gpu': 1,  # GPU verwenden
-                'gpu_layers': 99  # Maximale GPU-Nutzung
-            }
-        }
-        
-        # Systemanweisung hinzufügen, wenn vorhanden
-        if system_prompt:
-            request_data['system'] = system_prompt
-        
-        # Bilder hinzufügen für multimodale Modelle
-        if images and len(images) > 0:
-            request_data['images'] = []
-            for image in images:
-                # Base64-Daten direkt verwenden (ohne data:image/... Präfix)
-                image_data = image.get('data', '')
-                if image_data:
-                    request_data['images'].append(image_data)
-            logger.info(f"Bilder hinzugefügt: {len(request_data['images'])} Bilder für multimodales Modell")
+        request_data = _build_reasoning_request(model_name, prompt, system_prompt, temperature, images, context=context)
         
         logger.info(f"Sende Anfrage an Ollama: {model_name}")
         
@@ -157,15 +71,12 @@ def query_ollama(
             debug_data['images'] = f"[{len(request_data['images'])} images - hidden from logs]"
         logger.debug(f"Anfragedaten: {json.dumps(debug_data, indent=2, default=str)}")
         
-        response = requests.post(
-            f"{config.OLLAMA_BASE_URL}/api/generate",
-            json=request_data
-        )
+        response = _post(model_name, request_data)
         
         logger.debug(f"Antwort-Status: {response.status_code}")
         
         if response.status_code == 200:
-            raw_response = response.json().get('response', '')
+            raw_response = _response_text(response.json())
             
             # Reasoning-LLM Response parsen
             parsed_response = parse_reasoning_response(raw_response)
@@ -181,64 +92,203 @@ def query_ollama(
         logger.error(f"Fehler bei der Anfrage an Ollama: {e}")
         return f"Fehler bei der Verbindung zum Modell: {str(e)}"
 
+
+def _build_reasoning_request(
+    model_name: str,
+    prompt: str,
+    system_prompt: str = "",
+    temperature: float = 0.7,
+    images: Optional[List[Dict[str, str]]] = None,
+    stream: bool = False,
+    context: Optional[List[Dict[str, str]]] = None,
+    background: str = ""
+) -> dict:
+    """
+    Anfragedaten für Ollama zusammenstellen.
+    
+    Ohne Kontext wird /api/generate verwendet. Mit Kontext (Gesprächsverlauf als
+    [{"role": ..., "content": ...}], auch leer) geht die Anfrage an /api/chat:
+    Ollama verwendet dann den bereits verarbeiteten Präfix des Verlaufs weiter,
+    statt das ganze Gespräch neu zu berechnen. Wechselnder Kontext (background)
+    steht deshalb hinter dem Verlauf (siehe services.prompt_builder).
+    
+    Returns:
+        dict: Request-Body für Ollama (siehe _endpoint)
+    """
+    request_data = {
+        'model': model_name,
+        'stream': stream,
+        'keep_alive': keep_alive_for(model_name),
+        'options': {
+            'temperature': temperature,
+            'num_gpu': 1,
+            'gpu_layers': 99,
+            # Festes Fenster: Ollama schneidet sonst zu lange Prompts stillschweigend ab
+            'num_ctx': context_window(model_name)
+        }
+    }
+    
+    # Base64-Daten direkt verwenden (ohne data:image/... Präfix)
+    image_data = [image.get('data', '') for image in images or [] if image.get('data')]
+    if image_data:
+        logger.info(f"Bilder hinzugefügt: {len(image_data)} Bilder")
+    
+    request_data.update(assemble_prompt(prompt, system_prompt, background, context, image_data))
+    return request_data
+
+def _post(model_name: str, request_data: dict):
+    """Nicht-Streaming-Anfrage über den Router (die Antwort ist vollständig gelesen)."""
+    with get_router().request("POST", _endpoint(request_data), model=model_name, json=request_data) as response:
+        return response
+
+def _cache_key(request_data: dict) -> Optional[str]:
+    """Schlüssel für den Antwort-Cache, None wenn die Anfrage nicht gecacht wird."""
+    return response_cache_key(request_data) if is_cacheable(request_data) else None
+
+def _cached_response(cache_key: Optional[str], model_name: str) -> Optional[dict]:
+    """Gecachte Antwort im Format von query_ollama_with_reasoning (oder None)."""
+    if cache_key is None:
+        return None
+    entry = get_response_cache().get(cache_key)
+    if entry is None:
+        return None
+    logger.info(f"Antwort aus dem Cache: {model_name}")
+    return {**entry["result"], "metrics": None, "cached": True}
+
+def _cached_events(cached: dict) -> Iterator[dict]:
+    """Gecachte Antwort als Stream-Events wiedergeben."""
+    if cached["reasoning"]:
+        yield {"type": "reasoning", "content": cached["reasoning"]}
+    yield {"type": "answer", "content": cached["answer"]}
+    yield {"type": "done", **cached}
+
+def _check_model_missing(status: int):
+    """Bei 404 (Modell unbekannt) die zwischengespeicherte Modellliste verwerfen."""
+    if status == 404:
+        get_model_catalog().invalidate()
+
+def _endpoint(request_data: dict) -> str:
+    """Ollama-Endpunkt passend zu den Anfragedaten."""
+    return "/api/chat" if 'messages' in request_data else "/api/generate"
+
+def _response_text(data: dict) -> str:
+    """Antworttext (bzw. Chunk) aus einer /api/generate- oder /api/chat-Antwort."""
+    if 'message' in data:
+        return data['message'].get('content', '')
+    return data.get('response', '')
+
+def _eval_metrics(data: dict) -> Optional[dict]:
+    """
+    Zeitmessung aus der letzten Ollama-Antwort (Dauern in Nanosekunden).
+    
+    prompt_eval ist die Verarbeitung des Prompts: Wird ein gecachter Präfix
+    wiederverwendet, zählen nur die neuen Tokens. eval ist die Generierung.
+    """
+    if 'eval_count' not in data and 'prompt_eval_count' not in data:
+        return None
+    eval_ms = data.get('eval_duration', 0) / 1e6
+    eval_count = data.get('eval_count', 0)
+    return {
+        "prompt_eval_count": data.get('prompt_eval_count', 0),
+        "prompt_eval_ms": round(data.get('prompt_eval_duration', 0) / 1e6, 1),
+        "eval_count": eval_count,
+        "eval_ms": round(eval_ms, 1),
+        "load_ms": round(data.get('load_duration', 0) / 1e6, 1),
+        "total_ms": round(data.get('total_duration', 0) / 1e6, 1),
+        "tokens_per_second": round(eval_count / eval_ms * 1000, 1) if eval_ms else 0.0,
+    }
+
+class _EvalStats:
+    """Aufsummierte Ollama-Zeiten je Modell (für /api/stats)."""
+
+    FIELDS = ("prompt_eval_count", "prompt_eval_ms", "eval_count", "eval_ms", "load_ms")
+
+    def __init__(self):
+        self._models: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, model_name: str, metrics: dict):
+        with self._lock:
+            totals = self._models.setdefault(model_name, dict.fromkeys(("requests",) + self.FIELDS, 0))
+            totals["requests"] += 1
+            for field in self.FIELDS:
+                totals[field] += metrics[field]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                model_name: {
+                    "requests": totals["requests"],
+                    "prompt_eval_count": totals["prompt_eval_count"],
+                    "prompt_eval_ms": round(totals["prompt_eval_ms"], 1),
+                    "eval_count": totals["eval_count"],
+                    "eval_ms": round(totals["eval_ms"], 1),
+                    "load_ms": round(totals["load_ms"], 1),
+                    "avg_prompt_eval_ms": round(totals["prompt_eval_ms"] / totals["requests"], 1),
+                }
+                for model_name, totals in self._models.items()
+            }
+
+_eval_stats = _EvalStats()
+
+def _record_metrics(model_name: str, data: dict) -> Optional[dict]:
+    metrics = _eval_metrics(data)
+    if metrics:
+        _eval_stats.add(model_name, metrics)
+        logger.info(f"Ollama {model_name}: Prompt {metrics['prompt_eval_count']} Tokens in {metrics['prompt_eval_ms']} ms, "
+                    f"Antwort {metrics['eval_count']} Tokens in {metrics['eval_ms']} ms")
+    return metrics
+
+def eval_stats() -> dict:
+    """Aufsummierte Prompt-Eval- und Eval-Zeiten je Modell."""
+    return _eval_stats.stats()
+
 def query_ollama_with_reasoning(
     model_name: str, 
     prompt: str, 
     system_prompt: str = "", 
     temperature: float = 0.7,
     context: Optional[List[Dict[str, str]]] = None,
-    images: Optional[List[Dict[str, str]]] = None
+    images: Optional[List[Dict[str, str]]] = None,
+    background: str = ""
 ) -> dict:
     """
     Eine Anfrage an das Ollama-Modell stellen MIT Reasoning-Support.
     
     Returns:
-        dict: {"reasoning": str, "answer": str, "has_reasoning": bool}
+        dict: {"reasoning": str, "answer": str, "has_reasoning": bool, "metrics": dict}
     """
     try:
-        # Basis-Anfragedaten
-        request_data = {
-            'model': model_name,
-            'prompt': prompt,
-            'stream': False,
-            'options': {
-                'temperature': temperature,
-                'num_gpu': 1,
-                'gpu_layers': 99
-            }
-        }
-        
-        if system_prompt:
-            request_data['system'] = system_prompt
+        request_data = _build_reasoning_request(model_name, prompt, system_prompt, temperature, images, context=context, background=background)
         
-        if images and len(images) > 0:
-            request_data['images'] = []
-            for image in images:
-                image_data = image.get('data', '')
-                if image_data:
-                    request_data['images'].append(image_data)
-            logger.info(f"Bilder hinzugefügt: {len(request_data['images'])} Bilder")
+        cache_key = _cache_key(request_data)
+        cached = _cached_response(cache_key, model_name)
+        if cached is not None:
+            return cached
         
         logger.info(f"Sende Reasoning-Anfrage an Ollama: {model_name}")
         
-        response = requests.post(
-            f"{config.OLLAMA_BASE_URL}/api/generate",
-            json=request_data
-        )
+        response = _post(model_name, request_data)
         
         if response.status_code == 200:
-            raw_response = response.json().get('response', '')
+            data = response.json()
+            raw_response = _response_text(data)
             
             # Reasoning-Response parsen
             parsed_response = parse_reasoning_response(raw_response)
+            if cache_key:
+                get_response_cache().put(cache_key, raw_response, dict(parsed_response), model_name)
+            parsed_response['metrics'] = _record_metrics(model_name, data)
             return parsed_response
             
         else:
             logger.error(f"Ollama-Fehler: {response.status_code} {response.text}")
+            _check_model_missing(response.status_code)
             return {
                 "reasoning": "",
                 "answer": f"Fehler: {response.status_code}",
-                "has_reasoning": False
+                "has_reasoning": False,
+                "error": True
             }
     
     except Exception as e:
@@ -246,5 +296,216 @@ def query_ollama_with_reasoning(
         return {
             "reasoning": "",
             "answer": f"Fehler: {str(e)}",
-            "has_reasoning": False
-        }
\ No newline at end of file
+            "has_reasoning": False,
+            "error": True
+        }
+
+def stream_ollama_with_reasoning(
+    model_name: str, 
+    prompt: str, 
+    system_prompt: str = "", 
+    temperature: float = 0.7,
+    context: Optional[List[Dict[str, str]]] = None,
+    images: Optional[List[Dict[str, str]]] = None,
+    background: str = ""
+) -> Iterator[dict]:
+    """
+    Eine Streaming-Anfrage an das Ollama-Modell stellen MIT Reasoning-Support.
+    
+    Leitet den Token-Stream von Ollama Chunk für Chunk weiter, bereits
+    getrennt nach Reasoning- und Answer-Kanal, und liefert zum Schluss die
+    endgültige Trennung von Reasoning und Answer.
+    
+    Yields:
+        dict: {"type": "reasoning" | "answer", "content": str} für jeden Chunk,
+              {"type": "done", "reasoning": str, "answer": str, "has_reasoning": bool,
+                       "metrics": dict} am Ende,
+              {"type": "error", "error": str} bei Fehlern
+    """
+    try:
+        request_data = _build_reasoning_request(model_name, prompt, system_prompt, temperature, images, stream=True, context=context, background=background)
+        
+        cache_key = _cache_key(request_data)
+        cached = _cached_response(cache_key, model_name)
+        if cached is not None:
+            yield from _cached_events(cached)
+            return
+        
+        logger.info(f"Sende Streaming-Reasoning-Anfrage an Ollama: {model_name}")
+        
+        with get_router().request("POST", _endpoint(request_data), model=model_name, json=request_data, stream=True) as response:
+            if response.status_code != 200:
+                logger.error(f"Ollama-Fehler: {response.status_code} {response.text}")
+                _check_model_missing(response.status_code)
+                yield {"type": "error", "error": f"Fehler: {response.status_code}"}
+                return
+            
+            parser = ReasoningStreamParser()
+            metrics = None
+            raw_parts = []
+            finished = False
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                
+                data = json.loads(line)
+                if data.get('error'):
+                    logger.error(f"Ollama-Stream-Fehler: {data['error']}")
+                    yield {"type": "error", "error": data['error']}
+                    return
+                
+                chunk = _response_text(data)
+                raw_parts.append(chunk)
+                for channel, text in parser.feed(chunk):
+                    yield {"type": channel, "content": text}
+                
+                if data.get('done'):
+                    finished = True
+                    metrics = _record_metrics(model_name, data)
+                    break
+        
+        for channel, text in parser.close():
+            yield {"type": channel, "content": text}
+        
+        result = parser.result()
+        # Nur vollständige Antworten cachen (nicht bei abgebrochenem Stream)
+        if cache_key and finished:
+            get_response_cache().put(cache_key, "".join(raw_parts), dict(result), model_name)
+        yield {"type": "done", **result, "metrics": metrics}
+    
+    except Exception as e:
+        logger.error(f"Fehler bei Streaming-Reasoning-Anfrage: {e}")
+        yield {"type": "error", "error": f"Fehler: {str(e)}"}
+
+# ⭐ Asynchrone Varianten für den ASGI-Server (asgi_app.py)
+
+async def get_available_models_async() -> List[str]:
+    """
+    Verfügbare Ollama-Modelle asynchron abrufen (zwischengespeichert).
+    
+    Returns:
+        List[str]: Liste der verfügbaren Modellnamen
+    """
+    return await get_model_catalog().get_async()
+
+async def query_ollama_with_reasoning_async(
+    model_name: str, 
+    prompt: str, 
+    system_prompt: str = "", 
+    temperature: float = 0.7,
+    context: Optional[List[Dict[str, str]]] = None,
+    images: Optional[List[Dict[str, str]]] = None,
+    background: str = ""
+) -> dict:
+    """
+    Asynchrone Variante von query_ollama_with_reasoning.
+    
+    Returns:
+        dict: {"reasoning": str, "answer": str, "has_reasoning": bool, "metrics": dict}
+    """
+    try:
+        request_data = _build_reasoning_request(model_name, prompt, system_prompt, temperature, images, context=context, background=background)
+        
+        cache_key = _cache_key(request_data)
+        cached = _cached_response(cache_key, model_name)
+        if cached is not None:
+            return cached
+        
+        logger.info(f"Sende asynchrone Reasoning-Anfrage an Ollama: {model_name}")
+        
+        async with get_router().request_async("POST", _endpoint(request_data), model=model_name, json=request_data) as response:
+            if response.status == 200:
+                data = await response.json()
+                raw_response = _response_text(data)
+                parsed_response = parse_reasoning_response(raw_response)
+                if cache_key:
+                    get_response_cache().put(cache_key, raw_response, dict(parsed_response), model_name)
+                parsed_response['metrics'] = _record_metrics(model_name, data)
+                return parsed_response
+            
+            logger.error(f"Ollama-Fehler: {response.status} {await response.text()}")
+            _check_model_missing(response.status)
+            return {
+                "reasoning": "",
+                "answer": f"Fehler: {response.status}",
+                "has_reasoning": False,
+                "error": True
+            }
+    
+    except Exception as e:
+        logger.error(f"Fehler bei asynchroner Reasoning-Anfrage: {e}")
+        return {
+            "reasoning": "",
+            "answer": f"Fehler: {str(e)}",
+            "has_reasoning": False,
+            "error": True
+        }
+
+async def stream_ollama_with_reasoning_async(
+    model_name: str, 
+    prompt: str, 
+    system_prompt: str = "", 
+    temperature: float = 0.7,
+    context: Optional[List[Dict[str, str]]] = None,
+    images: Optional[List[Dict[str, str]]] = None,
+    background: str = ""
+) -> AsyncIterator[dict]:
+    """
+    Asynchrone Variante von stream_ollama_with_reasoning (gleiche Events).
+    """
+    try:
+        request_data = _build_reasoning_request(model_name, prompt, system_prompt, temperature, images, stream=True, context=context, background=background)
+        
+        cache_key = _cache_key(request_data)
+        cached = _cached_response(cache_key, model_name)
+        if cached is not None:
+            for event in _cached_events(cached):
+                yield event
+            return
+        
+        logger.info(f"Sende asynchrone Streaming-Anfrage an Ollama: {model_name}")
+        
+        async with get_router().request_async("POST", _endpoint(request_data), model=model_name, json=request_data) as response:
+            if response.status != 200:
+                logger.error(f"Ollama-Fehler: {response.status} {await response.text()}")
+                _check_model_missing(response.status)
+                yield {"type": "error", "error": f"Fehler: {response.status}"}
+                return
+            
+            parser = ReasoningStreamParser()
+            metrics = None
+            raw_parts = []
+            finished = False
+            # StreamReader liefert zeilenweise (NDJSON)
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                
+                data = json.loads(line)
+                if data.get('error'):
+                    logger.error(f"Ollama-Stream-Fehler: {data['error']}")
+                    yield {"type": "error", "error": data['error']}
+                    return
+                
+                chunk = _response_text(data)
+                raw_parts.append(chunk)
+                for channel, text in parser.feed(chunk):
+                    yield {"type": channel, "content": text}
+                
+                if data.get('done'):
+                    finished = True
+                    metrics = _record_metrics(model_name, data)
+                    break
+        
+        for channel, text in parser.close():
+            yield {"type": channel, "content": text}
+        
+        result = parser.result()
+        # Nur vollständige Antworten cachen (nicht bei abgebrochenem Stream)
+        if cache_key and finished:
+            get_response_cache().put(cache_key, "".join(raw_parts), dict(result), model_name)
+        yield {"type": "done", **result, "metrics": metrics}
+    
+    except Exception as e:
+        logger.error(f"Fehler bei asynchroner Streaming-Anfrage: {e}")
+        yield {"type": "error", "error": f"Fehler: {str(e)}"}
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Lokale TTS-Engines (Whisper, Coqui) in langlebigen Worker-Prozessen.
+Jeder Worker lädt sein Modell genau einmal beim Start (nur CPU); Anfragen
+werden gesammelt und als Batch an einen freien Worker übergeben.
+"""
+import concurrent.futures
+import importlib.util
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Engine -> benötigtes Python-Modul
+_ENGINE_MODULES = {
+    "whisper": "whisper_tts",
+    "coqui": "TTS",
+}
+LOCAL_ENGINES = tuple(_ENGINE_MODULES)
+
+def engine_available(name: str) -> bool:
+    """Ist die lokale Engine installiert? (ohne das Modell oder torch zu laden)"""
+    module = _ENGINE_MODULES.get(name)
+    if module is None:
+        return False
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+# --- Im Worker-Prozess ---
+
+_worker_engine = None
+_worker_model = None
+
+def _load_whisper():
+    from whisper_tts import WhisperTTS
+    return WhisperTTS.from_pretrained(config.WHISPER_TTS_MODEL).to("cpu")
+
+def _synthesize_whisper(model, text, voice, path):
+    import soundfile as sf
+    audio = model.generate_speech(text, voice=voice)
+    sf.write(path, audio, 24000, format="WAV")
+
+def _load_coqui():
+    from TTS.api import TTS
+    return TTS(config.COQUI_TTS_MODEL, progress_bar=False).to("cpu")
+
+def _synthesize_coqui(model, text, voice, path):
+    # Edge-Stimmen kennt Coqui nicht; nur echte Sprecher des Modells übergeben
+    speakers = getattr(model, "speakers", None) or []
+    speaker = voice if voice in speakers else None
+    model.tts_to_file(text=text, speaker=speaker, file_path=path)
+
+_ENGINES = {
+    "whisper": (_load_whisper, _synthesize_whisper),
+    "coqui": (_load_coqui, _synthesize_coqui),
+}
+
+def _init_worker(engine: str, threads: int):
+    """Initializer der Worker-Prozesse: nur CPU, Modell einmalig laden."""
+    global _worker_engine, _worker_model
+    # Muss vor dem ersten torch-Import gesetzt sein
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    start = time.time()
+    load, _ = _ENGINES[engine]
+    _worker_engine = engine
+    _worker_model = load()
+    logger.info(f"{engine}-TTS-Modell in Prozess {os.getpid()} geladen ({time.time() - start:.1f}s)")
+
+def _worker_ready() -> int:
+    """Leere Aufgabe, die den Start (und das Modell-Laden) eines Workers erzwingt."""
+    return os.getpid()
+
+def _synthesize_batch(items):
+    """
+    Mehrere Texte mit dem geladenen Modell synthetisieren.
+
+    Args:
+        items: Liste von (Text, Stimme, Ausgabepfad)
+
+    Returns:
+        List[Optional[str]]: Fehlermeldung je Eintrag, None bei Erfolg
+    """
+    _, synthesize = _ENGINES[_worker_engine]
+    errors = []
+    for text, voice, path in items:
+        try:
+            synthesize(_worker_model, text, voice, path)
+            errors.append(None)
+        except Exception as e:
+            errors.append(str(e))
+    return errors
+
+# --- Im Server-Prozess ---
+
+class LocalTTSEngine:
+    """
+    Pool warmer Worker-Prozesse für eine lokale TTS-Engine.
+
+    Ein Dispatcher-Thread wartet, bis ein Worker frei ist, und übergibt ihm
+    alle bis dahin angesammelten Anfragen (höchstens batch_size) auf einmal.
+    """
+
+    def __init__(self, name: str, workers: int, batch_size: int, batch_wait: float):
+        self.name = name
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.batches = 0
+        self.requests = 0
+
+        self._pool = self._create_pool()
+        self._queue = queue.Queue()
+        self._free_workers = threading.Semaphore(workers)
+        self._dispatcher = threading.Thread(target=self._dispatch, name=f"local-tts-{name}", daemon=True)
+        self._dispatcher.start()
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        # spawn statt fork: keine geerbten Threads/Event-Loops im Worker
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.name, threads)
+        )
+
+    def submit(self, text: str, voice: str, path: str) -> concurrent.futures.Future:
+        """
+        Synthese einreihen.
+
+        Returns:
+            concurrent.futures.Future: Liefert den Ausgabepfad oder wirft RuntimeError
+        """
+        future = concurrent.futures.Future()
+        self._queue.put((text, voice, path, future))
+        return future
+
+    def warm_up(self):
+        """Alle Worker starten, damit das Modell-Laden nicht die erste Anfrage trifft."""
+        futures = [self._pool.submit(_worker_ready) for _ in range(self.workers)]
+        concurrent.futures.wait(futures)
+
+    def _dispatch(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # Während alle Worker beschäftigt sind, sammeln sich weitere Anfragen an
+            self._free_workers.acquire()
+            batch = [item]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                pool_future = self._pool.submit(_synthesize_batch, [entry[:3] for entry in batch])
+            except RuntimeError as e:
+                self._free_workers.release()
+                for *_, future in batch:
+                    future.set_exception(e)
+                continue
+            pool_future.add_done_callback(lambda done, batch=batch: self._resolve(batch, done))
+
+    def _resolve(self, batch, pool_future):
+        self._free_workers.release()
+        try:
+            errors = pool_future.result()
+        except Exception as e:
+            errors = [f"Worker-Fehler: {e}"] * len(batch)
+            if isinstance(e, BrokenProcessPool):
+                # Abgestürzter Worker (z.B. Speicher): Pool für folgende Anfragen neu starten
+                logger.error(f"{self.name}-TTS-Worker abgestürzt, starte Pool neu")
+                self._pool = self._create_pool()
+
+        for (_, _, path, future), error in zip(batch, errors):
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(path)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "requests": self.requests,
+            "batches": self.batches,
+            "queued": self._queue.qsize(),
+        }
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._pool.shutdown(wait=False)
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_local_engine(name: str) -> LocalTTSEngine:
+    """
+    Worker-Pool einer lokalen Engine abrufen (wird beim ersten Aufruf gestartet).
+
+    Raises:
+        ValueError: Unbekannte oder nicht installierte Engine
+    """
+    engine = _engines.get(name)
+    if engine is None:
+        if not engine_available(name):
+            raise ValueError(f"Lokale TTS-Engine nicht verfügbar: {name}")
+        with _engines_lock:
+            engine = _engines.get(name)
+            if engine is None:
+                engine = LocalTTSEngine(
+                    name,
+                    workers=config.LOCAL_TTS_WORKERS,
+                    batch_size=config.LOCAL_TTS_BATCH_SIZE,
+                    batch_wait=config.LOCAL_TTS_BATCH_WAIT
+                )
+                _engines[name] = engine
+                logger.info(f"Lokale TTS-Engine {name} gestartet ({config.LOCAL_TTS_WORKERS} Worker, nur CPU)")
+    return engine
+
+def preload_local_engine(name: Optional[str] = None):
+    """Worker der konfigurierten lokalen Engine beim Serverstart aufwärmen."""
+    name = name or config.TTS_ENGINE
+    if name in LOCAL_ENGINES and engine_available(name):
+        get_local_engine(name).warm_up()
+
+def local_engine_stats() -> dict:
+    """Kennzahlen aller gestarteten lokalen Engines."""
+    return {name: engine.stats() for name, engine in list(_engines.items())}
+
+def shutdown_local_engines():
+    """Alle Worker-Prozesse beenden."""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.shutdown()
+        _engines.clear()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Arbeitsspeicher-Cache für das Langzeitgedächtnis.
+Hält alle Erinnerungen geparst im RAM. Schreibvorgänge über memory_service
+werden direkt in den Cache übernommen; Änderungen von außen (andere Prozesse,
+manuell bearbeitete Datei) werden an Änderungszeit und Größe der
+Speicherdateien erkannt und lösen ein Neuladen aus.
+"""
+import logging
+import os
+import threading
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def _file_signature(paths) -> Tuple:
+    """(mtime_ns, Größe) je Datei; fehlende Dateien zählen als (0, 0)."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((0, 0))
+    return tuple(signature)
+
+class MemoryCache:
+    """
+    Erinnerungen im Arbeitsspeicher mit Invalidierung bei Dateiänderungen.
+
+    Args:
+        loader: Lädt alle Erinnerungen aus dem Speicher (in Einfügereihenfolge)
+        paths: Dateien, deren Änderung den Cache ungültig macht
+            (bei SQLite die Datenbank und ihr WAL)
+    """
+
+    def __init__(self, loader: Callable[[], List[dict]], paths):
+        self.loader = loader
+        self.paths = [str(path) for path in paths]
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Wird bei jedem Neuladen aus dem Speicher erhöht (nicht bei eigenen Schreibvorgängen)
+        self.generation = 0
+        self._memories: Optional[List[dict]] = None
+        self._signature = None
+        self._lock = threading.RLock()
+
+    def _is_fresh(self) -> bool:
+        return self._memories is not None and _file_signature(self.paths) == self._signature
+
+    def get(self) -> List[dict]:
+        """Alle Erinnerungen (bei Bedarf neu geladen). Die Liste nicht verändern."""
+        with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+                return self._memories
+
+            self.misses += 1
+            if self._memories is not None:
+                self.invalidations += 1
+                logger.info("Erinnerungen wurden außerhalb geändert, lade neu")
+            # Signatur vor dem Laden: eine Änderung währenddessen führt zum erneuten Laden
+            signature = _file_signature(self.paths)
+            self._memories = self.loader()
+            self._signature = signature
+            self.generation += 1
+            return self._memories
+
+    def refresh(self) -> int:
+        """Auf Änderungen von außen prüfen und die aktuelle Generation zurückgeben."""
+        with self._lock:
+            self.get()
+            return self.generation
+
+    def write(self, operation: Callable, apply: Callable[[List[dict], object], None]):
+        """
+        Schreibvorgang ausführen und in den Cache übernehmen.
+
+        Args:
+            operation: Schreibt in den Speicher und liefert ein Ergebnis
+            apply: Überträgt das Ergebnis auf die gecachte Liste, apply(memories, result)
+
+        Returns:
+            Das Ergebnis von operation
+        """
+        with self._lock:
+            # Nur ein aktueller Cache darf fortgeschrieben werden
+            fresh = self._is_fresh()
+            result = operation()
+            if fresh:
+                apply(self._memories, result)
+                self._signature = _file_signature(self.paths)
+            else:
+                self._memories = None
+            return result
+
+    def invalidate(self):
+        """Cache verwerfen; der nächste Zugriff lädt neu."""
+        with self._lock:
+            self._memories = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._memories) if self._memories is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
@@ -5,67 +5,90 @@ Intelligenter Memory-Manager für Chat-Erinnerungen.
 import re
 from datetime import datetime
 from services.memory_service import save_memory, get_memories
+from services.memory_retrieval import find_memories
+
+# Auslöser für das Speichern; nur am Anfang der Nachricht, damit Fragen wie
+# "Wie speichere ich eine Datei?" weiter an das LLM gehen. Nur ausdrückliche
+# Befehle: "Note that I use Python 3.8, how do I …" ist eine Frage mit Kontext
+SAVE_TRIGGERS = [
+    # Deutsch
+    r'merke?\s+dir', r'notiere?\s+dir',
+    r'(?:das\s+ist\s+wichtig|wichtig\s+zu\s+wissen)\s*:',
+    
+    # Englisch
+    r'remember\s*:',
+    
+    # Slash-Befehle
+    r'/remember', r'/merken', r'/save'
+]
+
+# Abruf-Befehle, optional gefolgt von einem Suchbegriff
+RECALL_COMMANDS = [r'/recall', r'/memory', r'/memories', r'/erinnerungen']
+
+# Ein einziger vorkompilierter Ausdruck für alle Befehle
+INTENT_PATTERN = re.compile(
+    r'^\s*(?:(?:bitte|please)\s+)?(?:'
+    r'(?:' + '|'.join(SAVE_TRIGGERS) + r')(?![\w-])[\s:,]*(?P<content>\S.*)'
+    r'|(?P<recall>' + '|'.join(RECALL_COMMANDS) + r')(?![\w-])\s*(?P<term>.*)'
+    r')$',
+    re.IGNORECASE | re.DOTALL
+)
+
+SAVE = "save"
+RECALL = "recall"
 
 class MemoryManager:
-    def __init__(self):
-        # Erkennungsmuster für Memory-Befehle
-        self.memory_patterns = [
-            # Deutsch
-            r'(?:merke?\s+dir|erinner[e]?\s+dich|behalte?|speicher[e]?)\s+(.+)',
-            r'(?:vergiss\s+nicht|notier[e]?)\s+(.+)',
-            r'(?:das\s+ist\s+wichtig|wichtig\s+zu\s+wissen)[:\s]*(.+)',
-            
-            # Englisch  
-            r'(?:remember|recall|keep\s+in\s+mind|note\s+that|save\s+this)\s+(.+)',
-            r'(?:don\'t\s+forget|make\s+sure\s+to\s+remember)\s+(.+)',
-            r'(?:this\s+is\s+important|important\s+to\s+know)[:\s]*(.+)',
-            
-            # Slash-Befehle
-            r'/remember\s+(.+)',
-            r'/merken\s+(.+)',
-            r'/save\s+(.+)'
-        ]
+    def match_intent(self, message):
+        """
+        Memory-Befehl in einer Nachricht erkennen.
         
-        # Abruf-Muster
-        self.recall_patterns = [
-            # Deutsch
-            r'(?:was\s+)?(?:weißt\s+du\s+noch|erinnerst\s+du\s+dich)\s*(?:an\s+)?(.+)?',
-            r'(?:was\s+hast\s+du\s+dir\s+)?(?:gemerkt|gespeichert)\s*(?:über\s+)?(.+)?',
-            
-            # Englisch
-            r'(?:what\s+do\s+you\s+)?(?:remember|recall)\s*(?:about\s+)?(.+)?',
-            r'(?:what\s+did\s+you\s+)?(?:save|store|note)\s*(?:about\s+)?(.+)?',
-            
-            # Slash-Befehle
-            r'/recall(?:\s+(.+))?',
-            r'/memory(?:\s+(.+))?',
-            r'/memories'
-        ]
+        Returns:
+            tuple: (SAVE, Inhalt), (RECALL, Suchbegriff oder None) oder (None, None)
+        """
+        match = INTENT_PATTERN.match(message)
+        if not match:
+            return None, None
+        if match.group('recall'):
+            return RECALL, match.group('term').strip() or None
+        content = match.group('content').strip()
+        if '?' in content:
+            # "Merke dir, dass … Wie mache ich …?" enthält eine Frage: an das LLM
+            return None, None
+        return SAVE, content
 
     def should_save_memory(self, message):
         """Prüft ob eine Nachricht als Erinnerung gespeichert werden soll."""
-        message_lower = message.lower().strip()
-        
-        for pattern in self.memory_patterns:
-            match = re.search(pattern, message_lower, re.IGNORECASE)
-            if match:
-                content = match.group(1).strip() if match.group(1) else message
-                return True, content
-        
+        intent, content = self.match_intent(message)
+        if intent == SAVE:
+            return True, content
         return False, None
 
     def should_recall_memory(self, message):
         """Prüft ob Erinnerungen abgerufen werden sollen."""
-        message_lower = message.lower().strip()
-        
-        for pattern in self.recall_patterns:
-            match = re.search(pattern, message_lower, re.IGNORECASE)
-            if match:
-                search_term = match.group(1).strip() if match.group(1) else None
-                return True, search_term
-        
+        intent, search_term = self.match_intent(message)
+        if intent == RECALL:
+            return True, search_term
         return False, None
 
+    def handle_command(self, message):
+        """
+        Memory-Befehl direkt beantworten, ohne das LLM zu fragen.
+        
+        Returns:
+            tuple: (Intent, Antworttext) oder (None, None), wenn kein Befehl vorliegt
+        """
+        intent, argument = self.match_intent(message)
+        if intent == SAVE:
+            if save_memory(argument):
+                return intent, f"✅ Ich habe mir gemerkt: {argument}"
+            return intent, "❌ Die Erinnerung konnte nicht gespeichert werden."
+        if intent == RECALL:
+            success, memories = self.search_memories(argument)
+            if not success:
+                return intent, memories
+            return intent, self.format_memories_response(memories)
+        return None, None
+
     def save_context_memory(self, user_message, context=None):
         """Speichert eine Kontext-Erinnerung."""
         try:
@@ -81,22 +104,18 @@ class MemoryManager:
         except Exception as e:
             return False, f"❌ Fehler beim Speichern: {e}"
 
-    def search_memories(self, search_term=None):
-        """Durchsucht gespeicherte Erinnerungen."""
+    def search_memories(self, search_term=None, offset=0, limit=None):
+        """
+        Durchsucht gespeicherte Erinnerungen (Teilstring, Wortanfang, Tippfehler).
+        
+        Ohne Suchbegriff werden die letzten fünf Erinnerungen geliefert,
+        sonst die Treffer nach Relevanz sortiert (beste zuerst).
+        """
         try:
-            memories = get_memories()
-            
             if not search_term:
-                recent_memories = memories[-5:] if len(memories) > 5 else memories
-                return True, recent_memories
-            
-            matching_memories = []
-            search_lower = search_term.lower()
-            
-            for memory in memories:
-                if search_lower in memory.get('text', '').lower():
-                    matching_memories.append(memory)
+                return True, get_memories(limit=5)
             
+            matching_memories, _ = find_memories(search_term, offset, limit)
             return True, matching_memories
             
         except Exception as e:
@@ -109,7 +128,7 @@ class MemoryManager:
         
         response = "📚 **Meine Erinnerungen:**\n\n"
         
-        for i, memory in enumerate(memories[-10:], 1):
+        for i, memory in enumerate(memories[:10], 1):
             timestamp = memory.get('timestamp', 'Unbekannt')
             text = memory.get('text', '')
             
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Relevanz-Suche im Langzeitgedächtnis.
+Statt der letzten fünf Erinnerungen werden die zur Nachricht passendsten
+ausgewählt (BM25, optional kombiniert mit Embeddings), begrenzt durch ein
+Token-Budget. Außerdem Teilstring-/Tippfehler-Suche für den MemoryManager.
+Die Indizes werden einmal aufgebaut und danach über die Memory-Listener
+inkrementell aktualisiert.
+"""
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+import config
+from services.memory_service import add_memory_listener, get_memories, memory_generation
+from services.search_index import BM25Index, SubstringIndex, VectorIndex, combine_scores, create_embedder
+from services.token_budget import MESSAGE_OVERHEAD, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+class MemoryRetriever:
+    """
+    Suchindex über alle Erinnerungen.
+
+    Args:
+        embedder: Optionaler Embedder (siehe search_index.create_embedder)
+        embedding_weight: Gewicht der Embedding-Ähnlichkeit gegenüber BM25
+    """
+
+    def __init__(self, embedder=None, embedding_weight: float = 1.0):
+        self.embedder = embedder
+        self.embedding_weight = embedding_weight
+        self._bm25 = BM25Index()
+        self._text = SubstringIndex()
+        self._vectors = VectorIndex() if embedder else None
+        self._memories = {}
+        self._order = []  # IDs in Einfügereihenfolge (für den Rückfall auf die neuesten)
+        self._loaded = False
+        self._generation = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._memories)
+
+    def load(self, memories: List[dict]):
+        """Index vollständig aus einer Liste von Erinnerungen aufbauen."""
+        with self._lock:
+            self._bm25 = BM25Index()
+            self._text = SubstringIndex()
+            self._vectors = VectorIndex() if self.embedder else None
+            self._memories = {}
+            self._order = []
+            for memory in memories:
+                self._memories[memory['id']] = memory
+                self._order.append(memory['id'])
+                self._bm25.add(memory['id'], memory.get('text', ''))
+                self._text.add(memory['id'], memory.get('text', ''))
+            self._embed(memories)
+            self._loaded = True
+        logger.info(f"Memory-Index aufgebaut: {len(memories)} Erinnerungen")
+
+    def _embed(self, memories: List[dict]):
+        if self._vectors is None or not memories:
+            return
+        try:
+            vectors = self.embedder.embed([memory.get('text', '') for memory in memories])
+            self._vectors.add_many([memory['id'] for memory in memories], vectors)
+        except Exception as e:
+            # Ohne Embeddings weiter mit BM25 allein
+            logger.warning(f"Embeddings nicht verfügbar, verwende nur BM25: {e}")
+            self.embedder = None
+            self._vectors = None
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load(get_memories())
+
+    def sync(self, generation: int):
+        """Index neu aufbauen, wenn der Speicher außerhalb geändert wurde (siehe memory_service.memory_generation)."""
+        if generation != self._generation:
+            self.load(get_memories())
+            self._generation = generation
+
+    def on_memory_event(self, event: str, memory: Optional[dict] = None):
+        """Listener für memory_service: Index inkrementell nachführen."""
+        with self._lock:
+            if not self._loaded:
+                return
+            if event == "save" and memory:
+                if memory['id'] not in self._memories:
+                    self._order.append(memory['id'])
+                self._memories[memory['id']] = memory
+                self._bm25.add(memory['id'], memory.get('text', ''))
+                self._text.add(memory['id'], memory.get('text', ''))
+                self._embed([memory])
+            elif event == "clear":
+                self.load([])
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[dict, float]]:
+        """
+        Die k relevantesten Erinnerungen zu einer Anfrage suchen.
+
+        Returns:
+            List[Tuple[dict, float]]: (Erinnerung, Score), absteigend nach Relevanz
+        """
+        self._ensure_loaded()
+        query_vector = None
+        if self._vectors is not None and query.strip():
+            try:
+                query_vector = self.embedder.embed([query])[0]
+            except Exception as e:
+                logger.warning(f"Embedding der Anfrage fehlgeschlagen: {e}")
+
+        with self._lock:
+            rankings = [self._bm25.search(query, k)]
+            weights = [1.0]
+            if query_vector is not None and self._vectors is not None:
+                rankings.append(self._vectors.search(query_vector, k))
+                weights.append(self.embedding_weight)
+            ranked = combine_scores(*rankings, weights=weights)
+            return [(self._memories[memory_id], score) for memory_id, score in ranked[:k]
+                    if memory_id in self._memories]
+
+    def find(self, term: str, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[dict], int]:
+        """
+        Erinnerungen per Teilstring, Wortanfang oder mit Tippfehlern finden.
+
+        Returns:
+            Tuple[List[dict], int]: Trefferseite (beste zuerst) und Gesamtzahl
+        """
+        self._ensure_loaded()
+        with self._lock:
+            ranked, total = self._text.search(term, offset, limit)
+            return [self._memories[memory_id] for memory_id, _ in ranked if memory_id in self._memories], total
+
+    def recent(self, k: int = 5) -> List[dict]:
+        """Die k neuesten Erinnerungen."""
+        self._ensure_loaded()
+        with self._lock:
+            return [self._memories[memory_id] for memory_id in self._order[-k:]]
+
+    def retrieve(self, query: str, k: int = 5, token_budget: Optional[int] = None) -> List[dict]:
+        """
+        Die relevantesten Erinnerungen innerhalb eines Token-Budgets auswählen.
+
+        Ohne Treffer (z.B. bei einer Begrüßung) wird auf die neuesten
+        Erinnerungen zurückgegriffen.
+
+        Args:
+            query: Nachricht des Benutzers
+            k: Maximale Anzahl Erinnerungen
+            token_budget: Maximale geschätzte Tokens aller Erinnerungen zusammen
+        """
+        candidates = [memory for memory, _ in self.search(query, k * 3)]
+        if not candidates:
+            candidates = list(reversed(self.recent(k)))
+
+        selected = []
+        used = 0
+        for memory in candidates:
+            cost = estimate_tokens(memory.get('text', '')) + MESSAGE_OVERHEAD
+            if token_budget is not None and used + cost > token_budget:
+                continue
+            selected.append(memory)
+            used += cost
+            if len(selected) >= k:
+                break
+        return selected
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+def get_memory_retriever() -> MemoryRetriever:
+    """Gemeinsamen Memory-Index abrufen (wird beim ersten Aufruf erstellt und registriert)."""
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                embedder = create_embedder(config.MEMORY_EMBEDDINGS, config.MEMORY_EMBEDDING_MODEL)
+                retriever = MemoryRetriever(embedder)
+                add_memory_listener(retriever.on_memory_event)
+                _retriever = retriever
+    return _retriever
+
+def _synced_retriever() -> MemoryRetriever:
+    retriever = get_memory_retriever()
+    retriever.sync(memory_generation())
+    return retriever
+
+def find_memories(term: str, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[dict], int]:
+    """
+    Volltextsuche im Langzeitgedächtnis (Teilstring, Präfix, Tippfehler).
+
+    Returns:
+        Tuple[List[dict], int]: Trefferseite (beste zuerst) und Gesamtzahl
+    """
+    return _synced_retriever().find(term, offset, limit)
+
+def retrieve_memories(query: str, k: Optional[int] = None, token_budget: Optional[int] = None) -> List[dict]:
+    """
+    Passende Erinnerungen für eine Chat-Nachricht abrufen.
+
+    Args:
+        query: Nachricht des Benutzers
+        k: Maximale Anzahl, Standard config.MEMORY_TOP_K
+        token_budget: Token-Budget, Standard config.MEMORY_TOKEN_BUDGET
+    """
+    return _synced_retriever().retrieve(
+        query,
+        k or config.MEMORY_TOP_K,
+        token_budget if token_budget is not None else config.MEMORY_TOKEN_BUDGET
+    )
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 """
 Memory-Service für die Verwaltung des Langzeitgedächtnisses.
+Standard-Speicher ist SQLite (services.memory_store); die frühere JSON-Datei
+bleibt als Backend "json" verfügbar und wird sonst einmalig übernommen.
+Gelesen wird aus einem Arbeitsspeicher-Cache (services.memory_cache).
 """
 import logging
 import json
@@ -8,122 +11,202 @@ import os
 from datetime import datetime
 from pathlib import Path
 
+from services.memory_cache import MemoryCache
+from services.memory_store import SQLiteMemoryStore
+
 # Sicherer Import
 try:
     import config
     MEMORIES_DIR = config.MEMORIES_DIR
+    MEMORY_BACKEND = config.MEMORY_BACKEND
     print(f"✅ Config geladen, MEMORIES_DIR: {MEMORIES_DIR}")
 except Exception as e:
     # Fallback wenn config nicht funktioniert
     MEMORIES_DIR = Path(__file__).parent.parent.parent / "data" / "memories"
+    MEMORY_BACKEND = "sqlite"
     print(f"⚠️  Config-Fehler ({e}), verwende Fallback: {MEMORIES_DIR}")
 
 logger = logging.getLogger(__name__)
 
-# Pfad zur Erinnerungsdatei
+# Pfad zur Erinnerungsdatei (JSON-Backend bzw. Quelle der Migration)
 MEMORIES_FILE = MEMORIES_DIR / "long_term_memories.json"
+MEMORIES_DB = MEMORIES_DIR / "memories.db"
+
+_store = SQLiteMemoryStore(MEMORIES_DB, json_path=MEMORIES_FILE) if MEMORY_BACKEND == "sqlite" else None
+
+# Beobachter für Änderungen (z.B. Suchindex): callback(event, memory) mit event "save" oder "clear"
+_listeners = []
+
+def add_memory_listener(callback):
+    """Callback registrieren, der nach jedem Speichern/Löschen aufgerufen wird."""
+    _listeners.append(callback)
+
+def _notify(event, memory=None):
+    for callback in list(_listeners):
+        try:
+            callback(event, memory)
+        except Exception as e:
+            logger.warning(f"Fehler im Memory-Listener ({event}): {e}")
 
 def _ensure_memories_file():
     """Stellt sicher, dass die Erinnerungsdatei existiert."""
     try:
-        print(f"🔍 Prüfe Erinnerungsdatei: {MEMORIES_FILE}")
-        
         if not MEMORIES_FILE.exists():
-            print(f"📁 Erstelle Verzeichnis: {MEMORIES_FILE.parent}")
             MEMORIES_FILE.parent.mkdir(parents=True, exist_ok=True)
-            
-            print(f"📄 Erstelle Datei: {MEMORIES_FILE}")
             with open(MEMORIES_FILE, 'w', encoding='utf-8') as f:
                 json.dump([], f, ensure_ascii=False, indent=2)
-            
-            print("✅ Erinnerungsdatei erfolgreich erstellt!")
-        else:
-            print("✅ Erinnerungsdatei existiert bereits!")
-            
+            logger.info(f"Erinnerungsdatei erstellt: {MEMORIES_FILE}")
+        
         return True
         
     except Exception as e:
-        print(f"❌ Fehler beim Erstellen der Erinnerungsdatei: {e}")
         logger.error(f"Fehler bei _ensure_memories_file: {e}")
         return False
 
+def _load_memories():
+    """Alle Erinnerungen aus dem Speicher lesen (Loader des Caches)."""
+    if _store is not None:
+        memories = _store.query()
+    elif not _ensure_memories_file():
+        memories = []
+    else:
+        with open(MEMORIES_FILE, 'r', encoding='utf-8') as f:
+            memories = json.load(f)
+    logger.debug(f"{len(memories)} Erinnerungen aus dem Speicher geladen")
+    return memories
+
+if _store is not None:
+    # Im WAL-Modus ändert ein Schreibvorgang zuerst die -wal-Datei
+    _cache = MemoryCache(_load_memories, [MEMORIES_DB, f"{MEMORIES_DB}-wal"])
+else:
+    _cache = MemoryCache(_load_memories, [MEMORIES_FILE])
+
+def _append(memories, memory):
+    memories.append(memory)
+
+def _clear(memories, _):
+    memories.clear()
+
 def save_memory(text):
     """Eine neue Erinnerung speichern."""
     try:
-        print(f"💾 Speichere Erinnerung: {text[:50]}...")
+        if _store is not None:
+            new_memory = _cache.write(lambda: _store.add(text), _append)
+            logger.info(f"Erinnerung #{new_memory['id']} gespeichert: {text[:100]}")
+            _notify("save", new_memory)
+            return True
         
         if not _ensure_memories_file():
-            print("❌ Konnte Erinnerungsdatei nicht erstellen!")
+            logger.error("Konnte Erinnerungsdatei nicht erstellen")
             return False
         
-        # Aktuelle Erinnerungen laden
-        try:
-            with open(MEMORIES_FILE, 'r', encoding='utf-8') as f:
-                memories = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            print("⚠️  Erstelle neue Erinnerungsliste")
-            memories = []
-        
-        # Neue Erinnerung hinzufügen
-        new_memory = {
-            "id": len(memories) + 1,
-            "timestamp": datetime.now().isoformat(),
-            "text": text
-        }
-        memories.append(new_memory)
-        
-        # Speichern mit Backup
-        backup_file = MEMORIES_FILE.with_suffix('.json.backup')
-        
-        # Backup erstellen
-        if MEMORIES_FILE.exists():
-            import shutil
-            shutil.copy2(MEMORIES_FILE, backup_file)
-        
-        # Neue Datei schreiben
-        with open(MEMORIES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(memories, f, ensure_ascii=False, indent=2)
-        
-        print(f"✅ Erinnerung #{new_memory['id']} erfolgreich gespeichert!")
-        logger.info(f"Erinnerung gespeichert: {text[:100]}")
+        new_memory = _cache.write(lambda: _append_to_file(text), _append)
+        logger.info(f"Erinnerung #{new_memory['id']} gespeichert: {text[:100]}")
+        _notify("save", new_memory)
         return True
         
     except Exception as e:
-        print(f"❌ Fehler beim Speichern: {e}")
         logger.error(f"Fehler bei save_memory: {e}")
         return False
 
-def get_memories():
-    """Alle Erinnerungen abrufen."""
+def _append_to_file(text):
+    """Erinnerung an die JSON-Datei anhängen (JSON-Backend)."""
+    # Aktuelle Erinnerungen laden
     try:
-        if not _ensure_memories_file():
-            return []
-        
         with open(MEMORIES_FILE, 'r', encoding='utf-8') as f:
             memories = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        logger.warning("Erinnerungsdatei unlesbar, erstelle neue Erinnerungsliste")
+        memories = []
+    
+    # Neue Erinnerung hinzufügen
+    new_memory = {
+        "id": len(memories) + 1,
+        "timestamp": datetime.now().isoformat(),
+        "text": text
+    }
+    memories.append(new_memory)
+    
+    # Backup erstellen
+    backup_file = MEMORIES_FILE.with_suffix('.json.backup')
+    if MEMORIES_FILE.exists():
+        import shutil
+        shutil.copy2(MEMORIES_FILE, backup_file)
+    
+    # Neue Datei schreiben
+    with open(MEMORIES_FILE, 'w', encoding='utf-8') as f:
+        json.dump(memories, f, ensure_ascii=False, indent=2)
+    return new_memory
+
+def get_memories(since=None, until=None, limit=None):
+    """
+    Erinnerungen abrufen (Standard: alle, in Einfügereihenfolge).
+    
+    Args:
+        since (str, optional): Nur Erinnerungen ab diesem ISO-Zeitstempel
+        until (str, optional): Nur Erinnerungen vor diesem ISO-Zeitstempel
+        limit (int, optional): Nur die neuesten `limit` Erinnerungen
+    """
+    try:
+        memories = _cache.get()
+        
+        if since:
+            memories = [m for m in memories if m.get('timestamp', '') >= since]
+        if until:
+            memories = [m for m in memories if m.get('timestamp', '') < until]
+        if limit:
+            memories = memories[-limit:]
         
-        print(f"📚 {len(memories)} Erinnerungen geladen")
-        return memories
+        # Kopie, damit Aufrufer den Cache nicht verändern
+        return list(memories)
         
     except Exception as e:
-        print(f"❌ Fehler beim Laden: {e}")
         logger.error(f"Fehler bei get_memories: {e}")
         return []
 
+def get_memory(memory_id):
+    """Eine Erinnerung anhand ihrer ID abrufen (None, wenn nicht vorhanden)."""
+    try:
+        if _store is not None:
+            return _store.get(memory_id)
+        
+        return next((m for m in get_memories() if m.get('id') == memory_id), None)
+        
+    except Exception as e:
+        logger.error(f"Fehler bei get_memory: {e}")
+        return None
+
+def _clear_file():
+    with open(MEMORIES_FILE, 'w', encoding='utf-8') as f:
+        json.dump([], f, ensure_ascii=False, indent=2)
+
 def clear_memories():
     """Alle Erinnerungen löschen."""
     try:
-        with open(MEMORIES_FILE, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+        if _store is not None:
+            _cache.write(_store.clear, _clear)
+        else:
+            _cache.write(_clear_file, _clear)
         
-        print("🗑️  Alle Erinnerungen gelöscht!")
+        logger.info("Alle Erinnerungen gelöscht")
+        _notify("clear")
         return True
         
     except Exception as e:
-        print(f"❌ Fehler beim Löschen: {e}")
         logger.error(f"Fehler bei clear_memories: {e}")
         return False
 
+def memory_generation():
+    """
+    Auf Änderungen von außen prüfen; liefert einen Zähler, der sich bei jedem
+    Neuladen aus dem Speicher ändert (für abgeleitete Indizes).
+    """
+    return _cache.refresh()
+
+def memory_cache_stats():
+    """Kennzahlen des Memory-Caches."""
+    return _cache.stats()
+
 # Test-Funktion
 def test_memory_service():
     """Teste den Memory Service"""
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite-Speicher für das Langzeitgedächtnis.
+WAL-Modus erlaubt gleichzeitiges Lesen während eines Schreibvorgangs; jede
+Erinnerung ist eine eigene Zeile (O(1)-Einfügen statt Neuschreiben der Datei),
+IDs werden per AUTOINCREMENT vergeben und nie wiederverwendet.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_memories_timestamp ON memories (timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def _row_to_memory(row) -> dict:
+    return {"id": row[0], "timestamp": row[1], "text": row[2]}
+
+class SQLiteMemoryStore:
+    """
+    Erinnerungen in einer SQLite-Datenbank (eine Verbindung pro Thread).
+
+    Args:
+        db_path: Pfad der Datenbankdatei
+        json_path: Alte JSON-Datei, die beim ersten Öffnen einmalig übernommen wird
+    """
+
+    def __init__(self, db_path, json_path=None):
+        self.db_path = str(db_path)
+        self.json_path = json_path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            # isolation_level=None: Transaktionen werden explizit gesteuert
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    connection.executescript(_SCHEMA)
+                    self._migrate_json(connection)
+                    self._initialized = True
+        return connection
+
+    def _migrate_json(self, connection: sqlite3.Connection):
+        """Einmalige Übernahme der bisherigen long_term_memories.json."""
+        if not self.json_path or not os.path.exists(self.json_path):
+            return
+        if connection.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+
+        try:
+            with open(self.json_path, 'r', encoding='utf-8') as f:
+                memories = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"JSON-Erinnerungen nicht lesbar, Migration übersprungen: {e}")
+            return
+
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            seen_ids = set()
+            for memory in memories:
+                memory_id = memory.get("id")
+                # Alte IDs (len+1) können doppelt sein; dann neue ID vergeben
+                if not isinstance(memory_id, int) or memory_id in seen_ids:
+                    memory_id = None
+                else:
+                    seen_ids.add(memory_id)
+                connection.execute(
+                    "INSERT INTO memories (id, timestamp, text) VALUES (?, ?, ?)",
+                    (memory_id, memory.get("timestamp") or datetime.now().isoformat(), memory.get("text", ""))
+                )
+            connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (datetime.now().isoformat(),)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        os.replace(self.json_path, f"{self.json_path}.migrated")
+        logger.info(f"{len(memories)} Erinnerungen aus {self.json_path} nach SQLite übernommen")
+
+    def add(self, text: str) -> dict:
+        """Erinnerung anhängen und mit vergebener ID zurückgeben."""
+        timestamp = datetime.now().isoformat()
+        cursor = self._connect().execute(
+            "INSERT INTO memories (timestamp, text) VALUES (?, ?)", (timestamp, text)
+        )
+        return {"id": cursor.lastrowid, "timestamp": timestamp, "text": text}
+
+    def get(self, memory_id: int) -> Optional[dict]:
+        """Erinnerung anhand ihrer ID abrufen."""
+        row = self._connect().execute(
+            "SELECT id, timestamp, text FROM memories WHERE id = ?", (memory_id,)
+        ).fetchone()
+        return _row_to_memory(row) if row else None
+
+    def query(self, since: Optional[str] = None, until: Optional[str] = None,
+              limit: Optional[int] = None) -> List[dict]:
+        """
+        Erinnerungen in Einfügereihenfolge abrufen.
+
+        Args:
+            since: Nur Erinnerungen ab diesem ISO-Zeitstempel
+            until: Nur Erinnerungen vor diesem ISO-Zeitstempel
+            limit: Nur die neuesten `limit` Erinnerungen
+        """
+        query = "SELECT id, timestamp, text FROM memories"
+        conditions, params = [], []
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            conditions.append("timestamp < ?")
+            params.append(until)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        if limit:
+            query = f"SELECT * FROM ({query} ORDER BY id DESC LIMIT ?) ORDER BY id"
+            params.append(limit)
+        else:
+            query += " ORDER BY id"
+
+        return [_row_to_memory(row) for row in self._connect().execute(query, params)]
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+    def clear(self):
+        """Alle Erinnerungen löschen (IDs werden danach nicht erneut vergeben)."""
+        self._connect().execute("DELETE FROM memories")
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Modellverwaltung für Ollama.
+Zwischengespeicherte Modellliste (/api/tags) mit Ablaufzeit, Abfrage der
+geladenen Modelle (/api/ps) und Vorladen konfigurierter Modelle, damit die
+erste Anfrage nach einem Neustart nicht die Ladezeit des Modells bezahlt.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import List, Optional
+
+import config
+from services.ollama_client import ollama_post, ollama_request_async
+from services.ollama_router import get_router
+from services.token_budget import context_window
+
+logger = logging.getLogger(__name__)
+
+def keep_alive_for(model_name: str):
+    """keep_alive für ein Modell (Eintrag in MODEL_KEEP_ALIVE, sonst OLLAMA_KEEP_ALIVE)."""
+    value = config.MODEL_KEEP_ALIVE.get(model_name)
+    if value is None:
+        value = config.MODEL_KEEP_ALIVE.get(model_name.split(':')[0], config.OLLAMA_KEEP_ALIVE)
+    value = str(value).strip()
+    # Reine Zahlen versteht Ollama nur als JSON-Zahl (Sekunden), nicht als String
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+class ModelCatalog:
+    """
+    Modellliste von Ollama mit Ablaufzeit.
+
+    Ist Ollama beim Aktualisieren nicht erreichbar, wird die zuletzt bekannte
+    Liste weiter ausgeliefert und nach retry_interval erneut abgefragt.
+
+    Args:
+        ttl: Sekunden, die eine abgerufene Liste gültig bleibt
+        retry_interval: Sekunden bis zum nächsten Versuch nach einem Fehler
+    """
+
+    def __init__(self, ttl: float, retry_interval: float = 5.0):
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.hits = 0
+        self.refreshes = 0
+        self.failures = 0
+        self._models: Optional[List[str]] = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def _cached(self) -> Optional[List[str]]:
+        with self._lock:
+            if self._models is not None and time.monotonic() < self._expires:
+                self.hits += 1
+                return list(self._models)
+        return None
+
+    def _store(self, models: Optional[List[str]]) -> List[str]:
+        """Ergebnis einer Abfrage übernehmen (None = fehlgeschlagen)."""
+        with self._lock:
+            if models is None:
+                self.failures += 1
+                self._expires = time.monotonic() + self.retry_interval
+                if self._models:
+                    logger.warning(f"Modellliste nicht abrufbar, verwende {len(self._models)} bekannte Modelle")
+                return list(self._models or [])
+            self.refreshes += 1
+            self._models = models
+            self._expires = time.monotonic() + self.ttl
+            return list(models)
+
+    def get(self) -> List[str]:
+        """Modellnamen (bei Ablauf neu von /api/tags abgerufen)."""
+        cached = self._cached()
+        if cached is not None:
+            return cached
+        return self._store(_fetch_models())
+
+    async def get_async(self) -> List[str]:
+        """Asynchrone Variante von get (für den ASGI-Server)."""
+        cached = self._cached()
+        if cached is not None:
+            return cached
+        return self._store(await _fetch_models_async())
+
+    def invalidate(self):
+        """Liste verwerfen, z.B. wenn Ollama ein Modell nicht (mehr) kennt."""
+        with self._lock:
+            self._expires = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": len(self._models or []),
+                "hits": self.hits,
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+            }
+
+def _merge_models(results) -> Optional[List[str]]:
+    """Modelllisten der Knoten zusammenführen (None, wenn kein Knoten antwortete)."""
+    if not results:
+        return None
+    router = get_router()
+    models = {}
+    for node, models_data in results:
+        names = [model["name"] for model in models_data.get("models", [])]
+        router.update_available(node, names)
+        models.update(dict.fromkeys(names))
+    return list(models)
+
+def _fetch_models() -> Optional[List[str]]:
+    return _merge_models(get_router().for_each_node("GET", "/api/tags"))
+
+async def _fetch_node_models_async(node):
+    try:
+        async with ollama_request_async("GET", "/api/tags", base_url=node.url) as response:
+            if response.status == 200:
+                return node, await response.json()
+            logger.error(f"Fehler beim Abrufen der Modelle: {response.status} {await response.text()}")
+    except Exception as e:
+        logger.error(f"Fehler bei der Verbindung zu Ollama ({node.url}): {e}")
+    return None
+
+async def _fetch_models_async() -> Optional[List[str]]:
+    results = await asyncio.gather(*(_fetch_node_models_async(node) for node in get_router().nodes))
+    return _merge_models([result for result in results if result is not None])
+
+_catalog = ModelCatalog(config.MODEL_LIST_TTL)
+
+def get_model_catalog() -> ModelCatalog:
+    """Gemeinsame Modellliste abrufen."""
+    return _catalog
+
+def get_resident_models() -> List[dict]:
+    """
+    Aktuell von Ollama geladene Modelle (/api/ps, über alle Knoten).
+
+    Returns:
+        List[dict]: [{"name", "node", "size_vram", "expires_at"}, ...]; leer bei Fehlern
+    """
+    return [
+        {
+            "name": model.get("name"),
+            "node": node.url,
+            "size_vram": model.get("size_vram", 0),
+            "expires_at": model.get("expires_at"),
+        }
+        for node, ps_data in get_router().for_each_node("GET", "/api/ps")
+        for model in ps_data.get("models", [])
+    ]
+
+def preload_model(model_name: str, base_url: Optional[str] = None) -> bool:
+    """
+    Modell in Ollama laden (generate ohne Prompt, mit keep_alive und dem
+    num_ctx der Chat-Anfragen, sonst lädt Ollama das Modell beim ersten Chat neu).
+
+    Args:
+        model_name: Modellname
+        base_url: Ollama-Knoten (Standard: config.OLLAMA_BASE_URL)
+
+    Returns:
+        bool: True, wenn Ollama das Modell geladen hat
+    """
+    start = time.perf_counter()
+    try:
+        response = ollama_post("/api/generate", base_url=base_url,
+                               json={"model": model_name, "keep_alive": keep_alive_for(model_name),
+                                     "options": {"num_ctx": context_window(model_name)}})
+        if response.status_code == 200:
+            logger.info(f"Modell {model_name} vorgeladen ({time.perf_counter() - start:.1f}s, {base_url or config.OLLAMA_BASE_URL})")
+            return True
+        logger.warning(f"Modell {model_name} nicht vorgeladen: {response.status_code} {response.text}")
+    except Exception as e:
+        logger.warning(f"Modell {model_name} nicht vorgeladen: {e}")
+    return False
+
+class ModelWarmer:
+    """
+    Hintergrund-Thread: lädt die konfigurierten Modelle beim Start und lädt
+    sie erneut, sobald Ollama sie entladen hat. Hält nebenbei die
+    Modellliste aktuell.
+
+    Args:
+        models: Vorzuladende Modellnamen
+        interval: Sekunden zwischen zwei Prüfungen (0 = nur beim Start)
+    """
+
+    def __init__(self, models: List[str], interval: float):
+        self.models = list(models)
+        self.interval = interval
+        self.preloads = 0
+        self.last_check = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-warmer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def warm(self):
+        """Nicht geladene Modelle vorladen."""
+        _catalog.get()
+        # Auf jedem erreichbaren Knoten, der das Modell anbietet (bzw. dessen Liste unbekannt ist)
+        for node, ps_data in get_router().for_each_node("GET", "/api/ps"):
+            resident = {model.get("name") for model in ps_data.get("models", [])}
+            for model_name in self.models:
+                # Ohne Tag meldet Ollama das Modell als "<name>:latest"
+                names = {model_name, f"{model_name}:latest"}
+                offered = not node.available or names & node.available
+                if offered and not names & resident and not self._stop.is_set():
+                    if preload_model(model_name, node.url):
+                        self.preloads += 1
+        self.last_check = time.time()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.warm()
+            if self.interval <= 0:
+                break
+            self._stop.wait(self.interval)
+
+    def stats(self) -> dict:
+        return {"models": self.models, "preloads": self.preloads, "last_check": self.last_check}
+
+_warmer: Optional[ModelWarmer] = None
+
+def start_model_warmer() -> Optional[ModelWarmer]:
+    """Vorladen der konfigurierten Modelle im Hintergrund starten (ohne PRELOAD_MODELS nichts)."""
+    global _warmer
+    if _warmer is None and config.PRELOAD_MODELS:
+        _warmer = ModelWarmer(config.PRELOAD_MODELS, config.MODEL_WARM_INTERVAL)
+        _warmer.start()
+        logger.info(f"Vorladen gestartet: {', '.join(config.PRELOAD_MODELS)}")
+    return _warmer
+
+def stop_model_warmer():
+    if _warmer is not None:
+        _warmer.stop()
+
+def model_stats() -> dict:
+    """Kennzahlen der Modellliste und des Vorladens."""
+    return {
+        "catalog": _catalog.stats(),
+        "warmer": _warmer.stats() if _warmer is not None else None,
+    }
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Gemeinsamer HTTP-Client für alle Ollama-Aufrufe.
+Connection-Pooling mit Keep-Alive, Timeouts und Retries mit Backoff.
+Synchron (requests) für den Flask-Server, asynchron (aiohttp) für den ASGI-Server.
+"""
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.retry import Retry
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Status-Codes, bei denen ein erneuter Versuch gefahrlos ist: 503 heißt "überlastet,
+# nicht bearbeitet"; bei 500/502/504 hat Ollama womöglich schon gerechnet
+RETRY_STATUS_CODES = (503,)
+
+_session = None
+_direct_session = None  # ohne Retries, für den Router (wiederholt auf anderen Knoten)
+_session_lock = threading.Lock()
+
+# Asynchrone Session, gebunden an die Event-Loop, in der sie erstellt wurde
+_async_session = None
+_async_session_loop = None
+
+def _create_session(max_retries: int) -> requests.Session:
+    """Session mit Connection-Pool und Retry-Policy aus der Konfiguration erstellen."""
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        # Keine Wiederholung nach Lese-Timeouts oder Abbrüchen während der Antwort:
+        # /api/generate und /api/chat würden sonst doppelt auf der GPU laufen
+        read=0,
+        other=0,
+        status=max_retries,
+        backoff_factor=config.OLLAMA_RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUS_CODES,
+        # Verbindungsfehler und 503 treten auf, bevor Ollama rechnet, daher auch für POST
+        allowed_methods=frozenset({"GET", "POST"}),
+        # Nach dem letzten Versuch die Antwort zurückgeben statt Exception
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config.OLLAMA_POOL_CONNECTIONS,
+        pool_maxsize=config.OLLAMA_POOL_MAXSIZE,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    logger.info(f"Ollama-Session erstellt: Pool {config.OLLAMA_POOL_CONNECTIONS}x{config.OLLAMA_POOL_MAXSIZE}, "
+                f"Timeouts {config.OLLAMA_CONNECT_TIMEOUT}s/{config.OLLAMA_READ_TIMEOUT}s, "
+                f"{max_retries} Retries")
+    return session
+
+def is_connect_error(error: BaseException) -> bool:
+    """
+    Prüfen, ob eine Anfrage an einer fehlgeschlagenen Verbindung scheiterte.
+
+    Nur dann hat Ollama die Anfrage sicher nicht erhalten und ein erneuter
+    Versuch (auch auf einem anderen Knoten) ist gefahrlos.
+    """
+    if isinstance(error, (requests.ConnectTimeout, aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError)):
+        return True
+    if isinstance(error, requests.ConnectionError) and error.args:
+        # Erschöpfte Retries: der eigentliche Grund steckt im MaxRetryError
+        return isinstance(getattr(error.args[0], "reason", None), ConnectTimeoutError)
+    return False
+
+def get_session(retries: bool = True) -> requests.Session:
+    """
+    Gemeinsame Ollama-Session abrufen (wird beim ersten Aufruf erstellt).
+
+    Args:
+        retries (bool): False für eine Session ohne Wiederholungen
+
+    Returns:
+        requests.Session: Thread-übergreifend geteilte Session
+    """
+    global _session, _direct_session
+    if retries:
+        if _session is None:
+            with _session_lock:
+                if _session is None:
+                    _session = _create_session(config.OLLAMA_MAX_RETRIES)
+        return _session
+    if _direct_session is None:
+        with _session_lock:
+            if _direct_session is None:
+                _direct_session = _create_session(0)
+    return _direct_session
+
+def close_session():
+    """Gemeinsame Session schließen (z.B. beim Herunterfahren)."""
+    global _session, _direct_session
+    with _session_lock:
+        for session in (_session, _direct_session):
+            if session is not None:
+                session.close()
+        _session = None
+        _direct_session = None
+
+def ollama_request(method: str, path: str, base_url: Optional[str] = None, timeout=None,
+                   retries: bool = True, **kwargs) -> requests.Response:
+    """
+    Eine Anfrage über die gemeinsame Session an Ollama senden.
+
+    Args:
+        method (str): HTTP-Methode
+        path (str): API-Pfad, z.B. "/api/generate"
+        base_url (str, optional): Ollama-Instanz, Standard ist config.OLLAMA_BASE_URL
+        timeout (optional): (connect, read)-Timeout, Standard aus der Konfiguration
+        retries (bool): Bei Fehlern wiederholen (OLLAMA_MAX_RETRIES)
+        **kwargs: Weitere Argumente für requests (json, stream, ...)
+
+    Returns:
+        requests.Response: Antwort von Ollama
+    """
+    if timeout is None:
+        timeout = (config.OLLAMA_CONNECT_TIMEOUT, config.OLLAMA_READ_TIMEOUT)
+    url = f"{base_url or config.OLLAMA_BASE_URL}{path}"
+    return get_session(retries).request(method, url, timeout=timeout, **kwargs)
+
+def ollama_get(path: str, **kwargs) -> requests.Response:
+    """GET-Anfrage an Ollama (siehe ollama_request)."""
+    return ollama_request("GET", path, **kwargs)
+
+def ollama_post(path: str, **kwargs) -> requests.Response:
+    """POST-Anfrage an Ollama (siehe ollama_request)."""
+    return ollama_request("POST", path, **kwargs)
+
+def get_async_session() -> aiohttp.ClientSession:
+    """
+    Gemeinsame aiohttp-Session der laufenden Event-Loop abrufen.
+
+    Returns:
+        aiohttp.ClientSession: Session mit Keep-Alive-Connection-Pool
+    """
+    global _async_session, _async_session_loop
+    loop = asyncio.get_running_loop()
+    if _async_session is None or _async_session.closed or _async_session_loop is not loop:
+        # Wie beim synchronen Pool (pool_block=False) keine harte Obergrenze:
+        # gleichzeitige Anfragen werden nicht durch die Pool-Größe gedrosselt
+        connector = aiohttp.TCPConnector(limit=0, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=config.OLLAMA_CONNECT_TIMEOUT,
+            sock_read=config.OLLAMA_READ_TIMEOUT
+        )
+        # Größerer Lesepuffer: die letzte Stream-Zeile enthält das komplette context-Array
+        _async_session = aiohttp.ClientSession(connector=connector, timeout=timeout, read_bufsize=2 ** 20)
+        _async_session_loop = loop
+        logger.info("Asynchrone Ollama-Session erstellt")
+    return _async_session
+
+async def close_async_session():
+    """Asynchrone Session schließen (z.B. beim Herunterfahren des ASGI-Servers)."""
+    global _async_session, _async_session_loop
+    if _async_session is not None and not _async_session.closed:
+        await _async_session.close()
+    _async_session = None
+    _async_session_loop = None
+
+@asynccontextmanager
+async def ollama_request_async(method: str, path: str, base_url: Optional[str] = None,
+                               retries: bool = True, **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+    """
+    Eine asynchrone Anfrage an Ollama senden (mit Retries wie die synchrone Session).
+
+    Wiederholt wird nur, wenn Ollama die Anfrage nicht bearbeitet hat: bei
+    fehlgeschlagenem Verbindungsaufbau und bei den Status-Codes aus
+    RETRY_STATUS_CODES, nicht nach Lese-Timeouts.
+
+    Args:
+        method (str): HTTP-Methode
+        path (str): API-Pfad, z.B. "/api/generate"
+        base_url (str, optional): Ollama-Instanz, Standard ist config.OLLAMA_BASE_URL
+        retries (bool): Bei Fehlern wiederholen (OLLAMA_MAX_RETRIES)
+        **kwargs: Weitere Argumente für aiohttp (json, ...)
+
+    Yields:
+        aiohttp.ClientResponse: Antwort von Ollama
+    """
+    url = f"{base_url or config.OLLAMA_BASE_URL}{path}"
+    session = get_async_session()
+
+    max_retries = config.OLLAMA_MAX_RETRIES if retries else 0
+    for attempt in range(max_retries + 1):
+        retries_left = attempt < max_retries
+        try:
+            response = await session.request(method, url, **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if not retries_left or not is_connect_error(e):
+                raise
+            logger.warning(f"Ollama-Verbindungsfehler ({e}), Versuch {attempt + 1}")
+        else:
+            if response.status in RETRY_STATUS_CODES and retries_left:
+                logger.warning(f"Ollama-Status {response.status}, Versuch {attempt + 1}")
+                response.release()
+            else:
+                try:
+                    yield response
+                finally:
+                    response.release()
+                return
+
+        await asyncio.sleep(config.OLLAMA_RETRY_BACKOFF * (2 ** attempt))
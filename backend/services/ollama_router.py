@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Lastverteilung über mehrere Ollama-Instanzen.
+Jede Anfrage geht an den Knoten, der das Modell bereits geladen hat (sonst
+einen, der es anbietet), bei Gleichstand an den mit den wenigsten laufenden
+Anfragen. Knoten mit wiederholten Fehlern werden für eine Weile
+ausgeschlossen; die Anfrage wird dann auf einem anderen Knoten wiederholt.
+Mit nur einer Instanz (Standard: OLLAMA_BASE_URL) verhält sich alles wie bisher.
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, List, Optional, Set
+
+import aiohttp
+import requests
+
+import config
+from services.ollama_client import RETRY_STATUS_CODES, is_connect_error, ollama_request, ollama_request_async
+
+logger = logging.getLogger(__name__)
+
+# Kurzer Timeout für Zustandsabfragen (Health-Check, /api/ps)
+_PROBE_TIMEOUT = (2, 5)
+
+class OllamaNode:
+    """Zustand einer Ollama-Instanz aus Sicht des Routers."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.resident: Set[str] = set()   # geladene Modelle (/api/ps)
+        self.available: Set[str] = set()  # installierte Modelle (/api/tags)
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def has_model(self, names: Set[str], loaded: bool) -> bool:
+        return bool(names & (self.resident if loaded else self.available))
+
+    def stats(self) -> dict:
+        return {
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejected": self.is_ejected(time.monotonic()),
+            "resident": sorted(self.resident),
+        }
+
+def _model_names(model_name: Optional[str]) -> Set[str]:
+    """Namensvarianten eines Modells (Ollama ergänzt fehlende Tags um ":latest")."""
+    if not model_name:
+        return set()
+    return {model_name, model_name if ':' in model_name else f"{model_name}:latest"}
+
+class OllamaRouter:
+    """
+    Verteilt Anfragen auf mehrere Ollama-Instanzen.
+
+    Args:
+        urls: Basis-URLs der Instanzen
+        max_failures: Fehler in Folge, nach denen ein Knoten ausgeschlossen wird
+        eject_seconds: Dauer des Ausschlusses (danach wird er wieder versucht)
+    """
+
+    def __init__(self, urls: List[str], max_failures: int = 3, eject_seconds: float = 30.0):
+        if not urls:
+            raise ValueError("Mindestens eine Ollama-Instanz erforderlich")
+        self.nodes = [OllamaNode(url) for url in urls]
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.failovers = 0
+        self._lock = threading.Lock()
+        self._health_stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+
+    # --- Auswahl ---
+
+    def _pick(self, model_name: Optional[str], tried: Set[str]) -> Optional[OllamaNode]:
+        now = time.monotonic()
+        candidates = [node for node in self.nodes if node.url not in tried and not node.is_ejected(now)]
+        if not candidates:
+            # Alle ausgeschlossen: lieber einen ausgeschlossenen Knoten versuchen als gar keinen
+            candidates = sorted((node for node in self.nodes if node.url not in tried),
+                                key=lambda node: node.ejected_until)[:1]
+        if not candidates:
+            return None
+        names = _model_names(model_name)
+        if names:
+            for loaded in (True, False):
+                preferred = [node for node in candidates if node.has_model(names, loaded)]
+                if preferred:
+                    candidates = preferred
+                    break
+        return min(candidates, key=lambda node: (node.outstanding, node.requests))
+
+    def _acquire(self, model_name: Optional[str], tried: Set[str]) -> Optional[OllamaNode]:
+        with self._lock:
+            node = self._pick(model_name, tried)
+            if node is not None:
+                node.outstanding += 1
+                node.requests += 1
+            return node
+
+    def _release(self, node: OllamaNode, ok: bool, model_name: Optional[str] = None):
+        with self._lock:
+            node.outstanding -= 1
+            if ok:
+                node.consecutive_failures = 0
+                node.ejected_until = 0.0
+                if model_name:
+                    # Nach einer erfolgreichen Anfrage ist das Modell dort geladen
+                    node.resident.add(model_name)
+                return
+            node.errors += 1
+            self._record_failure(node)
+
+    def _record_failure(self, node: OllamaNode):
+        node.consecutive_failures += 1
+        if node.consecutive_failures >= self.max_failures and len(self.nodes) > 1:
+            if not node.is_ejected(time.monotonic()):
+                logger.warning(f"Ollama-Knoten {node.url} ausgeschlossen ({node.consecutive_failures} Fehler in Folge)")
+            node.ejected_until = time.monotonic() + self.eject_seconds
+
+    def _can_retry(self, tried: Set[str]) -> bool:
+        return len(tried) < len(self.nodes)
+
+    # --- Anfragen ---
+
+    @contextmanager
+    def request(self, method: str, path: str, model: Optional[str] = None, **kwargs) -> Iterator[requests.Response]:
+        """
+        Anfrage an einen passenden Knoten senden, bei Verbindungsfehlern und
+        503-Antworten auf dem nächsten wiederholen. Nach Lese-Timeouts wird
+        nicht wiederholt (der Knoten rechnet womöglich noch).
+
+        Args:
+            method: HTTP-Methode
+            path: API-Pfad, z.B. "/api/chat"
+            model: Modell der Anfrage (für die Knotenauswahl)
+            **kwargs: Weitere Argumente für ollama_request (json, stream, ...)
+
+        Yields:
+            requests.Response: Antwort von Ollama (wird beim Verlassen geschlossen)
+        """
+        tried: Set[str] = set()
+        while True:
+            node = self._acquire(model, tried)
+            tried.add(node.url)
+            try:
+                # Erst auf anderen Knoten wiederholen, auf demselben nur beim letzten
+                response = ollama_request(method, path, base_url=node.url, retries=not self._can_retry(tried), **kwargs)
+            except requests.RequestException as e:
+                self._release(node, ok=False)
+                if not self._can_retry(tried) or not is_connect_error(e):
+                    raise
+                self._failover(node, e)
+                continue
+            if response.status_code in RETRY_STATUS_CODES and self._can_retry(tried):
+                response.close()
+                self._release(node, ok=False)
+                self._failover(node, f"Status {response.status_code}")
+                continue
+            ok = response.status_code < 500
+            try:
+                yield response
+            except requests.RequestException:
+                # Abbruch während des Lesens (z.B. beim Streaming)
+                ok = False
+                raise
+            finally:
+                response.close()
+                self._release(node, ok, model if ok and response.status_code == 200 else None)
+            return
+
+    @asynccontextmanager
+    async def request_async(self, method: str, path: str, model: Optional[str] = None,
+                            **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Asynchrone Variante von request (für den ASGI-Server)."""
+        tried: Set[str] = set()
+        while True:
+            node = self._acquire(model, tried)
+            tried.add(node.url)
+            context = ollama_request_async(method, path, base_url=node.url, retries=not self._can_retry(tried), **kwargs)
+            try:
+                response = await context.__aenter__()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self._release(node, ok=False)
+                if not self._can_retry(tried) or not is_connect_error(e):
+                    raise
+                self._failover(node, e)
+                continue
+            if response.status in RETRY_STATUS_CODES and self._can_retry(tried):
+                await context.__aexit__(None, None, None)
+                self._release(node, ok=False)
+                self._failover(node, f"Status {response.status}")
+                continue
+            ok = response.status < 500
+            try:
+                yield response
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                ok = False
+                raise
+            finally:
+                await context.__aexit__(None, None, None)
+                self._release(node, ok, model if ok and response.status == 200 else None)
+            return
+
+    def _failover(self, node: OllamaNode, reason):
+        with self._lock:
+            self.failovers += 1
+        logger.warning(f"Ollama-Knoten {node.url} fehlgeschlagen ({reason}), versuche anderen Knoten")
+
+    def for_each_node(self, method: str, path: str) -> List[tuple]:
+        """
+        Dieselbe (Zustands-)Anfrage an alle nicht ausgeschlossenen Knoten senden.
+
+        Returns:
+            List[tuple]: (Knoten, JSON-Antwort) der erfolgreichen Knoten
+        """
+        now = time.monotonic()
+        results = []
+        for node in self.nodes:
+            if node.is_ejected(now) and len(self.nodes) > 1:
+                continue
+            try:
+                response = ollama_request(method, path, base_url=node.url, timeout=_PROBE_TIMEOUT, retries=False)
+                if response.status_code == 200:
+                    results.append((node, response.json()))
+                else:
+                    logger.error(f"Ollama-Knoten {node.url}: {path} lieferte {response.status_code}")
+            except requests.RequestException as e:
+                logger.error(f"Ollama-Knoten {node.url} nicht erreichbar: {e}")
+        return results
+
+    # --- Health-Check ---
+
+    def check_health(self):
+        """Alle Knoten abfragen: geladene Modelle übernehmen, ausgefallene ausschließen."""
+        for node in self.nodes:
+            try:
+                response = ollama_request("GET", "/api/ps", base_url=node.url, timeout=_PROBE_TIMEOUT, retries=False)
+                response.raise_for_status()
+                resident = {model.get("name") for model in response.json().get("models", [])}
+            except (requests.RequestException, ValueError) as e:
+                with self._lock:
+                    self._record_failure(node)
+                logger.debug(f"Health-Check {node.url} fehlgeschlagen: {e}")
+                continue
+            with self._lock:
+                if node.is_ejected(time.monotonic()):
+                    logger.info(f"Ollama-Knoten {node.url} wieder erreichbar")
+                node.resident = resident
+                node.consecutive_failures = 0
+                node.ejected_until = 0.0
+
+    def update_available(self, node: OllamaNode, models: List[str]):
+        """Installierte Modelle eines Knotens übernehmen (aus /api/tags)."""
+        with self._lock:
+            node.available = set(models)
+
+    def start_health_checks(self, interval: float):
+        """Health-Check im Hintergrund (nur bei mehreren Knoten nötig)."""
+        if self._health_thread is not None or interval <= 0 or len(self.nodes) < 2:
+            return
+        def run():
+            self.check_health()
+            while not self._health_stop.wait(interval):
+                self.check_health()
+        self._health_thread = threading.Thread(target=run, name="ollama-health", daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self):
+        self._health_stop.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "failovers": self.failovers,
+                "nodes": {node.url: node.stats() for node in self.nodes},
+            }
+
+_router: Optional[OllamaRouter] = None
+_router_lock = threading.Lock()
+
+def get_router() -> OllamaRouter:
+    """Gemeinsamen Router abrufen (Knoten aus OLLAMA_ENDPOINTS, sonst OLLAMA_BASE_URL)."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                urls = config.OLLAMA_ENDPOINTS or [config.OLLAMA_BASE_URL]
+                _router = OllamaRouter(urls, config.OLLAMA_EJECT_FAILURES, config.OLLAMA_EJECT_SECONDS)
+                if len(urls) > 1:
+                    logger.info(f"Ollama-Router mit {len(urls)} Knoten: {', '.join(urls)}")
+    return _router
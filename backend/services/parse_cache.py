@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Cache für den extrahierten Text hochgeladener Dokumente.
+Wird dasselbe PDF oder dieselbe Tabelle erneut angehängt, kostet das nur
+den SHA-256 der Datei statt einer vollständigen Extraktion. Der Schlüssel
+enthält neben dem Inhalts-Hash die Parser-Version (siehe file_service).
+Der Text liegt im Arbeitsspeicher (LRU, nach Größe begrenzt) und
+zlib-komprimiert auf der Festplatte.
+"""
+import logging
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class ParseCache:
+    """
+    LRU-Cache für extrahierten Text mit komprimierter Festplatten-Ebene.
+
+    Args:
+        max_chars: Höchstgröße des Texts im Arbeitsspeicher (Zeichen)
+        directory: Verzeichnis der Festplatten-Ebene (None = nur Arbeitsspeicher)
+        max_disk_bytes: Höchstgröße der komprimierten Dateien auf der Festplatte
+    """
+
+    def __init__(self, max_chars: int, directory=None, max_disk_bytes: int = 0):
+        self.max_chars = max_chars
+        self.directory = str(directory) if directory else None
+        self.max_disk_bytes = max_disk_bytes
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+        self._entries = OrderedDict()  # Schlüssel -> Text
+        self._size = 0
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.z")
+
+    def get(self, key: str) -> Optional[str]:
+        """Extrahierten Text abrufen (Arbeitsspeicher, sonst Festplatte)."""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+
+        text = self._read_disk(key)
+        with self._lock:
+            if text is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, text)
+            return text
+
+    def put(self, key: str, text: str):
+        """Extrahierten Text speichern."""
+        with self._lock:
+            self.stores += 1
+            self._remember(key, text)
+        self._write_disk(key, text)
+
+    def _remember(self, key: str, text: str):
+        if len(text) > self.max_chars:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._entries[key] = text
+        self._size += len(text)
+        while self._size > self.max_chars:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                text = zlib.decompress(f.read()).decode("utf-8")
+        except (OSError, zlib.error, UnicodeDecodeError):
+            return None
+        try:
+            # Zugriffszeit für das Aufräumen (älteste zuerst) festhalten
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def _write_disk(self, key: str, text: str):
+        if not self.directory:
+            return
+        try:
+            # Erst vollständig schreiben, dann umbenennen: Leser sehen nie halbe Dateien
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(text.encode("utf-8"), 6))
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Parse-Cache: Schreiben fehlgeschlagen: {e}")
+            return
+        with self._lock:
+            self._disk_writes += 1
+            sweep = self._disk_writes % 50 == 0
+        if sweep:
+            self._sweep_disk()
+
+    def _sweep_disk(self):
+        """Am längsten nicht benutzte Dateien löschen, bis max_disk_bytes eingehalten ist."""
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".z"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """Kennzahlen des Caches."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": config.PARSE_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "chars": self._size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+            }
+
+_cache: Optional[ParseCache] = None
+_cache_lock = threading.Lock()
+
+def get_parse_cache() -> ParseCache:
+    """Gemeinsamen Parse-Cache abrufen (wird beim ersten Aufruf erstellt)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ParseCache(
+                    max_chars=config.PARSE_CACHE_MAX_CHARS,
+                    directory=config.PARSE_CACHE_DIR if config.PARSE_CACHE_DISK else None,
+                    max_disk_bytes=config.PARSE_CACHE_MAX_DISK_BYTES
+                )
+    return _cache
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Prompt-Aufbau für Ollama.
+Ollama verwendet den bereits berechneten Anfang eines Prompts (KV-Cache)
+weiter, solange er sich nicht ändert. Deshalb steht vorne nur, was über
+viele Runden gleich bleibt (System-Prompt, dann der Gesprächsverlauf);
+wechselnde Inhalte wie die Erinnerungen einer Runde kommen erst danach,
+unmittelbar vor die aktuelle Frage.
+"""
+from typing import Dict, List, Optional
+
+MEMORY_INSTRUCTION = (
+    "ANWEISUNG: Diese Informationen sind Teil deines Wissens. Verwende sie natürlich in Gesprächen, "
+    "aber zitiere sie nicht wörtlich. Integriere sie wie eigene Erinnerungen und antworte in deinen eigenen Worten."
+)
+
+def format_memory_block(memories: List[dict]) -> str:
+    """
+    Erinnerungen als Hintergrundwissen für die aktuelle Runde formatieren.
+
+    Returns:
+        str: Textblock oder "" ohne Erinnerungen
+    """
+    memory_texts = [f"• {memory.get('text', '').strip(chr(34))}" for memory in memories]
+    if not memory_texts:
+        return ""
+    memory_context = "\n".join(memory_texts)
+    return f"=== BACKGROUND KNOWLEDGE (Du weißt folgendes) ===\n{memory_context}\n\n{MEMORY_INSTRUCTION}"
+
+def _with_background(prompt: str, background: str) -> str:
+    return f"{background}\n\n=== FRAGE ===\n{prompt}" if background else prompt
+
+def assemble_prompt(
+    prompt: str,
+    system_prompt: str = "",
+    background: str = "",
+    context: Optional[List[Dict[str, str]]] = None,
+    images: Optional[List[str]] = None
+) -> dict:
+    """
+    Prompt-Teil des Ollama-Request-Bodys zusammenstellen.
+
+    Args:
+        prompt: Aktuelle Nachricht des Benutzers
+        system_prompt: Gleichbleibender System-Prompt (stabiler Präfix)
+        background: Wechselnder Kontext dieser Runde (z.B. Erinnerungen)
+        context: Gesprächsverlauf; None für /api/generate, sonst /api/chat
+        images: Base64-Bilder zur aktuellen Nachricht
+
+    Returns:
+        dict: {"prompt", "system", "images"} bzw. {"messages": [...]}
+    """
+    user_content = _with_background(prompt, background)
+
+    if context is None:
+        body = {'prompt': user_content}
+        if system_prompt:
+            body['system'] = system_prompt
+        if images:
+            body['images'] = images
+        return body
+
+    messages = []
+    if system_prompt:
+        messages.append({'role': 'system', 'content': system_prompt})
+    messages.extend(
+        {'role': message['role'], 'content': message['content']}
+        for message in context
+        if message.get('role') in ('user', 'assistant') and message.get('content')
+    )
+    user_message = {'role': 'user', 'content': user_content}
+    if images:
+        user_message['images'] = images
+    messages.append(user_message)
+    return {'messages': messages}
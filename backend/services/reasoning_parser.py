@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+Inkrementeller Reasoning-Parser für Token-Streams.
+Trennt Reasoning und Final Answer, während die Tokens eintreffen.
+"""
+import logging
+import re
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Explizite Reasoning-Marker (öffnend, schließend) - kleingeschrieben
+REASONING_MARKERS = [
+    ("<thinking>", "</thinking>"),
+    ("<reasoning>", "</reasoning>"),
+    ("**reasoning:**", "**answer:**"),
+    ("**thinking:**", "**response:**"),
+]
+
+# Mindestlänge für Reasoning
+MIN_REASONING_LENGTH = 50
+
+# Nur ASCII-Großbuchstaben umwandeln, damit Indizes gleich lang bleiben
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+# Heuristische Pattern in Prüfreihenfolge. Jedes Pattern wird ohne Backtracking
+# über mehrere Startpositionen ausgewertet (siehe _match_heuristic):
+#   ("pair", öffnend, schließend)       -> öffnend (Reasoning) schließend (Answer)
+#   ("lead", anfang, ende, verankert)   -> (anfang ... ) bis vor ende, Rest ist Answer
+#   ("keyword", stichwort, ende)        -> Text bis vor ende nach dem ersten Stichwort
+_HEURISTICS = [
+    ("pair", "<thinking>", "</thinking>"),
+    ("pair", "<reasoning>", "</reasoning>"),
+    ("pair", "**reasoning:**", "**answer:**"),
+    ("pair", "**thinking:**", "**response:**"),
+    ("lead", "let me think", re.compile(r'\n\n|\[|final|answer', re.IGNORECASE), False),
+    ("pair", "reasoning:", "answer:"),
+    # ⭐ PHI-4 Pattern: "To determine..." (erster Absatz als Reasoning)
+    ("lead", "to determine", re.compile(r'\n\n|\d+\.|so the answer|therefore', re.IGNORECASE), True),
+    # ⭐ Step-by-step Pattern
+    ("keyword", re.compile(r'step by step|digit by digit|compare', re.IGNORECASE),
+     re.compile(r'so the answer|therefore|the answer is', re.IGNORECASE)),
+]
+
+def _match_heuristic(heuristic, text: str, lowered: str) -> Optional[Tuple[str, str]]:
+    """
+    Ein heuristisches Pattern in linearer Zeit auswerten.
+
+    Entspricht den früheren Regex-Pattern (z.B. `<thinking>(.*?)</thinking>(.*?)$`):
+    Findet das erste Vorkommen des Anfangs kein Ende, findet es auch kein
+    späteres Vorkommen. Statt alle Startpositionen durchzuprobieren, genügt
+    daher jeweils ein Suchlauf.
+
+    Returns:
+        Optional[Tuple[str, str]]: (Reasoning, Answer) oder None
+    """
+    kind = heuristic[0]
+
+    if kind == "pair":
+        _, open_marker, close_marker = heuristic
+        start = lowered.find(open_marker)
+        if start == -1:
+            return None
+        end = lowered.find(close_marker, start + len(open_marker))
+        if end == -1:
+            return None
+        return text[start + len(open_marker):end], text[end + len(close_marker):]
+
+    if kind == "lead":
+        _, lead, stop_pattern, anchored = heuristic
+        start = 0 if anchored else lowered.find(lead)
+        if start == -1 or not lowered.startswith(lead, start):
+            return None
+        stop = stop_pattern.search(text, start + len(lead))
+        if not stop:
+            return None
+        return text[start:stop.start()], text[stop.start():]
+
+    _, keyword_pattern, stop_pattern = heuristic
+    keyword = keyword_pattern.search(text)
+    if not keyword:
+        return None
+    stop = stop_pattern.search(text, keyword.end())
+    if not stop:
+        return None
+    return text[:stop.start()], text[stop.start():]
+
+def _match_earliest_marker(text: str, lowered: str) -> Optional[Tuple[str, str]]:
+    """
+    Expliziten Reasoning-Block am frühesten öffnenden Marker suchen.
+
+    Dieselbe Regel wie im ReasoningStreamParser: Es zählt der Marker, der
+    im Text zuerst vorkommt, nicht seine Position in REASONING_MARKERS.
+    Text vor dem Marker gehört weder zum Reasoning noch zur Antwort.
+
+    Returns:
+        Optional[Tuple[str, str]]: (Reasoning, Answer) oder None
+    """
+    best_index, best_marker = -1, None
+    for open_marker, close_marker in REASONING_MARKERS:
+        index = lowered.find(open_marker)
+        if index != -1 and (best_index == -1 or index < best_index):
+            best_index, best_marker = index, (open_marker, close_marker)
+    if best_marker is None:
+        return None
+    return _match_heuristic(("pair",) + best_marker, text, lowered)
+
+def _split_valid(match: Optional[Tuple[str, str]]) -> Optional[Tuple[str, str]]:
+    """Gefundene Trennung übernehmen, wenn Reasoning lang genug und Answer nicht leer ist."""
+    if not match:
+        return None
+    reasoning, answer = match[0].strip(), match[1].strip()
+    if reasoning and answer and len(reasoning) > MIN_REASONING_LENGTH:
+        return reasoning, answer
+    return None
+
+def parse_reasoning_text(response_text: str) -> dict:
+    """
+    Vollständige Antwort in Reasoning und Final Answer trennen (lineare Laufzeit).
+
+    Explizite Marker werden wie beim Streaming behandelt (frühester Marker
+    gewinnt), sodass dieselbe Modellantwort mit und ohne "stream" gleich
+    getrennt wird. Erst danach greifen die Heuristiken.
+
+    Args:
+        response_text: Vollständige Modellantwort
+
+    Returns:
+        dict: {"reasoning": str, "answer": str, "has_reasoning": bool}
+    """
+    lowered = response_text.translate(_ASCII_LOWER)
+
+    split = _split_valid(_match_earliest_marker(response_text, lowered))
+    if split:
+        logger.info("Reasoning-LLM Response erkannt (Marker) - Reasoning und Answer getrennt")
+        return {"reasoning": split[0], "answer": split[1], "has_reasoning": True}
+
+    for i, heuristic in enumerate(_HEURISTICS):
+        match = _match_heuristic(heuristic, response_text, lowered)
+        if not match:
+            continue
+
+        reasoning = match[0].strip()
+        answer = match[1].strip()
+
+        if reasoning and answer and len(reasoning) > MIN_REASONING_LENGTH:
+            logger.info(f"Reasoning-LLM Response erkannt (Pattern {i+1}) - Reasoning und Answer getrennt")
+            logger.debug(f"Reasoning: {reasoning[:100]}...")
+            logger.debug(f"Answer: {answer[:100]}...")
+            return {
+                "reasoning": reasoning,
+                "answer": answer,
+                "has_reasoning": True
+            }
+
+    # ⭐ Fallback: Wenn mehr als 300 Zeichen, versuche automatische Trennung
+    if len(response_text) > 300:
+        lines = response_text.split('\n\n')
+        if len(lines) >= 2:
+            # Erste Hälfte als Reasoning, letzte Hälfte als Answer
+            mid_point = len(lines) // 2
+            reasoning = '\n\n'.join(lines[:mid_point])
+            answer = '\n\n'.join(lines[mid_point:])
+
+            if len(reasoning) > 100 and len(answer) > 50:
+                logger.info("Reasoning-LLM Response erkannt (Fallback-Trennung)")
+                return {
+                    "reasoning": reasoning,
+                    "answer": answer,
+                    "has_reasoning": True
+                }
+
+    # Kein Reasoning-Pattern gefunden
+    logger.debug("Kein Reasoning-Pattern erkannt - normale Response")
+    return {
+        "reasoning": "",
+        "answer": response_text,
+        "has_reasoning": False
+    }
+
+# Zustände der State-Machine
+_PREAMBLE = "preamble"
+_REASONING = "reasoning"
+_ANSWER = "answer"
+
+class ReasoningStreamParser:
+    """
+    State-Machine, die einen Token-Stream in Reasoning- und Answer-Kanal aufteilt.
+
+    Jeder Chunk wird nur einmal durchsucht; lediglich ein kurzer Rest, der der
+    Anfang eines Markers sein könnte, wird bis zum nächsten Chunk zurückgehalten.
+    Die Laufzeit ist damit linear in der Länge der Antwort.
+    """
+
+    # Alle Anfänge der öffnenden Marker (für das Zurückhalten am Chunk-Ende)
+    _OPEN_PREFIXES = {marker[:i] for marker, _ in REASONING_MARKERS for i in range(1, len(marker))}
+    _OPEN_MAX_PREFIX = max(len(marker) for marker, _ in REASONING_MARKERS) - 1
+
+    def __init__(self):
+        self._state = _PREAMBLE
+        self._close_marker = None
+        self._close_prefixes = set()
+        self._pending = ""
+        self._chunks = []
+        self._preamble = []
+        self._reasoning = []
+        self._answer = []
+        self._closed = False
+
+    @staticmethod
+    def _holdback_length(lowered: str, prefixes: set, longest: int) -> int:
+        """Länge des Endes von `lowered`, das ein Marker-Anfang sein könnte."""
+        for length in range(min(len(lowered), longest), 0, -1):
+            if lowered[-length:] in prefixes:
+                return length
+        return 0
+
+    def _emit(self, channel: str, text: str, events: List[Tuple[str, str]]):
+        """Text einem Kanal zuordnen und als Event ausgeben."""
+        if not text:
+            return
+        if channel == _REASONING:
+            self._reasoning.append(text)
+        elif self._state == _PREAMBLE:
+            self._preamble.append(text)
+        else:
+            self._answer.append(text)
+        events.append((channel, text))
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """
+        Einen neuen Chunk verarbeiten.
+
+        Args:
+            chunk: Neue Tokens aus dem Stream
+
+        Returns:
+            List[Tuple[str, str]]: (Kanal, Text)-Paare mit Kanal "reasoning" oder "answer"
+        """
+        events = []
+        if not chunk:
+            return events
+
+        self._chunks.append(chunk)
+        buffer = self._pending + chunk
+        self._pending = ""
+
+        while buffer:
+            lowered = buffer.translate(_ASCII_LOWER)
+
+            if self._state == _PREAMBLE:
+                # Frühesten öffnenden Marker suchen
+                best_index, best_marker = -1, None
+                for open_marker, close_marker in REASONING_MARKERS:
+                    index = lowered.find(open_marker)
+                    if index != -1 and (best_index == -1 or index < best_index):
+                        best_index, best_marker = index, (open_marker, close_marker)
+
+                if best_marker:
+                    self._emit(_ANSWER, buffer[:best_index], events)
+                    self._state = _REASONING
+                    self._close_marker = best_marker[1]
+                    self._close_prefixes = {self._close_marker[:i] for i in range(1, len(self._close_marker))}
+                    buffer = buffer[best_index + len(best_marker[0]):]
+                    continue
+
+                holdback = self._holdback_length(lowered, self._OPEN_PREFIXES, self._OPEN_MAX_PREFIX)
+                channel = _ANSWER
+
+            elif self._state == _REASONING:
+                index = lowered.find(self._close_marker)
+                if index != -1:
+                    self._emit(_REASONING, buffer[:index], events)
+                    self._state = _ANSWER
+                    buffer = buffer[index + len(self._close_marker):]
+                    continue
+
+                holdback = self._holdback_length(lowered, self._close_prefixes, len(self._close_marker) - 1)
+                channel = _REASONING
+
+            else:
+                # Nach dem Reasoning gehört alles zur Antwort
+                holdback = 0
+                channel = _ANSWER
+
+            split = len(buffer) - holdback
+            self._emit(channel, buffer[:split], events)
+            self._pending = buffer[split:]
+            break
+
+        return events
+
+    def close(self) -> List[Tuple[str, str]]:
+        """
+        Stream beenden und zurückgehaltenen Rest ausgeben.
+
+        Returns:
+            List[Tuple[str, str]]: Verbleibende (Kanal, Text)-Paare
+        """
+        events = []
+        if not self._closed:
+            channel = _REASONING if self._state == _REASONING else _ANSWER
+            self._emit(channel, self._pending, events)
+            self._pending = ""
+            self._closed = True
+        return events
+
+    def result(self) -> dict:
+        """
+        Endgültige Trennung von Reasoning und Answer.
+
+        Returns:
+            dict: {"reasoning": str, "answer": str, "has_reasoning": bool}
+        """
+        self.close()
+
+        if self._state == _ANSWER:
+            # Wie parse_reasoning_text: Text vor dem Marker gehört nicht zur Antwort
+            split = _split_valid(("".join(self._reasoning), "".join(self._answer)))
+            if split:
+                logger.info("Reasoning-LLM Response erkannt (Stream-Parser) - Reasoning und Answer getrennt")
+                return {"reasoning": split[0], "answer": split[1], "has_reasoning": True}
+
+        # Kein gültiger Marker - Heuristiken auf der vollständigen Antwort
+        return parse_reasoning_text("".join(self._chunks))
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Antwort-Cache für deterministische LLM-Anfragen.
+Bei temperature == 0 liefert Ollama auf denselben Request dieselbe Antwort.
+Der Schlüssel ist ein Hash über den vollständigen Request (Modell, System-
+Prompt, Verlauf, Erinnerungen, Dateiinhalte, Bilder, Optionen); gespeichert
+werden Rohtext und die geparste Reasoning/Answer-Trennung. Der Cache liegt im
+Arbeitsspeicher (LRU) und optional zusätzlich auf der Festplatte; jeder
+Eintrag läuft nach seiner TTL ab.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Felder ohne Einfluss auf den Antworttext
+_IGNORED_FIELDS = ("stream", "keep_alive")
+
+def response_cache_key(request_data: dict) -> str:
+    """
+    Cache-Schlüssel eines Ollama-Requests berechnen.
+
+    Returns:
+        str: SHA-256 (hex) über das kanonische JSON des Requests
+    """
+    payload = {key: value for key, value in request_data.items() if key not in _IGNORED_FIELDS}
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def is_cacheable(request_data: dict) -> bool:
+    """Nur deterministische Anfragen (temperature == 0) und nur wenn aktiviert."""
+    return config.RESPONSE_CACHE_ENABLED and request_data.get('options', {}).get('temperature') == 0
+
+class ResponseCache:
+    """
+    LRU-Cache für LLM-Antworten mit optionaler Festplatten-Ebene.
+
+    Args:
+        max_entries: Höchstzahl Einträge im Arbeitsspeicher
+        ttl: Sekunden, die ein Eintrag gültig bleibt
+        directory: Verzeichnis der Festplatten-Ebene (None = nur Arbeitsspeicher)
+        max_disk_entries: Höchstzahl Dateien auf der Festplatte
+    """
+
+    def __init__(self, max_entries: int, ttl: float, directory=None, max_disk_entries: int = 10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = str(directory) if directory else None
+        self.max_disk_entries = max_disk_entries
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()  # Schlüssel -> Eintrag (mit "expires")
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Eintrag abrufen.
+
+        Returns:
+            dict: {"raw": str, "result": dict, "model": str, "created": float} oder None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry["expires"] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._entries[key]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, entry)
+            return entry
+
+    def put(self, key: str, raw: str, result: dict, model: str):
+        """Antwort speichern (Rohtext und geparstes Ergebnis)."""
+        now = time.time()
+        entry = {"raw": raw, "result": result, "model": model, "created": now, "expires": now + self.ttl}
+        with self._lock:
+            self.stores += 1
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def _remember(self, key: str, entry: dict):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key: str, now: float) -> Optional[dict]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires", 0) <= now:
+            self._remove_file(path)
+            return None
+        return entry
+
+    def _write_disk(self, key: str, entry: dict):
+        if not self.directory:
+            return
+        try:
+            # Erst vollständig schreiben, dann umbenennen: Leser sehen nie halbe Dateien
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Antwort-Cache: Schreiben fehlgeschlagen: {e}")
+            return
+        with self._lock:
+            self._disk_writes += 1
+            sweep = self._disk_writes % 100 == 0
+        if sweep:
+            self._sweep_disk()
+
+    def _remove_file(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _sweep_disk(self):
+        """Abgelaufene Dateien löschen und die Anzahl auf max_disk_entries begrenzen."""
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                # Ablaufzeit = letzte Änderung + TTL (Einträge werden nicht verändert)
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            if mtime + self.ttl <= now:
+                self._remove_file(entry.path)
+            else:
+                files.append((mtime, entry.path))
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.max_disk_entries)]:
+            self._remove_file(path)
+
+    def clear(self):
+        """Alle Einträge verwerfen (Arbeitsspeicher und Festplatte)."""
+        with self._lock:
+            self._entries.clear()
+        if self.directory:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith((".json", ".part")):
+                    self._remove_file(entry.path)
+
+    def stats(self) -> dict:
+        """Kennzahlen des Caches."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": config.RESPONSE_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Gemeinsamen Antwort-Cache abrufen (wird beim ersten Aufruf erstellt)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+                    ttl=config.RESPONSE_CACHE_TTL,
+                    directory=config.RESPONSE_CACHE_DIR if config.RESPONSE_CACHE_DISK else None,
+                    max_disk_entries=config.RESPONSE_CACHE_MAX_DISK_ENTRIES
+                )
+    return _cache
@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+Suchindizes für die Relevanz-Suche (Erinnerungen, Dokument-Abschnitte).
+BM25 über einen invertierten Index und optional Embeddings (Ollama oder ein
+lokaler Hashing-Stub) mit Kosinus-Top-k über NumPy, dazu ein Trigramm-Index
+für Teilstring- und unscharfe Suche. Alle Indizes werden inkrementell
+aufgebaut.
+"""
+import hashlib
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Häufige Wörter ohne Aussagekraft für die Suche
+STOPWORDS = frozenset("""
+der die das den dem des ein eine einer eines einem einen und oder aber ist sind war waren bin bist
+ich du er sie es wir ihr mich dich mir dir uns euch mein meine meiner meinen meinem dein deine
+sein seine was wer wie wo wann warum welche welcher welches hat habe hast haben nicht noch auch
+zu im in am an auf aus bei mit nach von vor für über um so als wenn dass ob nur schon sehr
+the a an and or but is are was were be been i you he she it we they me my your our their
+what who how where when why which has have had not to in on at of for with from by as if so
+do does did this that these those there here
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Text in kleingeschriebene Suchbegriffe zerlegen (ohne Stoppwörter und Einzelzeichen)."""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower())
+            if len(token) > 1 and token not in STOPWORDS]
+
+class BM25Index:
+    """
+    Invertierter Index mit BM25-Bewertung.
+
+    Die Suche betrachtet nur die Posting-Listen der Suchbegriffe (als NumPy-
+    Arrays vektorisiert), der Aufwand hängt also von der Trefferzahl ab, nicht
+    von der Gesamtzahl der Dokumente. Entfernte Dokumente werden nur
+    ausmaskiert; das reicht für einen Index, der fast nur wächst.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}  # Begriff -> (Zeilen, Häufigkeiten)
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}  # zwischengespeicherte NumPy-Fassung
+        self._doc_ids: List[Hashable] = []                           # Zeile -> Dokument-ID
+        self._rows: Dict[Hashable, int] = {}
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        self._alive = np.zeros(1024, dtype=bool)
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _grow(self):
+        capacity = 2 * len(self._lengths)
+        self._lengths = np.concatenate([self._lengths, np.zeros(capacity - len(self._lengths), dtype=np.float32)])
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+
+    def add(self, doc_id: Hashable, text: str):
+        """Dokument hinzufügen (oder ersetzen)."""
+        if doc_id in self._rows:
+            self.remove(doc_id)
+        row = len(self._doc_ids)
+        if row >= len(self._lengths):
+            self._grow()
+
+        tokens = tokenize(text)
+        for term, frequency in Counter(tokens).items():
+            rows, frequencies = self._postings.setdefault(term, ([], []))
+            rows.append(row)
+            frequencies.append(frequency)
+            self._arrays.pop(term, None)
+
+        self._doc_ids.append(doc_id)
+        self._rows[doc_id] = row
+        self._lengths[row] = len(tokens)
+        self._alive[row] = True
+        self._total_length += len(tokens)
+
+    def remove(self, doc_id: Hashable):
+        """Dokument entfernen."""
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return
+        self._alive[row] = False
+        self._total_length -= int(self._lengths[row])
+
+    def _term_arrays(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings.get(term)
+            if postings is None:
+                return None
+            arrays = (np.asarray(postings[0], dtype=np.int64), np.asarray(postings[1], dtype=np.float32))
+            self._arrays[term] = arrays
+        return arrays
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[Hashable, float]]:
+        """
+        Die k relevantesten Dokumente suchen.
+
+        Returns:
+            List[Tuple[doc_id, score]]: Absteigend nach Score
+        """
+        doc_count = len(self._rows)
+        if not doc_count or k <= 0:
+            return []
+        average_length = self._total_length / doc_count or 1.0
+
+        scores = None
+        for term in set(tokenize(query)):
+            arrays = self._term_arrays(term)
+            if arrays is None:
+                continue
+            rows, frequencies = arrays
+            document_frequency = int(np.count_nonzero(self._alive[rows]))
+            if not document_frequency:
+                continue
+            idf = math.log(1 + (doc_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[rows] / average_length)
+            if scores is None:
+                scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+            # Ein Dokument steht höchstens einmal in einer Posting-Liste
+            scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+        if scores is None:
+            return []
+        scores[~self._alive[:len(scores)]] = 0.0
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self._doc_ids[row], float(scores[row])) for row in candidates]
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein-Distanz, abgebrochen sobald sie limit überschreitet (dann limit + 1)."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class SubstringIndex:
+    """
+    Index für Teilstring-, Präfix- und tippfehlertolerante Suche.
+
+    Jedes Wort verweist auf die Dokumente, die es enthalten; über das Vokabular
+    (nicht über alle Dokumente) liegt ein Trigramm-Index. Eine Anfrage sucht
+    also zuerst passende Wörter und sammelt dann deren Dokumente ein, der
+    Aufwand wächst mit dem Vokabular statt mit der Zahl der Dokumente. Die
+    Bewertung der Dokumente läuft vektorisiert über NumPy.
+
+    Bewertung je Suchwort: exaktes Wort 3, Wortanfang 2, Teilstring 1,
+    unscharfer Treffer 0.9 bzw. 0.6 (Distanz 1 bzw. 2). Alle Suchwörter müssen
+    vorkommen; steht die ganze Anfrage wörtlich im Text, gibt es 2 Punkte extra.
+    """
+
+    def __init__(self):
+        self._doc_ids: List[Hashable] = []              # Zeile -> Dokument-ID
+        self._texts: List[Optional[str]] = []           # Zeile -> Text in Kleinbuchstaben
+        self._rows: Dict[Hashable, int] = {}
+        self._word_rows: Dict[str, Set[int]] = {}      # Wort -> Zeilen
+        self._word_arrays: Dict[str, np.ndarray] = {}  # zwischengespeicherte NumPy-Fassung
+        self._gram_words: Dict[str, Set[str]] = {}     # Trigramm -> Wörter
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, doc_id: Hashable, text: str):
+        """Dokument hinzufügen (oder ersetzen)."""
+        if doc_id in self._rows:
+            self.remove(doc_id)
+        row = len(self._doc_ids)
+        lowered = text.lower()
+        self._doc_ids.append(doc_id)
+        self._texts.append(lowered)
+        self._rows[doc_id] = row
+
+        for word in set(_WORD_PATTERN.findall(lowered)):
+            rows = self._word_rows.get(word)
+            if rows is None:
+                rows = self._word_rows[word] = set()
+                # Mit Leerzeichen aufgefüllt, damit auch Wortanfang und -ende Trigramme haben
+                for gram in _trigrams(f" {word} "):
+                    self._gram_words.setdefault(gram, set()).add(word)
+            rows.add(row)
+            self._word_arrays.pop(word, None)
+
+    def remove(self, doc_id: Hashable):
+        """Dokument entfernen."""
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return
+        for word in set(_WORD_PATTERN.findall(self._texts[row])):
+            self._word_rows[word].discard(row)
+            self._word_arrays.pop(word, None)
+        self._texts[row] = None
+
+    def _words_containing(self, token: str) -> List[str]:
+        if len(token) < 3:
+            return [word for word in self._word_rows if token in word]
+        posting_sets = sorted((self._gram_words.get(gram, set()) for gram in _trigrams(token)), key=len)
+        candidates = set(posting_sets[0])
+        for words in posting_sets[1:]:
+            if not candidates:
+                break
+            candidates &= words
+        return [word for word in candidates if token in word]
+
+    def _similar_words(self, token: str) -> List[Tuple[str, int]]:
+        limit = 1 if len(token) <= 5 else 2
+        grams = _trigrams(f" {token} ")
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._gram_words.get(gram, ()))
+        # Jede Änderung zerstört höchstens drei Trigramme
+        needed = max(1, len(grams) - 3 * limit)
+        similar = []
+        for word, shared in counts.items():
+            if shared >= needed and word != token:
+                distance = edit_distance(token, word, limit)
+                if distance <= limit:
+                    similar.append((word, distance))
+        return similar
+
+    def _word_array(self, word: str) -> np.ndarray:
+        rows = self._word_arrays.get(word)
+        if rows is None:
+            rows = np.fromiter(self._word_rows[word], dtype=np.int64, count=len(self._word_rows[word]))
+            self._word_arrays[word] = rows
+        return rows
+
+    def _token_scores(self, token: str, fuzzy: bool) -> np.ndarray:
+        matches = {}
+        for word in self._words_containing(token):
+            matches[word] = 3.0 if word == token else 2.0 if word.startswith(token) else 1.0
+        if fuzzy and len(token) >= 4:
+            for word, distance in self._similar_words(token):
+                matches.setdefault(word, 0.9 if distance == 1 else 0.6)
+
+        levels = defaultdict(list)
+        for word, quality in matches.items():
+            levels[quality].append(self._word_array(word))
+        scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+        # Aufsteigend zuweisen: die beste Wortqualität je Dokument bleibt stehen
+        for quality in sorted(levels):
+            scores[np.concatenate(levels[quality])] = quality
+        return scores
+
+    def search(self, query: str, offset: int = 0, limit: Optional[int] = None,
+               fuzzy: bool = True) -> Tuple[List[Tuple[Hashable, float]], int]:
+        """
+        Dokumente zu einer Anfrage suchen.
+
+        Args:
+            query: Suchtext (ein oder mehrere Wörter, auch Wortteile)
+            offset: Anzahl zu überspringender Treffer
+            limit: Maximale Anzahl Treffer (None = alle)
+            fuzzy: Tippfehler tolerieren
+
+        Returns:
+            Tuple[List[Tuple[doc_id, score]], int]: Trefferseite (absteigend nach
+            Score, bei Gleichstand neueste zuerst) und Gesamtzahl der Treffer
+        """
+        query = query.lower().strip()
+        tokens = list(dict.fromkeys(_WORD_PATTERN.findall(query)))
+        if not tokens:
+            return [], 0
+
+        scores = None
+        for token in tokens:
+            token_scores = self._token_scores(token, fuzzy)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = np.where((scores > 0) & (token_scores > 0), scores + token_scores, 0.0)
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return [], 0
+
+        if len(tokens) > 1:
+            for row in matched.tolist():
+                if query in self._texts[row]:
+                    scores[row] += 2.0
+
+        # Eindeutiger Sortierschlüssel: Score (Vielfache von 0.1), bei Gleichstand das neuere Dokument
+        keys = np.rint(scores[matched] * 10).astype(np.int64) * len(self._doc_ids) + matched
+        offset = max(0, offset)
+        end = len(matched) if limit is None else min(len(matched), offset + max(0, limit))
+        if offset >= end:
+            return [], len(matched)
+        if end < len(matched):
+            keys = keys[np.argpartition(-keys, end - 1)[:end]]
+        keys = np.sort(keys)[::-1][offset:end]
+        page = keys % len(self._doc_ids)
+        return [(self._doc_ids[row], round(float(scores[row]), 2)) for row in page.tolist()], len(matched)
+
+class HashingEmbedder:
+    """
+    Lokaler Embedding-Stub ohne Modell: gehashte Wort- und Wortpaar-Häufigkeiten.
+    Findet lexikalisch ähnliche Texte und dient als Ersatz, wenn kein
+    Embedding-Modell in Ollama verfügbar ist.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _bucket(self, feature: str) -> int:
+        return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=4).digest(), "little") % self.dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                vectors[row, self._bucket(feature)] += 1.0
+        return vectors
+
+class OllamaEmbedder:
+    """Embeddings über Ollamas /api/embed (Texte werden gebündelt angefragt)."""
+
+    def __init__(self, model: str, batch_size: int = 64):
+        self.model = model
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        from services.ollama_router import get_router
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = {"model": self.model, "input": texts[start:start + self.batch_size]}
+            with get_router().request("POST", "/api/embed", model=self.model, json=batch) as response:
+                response.raise_for_status()
+                vectors.extend(response.json()["embeddings"])
+        return np.asarray(vectors, dtype=np.float32)
+
+def create_embedder(kind: str, model: Optional[str] = None):
+    """
+    Embedder anhand der Konfiguration erstellen.
+
+    Args:
+        kind: "ollama", "hash" oder "none"
+        model: Embedding-Modell für Ollama
+    """
+    if kind == "ollama":
+        return OllamaEmbedder(model)
+    if kind == "hash":
+        return HashingEmbedder()
+    return None
+
+class VectorIndex:
+    """Normalisierte Vektoren in einer wachsenden NumPy-Matrix, Suche per Kosinus-Top-k."""
+
+    def __init__(self):
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[Hashable] = []
+        self._rows: Dict[Hashable, int] = {}
+        self._size = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add_many(self, doc_ids: Iterable[Hashable], vectors: np.ndarray):
+        """Vektoren hinzufügen (Kapazität wird bei Bedarf verdoppelt)."""
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        if self._matrix is None:
+            self._matrix = np.zeros((max(1024, len(doc_ids)), vectors.shape[1]), dtype=np.float32)
+        needed = self._size + len(doc_ids)
+        if needed > self._matrix.shape[0]:
+            grown = np.zeros((max(needed, 2 * self._matrix.shape[0]), self._matrix.shape[1]), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+
+        for doc_id, vector in zip(doc_ids, vectors):
+            row = self._rows.get(doc_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._ids.append(doc_id)
+                self._rows[doc_id] = row
+            self._matrix[row] = vector
+
+    def remove(self, doc_id: Hashable):
+        """Vektor entfernen (die Zeile wird genullt und nicht mehr gefunden)."""
+        row = self._rows.pop(doc_id, None)
+        if row is not None:
+            self._matrix[row] = 0.0
+
+    def search(self, vector: np.ndarray, k: int = 10) -> List[Tuple[Hashable, float]]:
+        """Die k ähnlichsten Vektoren (Kosinus) suchen."""
+        if not self._size:
+            return []
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        similarities = self._matrix[:self._size] @ vector
+        k = min(k, self._size)
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(self._ids[row], float(similarities[row])) for row in top
+                if similarities[row] > 0 and self._ids[row] in self._rows]
+
+def combine_scores(*rankings: List[Tuple[Hashable, float]],
+                   weights: Optional[List[float]] = None) -> List[Tuple[Hashable, float]]:
+    """
+    Rankings kombinieren: Scores je Ranking auf [0, 1] normieren und gewichtet addieren.
+
+    Returns:
+        List[Tuple[doc_id, score]]: Absteigend nach kombiniertem Score
+    """
+    weights = weights or [1.0] * len(rankings)
+    combined: Dict[Hashable, float] = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        if not ranking:
+            continue
+        best = max(score for _, score in ranking) or 1.0
+        for doc_id, score in ranking:
+            combined[doc_id] += weight * score / best
+    return sorted(combined.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Serverseitige Chat-Sitzungen.
+Jede Sitzung hält den Gesprächsverlauf als Nachrichtenliste für Ollamas
+/api/chat. Der Verlauf wird gegen ein Token-Budget gekürzt; untätige
+Sitzungen werden verworfen, die Gesamtzahl ist begrenzt (LRU). Dazu gehört
+der Index der in der Sitzung hochgeladenen Dokumente (document_index).
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import config
+from services.token_budget import MESSAGE_OVERHEAD, estimate_tokens
+from services.document_index import DocumentIndex, create_document_index
+
+logger = logging.getLogger(__name__)
+
+# Beim Überschreiten des Budgets auf diesen Anteil kürzen: Der Anfang des
+# Verlaufs bleibt dann über mehrere Runden gleich, sodass Ollama den
+# zwischengespeicherten Prompt-Präfix weiterverwenden kann
+_TRIM_RATIO = 0.5
+
+def _message_tokens(text: str) -> int:
+    """Geschätzte Tokens einer Nachricht im Verlauf (Text plus Rolle)."""
+    return estimate_tokens(text) + MESSAGE_OVERHEAD
+
+class ChatSession:
+    """Gesprächsverlauf einer Sitzung."""
+
+    def __init__(self, session_id: str, token_budget: int, max_messages: int):
+        self.session_id = session_id
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.messages: List[Dict[str, str]] = []
+        self.tokens = 0
+        self.trimmed = 0  # Anzahl bereits verworfener Nachrichten
+        self.last_used = time.monotonic()
+        self.documents: Optional[DocumentIndex] = None  # hochgeladene Dokumente (erst beim ersten angelegt)
+        self._lock = threading.Lock()
+
+    def history(self) -> List[Dict[str, str]]:
+        """Kopie des aktuellen Verlaufs (für die nächste Anfrage)."""
+        with self._lock:
+            return list(self.messages)
+
+    def seed(self, messages: List[Dict[str, str]]):
+        """Leere Sitzung mit einem vom Client gesendeten Verlauf füllen."""
+        with self._lock:
+            if self.messages:
+                return
+            for message in messages:
+                role = message.get('role')
+                content = message.get('content')
+                if role in ('user', 'assistant') and isinstance(content, str) and content:
+                    self.messages.append({'role': role, 'content': content})
+                    self.tokens += _message_tokens(content)
+            self._trim()
+
+    def document_index(self) -> DocumentIndex:
+        """Dokument-Index der Sitzung (wird beim ersten Dokument angelegt)."""
+        with self._lock:
+            if self.documents is None:
+                self.documents = create_document_index()
+            return self.documents
+
+    def add_turn(self, user_message: str, answer: str):
+        """Frage und Antwort einer Runde anhängen."""
+        with self._lock:
+            for role, content in (('user', user_message), ('assistant', answer)):
+                self.messages.append({'role': role, 'content': content})
+                self.tokens += _message_tokens(content)
+            self._trim()
+
+    def _trim(self):
+        if self.tokens <= self.token_budget and len(self.messages) <= self.max_messages:
+            return
+        token_target = int(self.token_budget * _TRIM_RATIO)
+        message_target = int(self.max_messages * _TRIM_RATIO)
+        while self.messages and (self.tokens > token_target or len(self.messages) > message_target):
+            # Die letzte Runde bleibt erhalten, solange sie allein ins Budget passt
+            if len(self.messages) <= 2 and self.tokens <= self.token_budget:
+                break
+            removed = self.messages.pop(0)
+            self.tokens -= _message_tokens(removed['content'])
+            self.trimmed += 1
+        # Der Verlauf soll mit einer Frage beginnen
+        while self.messages and self.messages[0]['role'] != 'user':
+            removed = self.messages.pop(0)
+            self.tokens -= _message_tokens(removed['content'])
+            self.trimmed += 1
+        logger.debug(f"Sitzung {self.session_id} gekürzt: {len(self.messages)} Nachrichten, ~{self.tokens} Tokens")
+
+class SessionStore:
+    """
+    Sitzungen nach ID, begrenzt durch Leerlaufzeit und Höchstzahl.
+
+    Args:
+        idle_timeout: Sekunden ohne Zugriff, nach denen eine Sitzung verfällt
+        max_sessions: Höchstzahl gleichzeitiger Sitzungen (die älteste fliegt raus)
+        token_budget: Token-Budget des Verlaufs je Sitzung
+        max_messages: Höchstzahl Nachrichten je Sitzung
+    """
+
+    def __init__(self, idle_timeout: float, max_sessions: int, token_budget: int, max_messages: int):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.created = 0
+        self.evictions = 0
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str] = None) -> ChatSession:
+        """
+        Sitzung abrufen; unbekannte oder abgelaufene IDs erhalten eine neue Sitzung.
+
+        Returns:
+            ChatSession: Bestehende oder neu angelegte Sitzung
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = ChatSession(uuid.uuid4().hex, self.token_budget, self.max_messages)
+                self._sessions[session.session_id] = session
+                self.created += 1
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = now
+            return session
+
+    def drop(self, session_id: str) -> bool:
+        """Sitzung löschen (z.B. wenn der Benutzer den Chat leert)."""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _evict_idle(self, now: float):
+        # Die Reihenfolge entspricht dem letzten Zugriff: vorne liegen die ältesten
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used < self.idle_timeout:
+                break
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "created": self.created,
+                "evictions": self.evictions,
+                "messages": sum(len(session.messages) for session in self._sessions.values()),
+                "documents": sum(len(session.documents or ()) for session in self._sessions.values()),
+            }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_session_store() -> SessionStore:
+    """Gemeinsamen Sitzungsspeicher abrufen (wird beim ersten Aufruf erstellt)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore(
+                    idle_timeout=config.SESSION_IDLE_TIMEOUT,
+                    max_sessions=config.MAX_SESSIONS,
+                    token_budget=config.SESSION_TOKEN_BUDGET,
+                    max_messages=config.MAX_CONTEXT_MESSAGES
+                )
+    return _store
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Token-Zählung und Prompt-Budget.
+Jede Chat-Anfrage bekommt ein Kontextfenster (num_ctx) je Modell; davon
+bleibt DEFAULT_MAX_TOKENS für die Antwort frei (die Antwort selbst wird
+nicht begrenzt, num_predict wird nicht gesetzt). Der Rest wird auf
+System-Prompt, Nachricht, Erinnerungen, Datei-Abschnitte und Verlauf
+verteilt: Was weniger braucht als seinen fairen Anteil, gibt den Rest an
+die anderen ab (Max-Min-Fairness). Jeder Abschnitt wird dann auf seinen
+Anteil gekürzt bzw. nach Relevanz ausgewählt.
+
+Gezählt wird mit einer Schätzung (ca. 4 Zeichen pro Token) oder, falls das
+Paket "tokenizers" installiert ist und unter TOKENIZER_DIR eine
+tokenizer.json für die Modellfamilie liegt (z.B. "llama3.json",
+"qwen2.5.json" oder "qwen.json"), exakt.
+"""
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Grobe Schätzung für gemischten deutschen/englischen Text
+CHARS_PER_TOKEN = 4
+
+# Zusätzliche Tokens je Nachricht bzw. Listeneintrag (Rolle, Trennzeichen)
+MESSAGE_OVERHEAD = 4
+
+_TRUNCATION_MARKER = "\n... [gekürzt]"
+
+def estimate_tokens(text: str) -> int:
+    """Grobe Token-Schätzung (ca. 4 Zeichen pro Token, aufgerundet)."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def context_window(model_name: str) -> int:
+    """Kontextfenster eines Modells (Eintrag in MODEL_CONTEXT_OVERRIDES, sonst CONTEXT_WINDOW)."""
+    value = config.MODEL_CONTEXT_OVERRIDES.get(model_name)
+    if value is None:
+        value = config.MODEL_CONTEXT_OVERRIDES.get(model_name.split(':')[0], config.CONTEXT_WINDOW)
+    return value
+
+def reserved_output(model_name: str) -> int:
+    """Für die Antwort freigehaltene Tokens, höchstens die Hälfte des Fensters."""
+    return min(config.DEFAULT_MAX_TOKENS, context_window(model_name) // 2)
+
+def model_families(model_name: str) -> List[str]:
+    """Kandidaten für die Tokenizer-Datei: "library/qwen2.5:7b" -> ["qwen2.5", "qwen"]."""
+    base = model_name.split(':')[0].split('/')[-1].lower()
+    prefix = re.match(r"[a-z]+", base)
+    families = [base]
+    if prefix and prefix.group(0) != base:
+        families.append(prefix.group(0))
+    return families
+
+class TokenCounter:
+    """
+    Zählt Tokens für eine Modellfamilie.
+
+    Args:
+        tokenizer: tokenizers.Tokenizer für exakte Zählung (None = Schätzung)
+        family: Name der Modellfamilie (für Logs und den Bericht)
+    """
+
+    def __init__(self, tokenizer=None, family: Optional[str] = None):
+        self.tokenizer = tokenizer
+        self.family = family
+
+    @property
+    def exact(self) -> bool:
+        return self.tokenizer is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            try:
+                return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+            except Exception as e:
+                logger.warning(f"Tokenizer {self.family} fehlgeschlagen, verwende Schätzung: {e}")
+                self.tokenizer = None
+        return estimate_tokens(text)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Text auf höchstens max_tokens kürzen (mit Hinweis am Ende)."""
+        if self.count(text) <= max_tokens:
+            return text
+        limit = max(0, max_tokens - self.count(_TRUNCATION_MARKER))
+        cut = limit * CHARS_PER_TOKEN
+        # Bei exakter Zählung nachschneiden, bis es passt (wenige Runden)
+        while cut > 0 and self.count(text[:cut]) > limit:
+            cut = int(cut * limit / self.count(text[:cut]) * 0.95)
+        return text[:max(0, cut)] + _TRUNCATION_MARKER
+
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+def _load_tokenizer(model_name: str):
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        return None, None
+    for family in model_families(model_name):
+        path = os.path.join(str(config.TOKENIZER_DIR), f"{family}.json")
+        if os.path.exists(path):
+            try:
+                tokenizer = Tokenizer.from_file(path)
+                logger.info(f"Tokenizer für {model_name} geladen: {path}")
+                return tokenizer, family
+            except Exception as e:
+                logger.warning(f"Tokenizer {path} nicht ladbar: {e}")
+    return None, None
+
+def get_token_counter(model_name: str) -> TokenCounter:
+    """Token-Zähler für ein Modell (exakt, falls eine Tokenizer-Datei vorliegt)."""
+    counter = _counters.get(model_name)
+    if counter is None:
+        with _counters_lock:
+            counter = _counters.get(model_name)
+            if counter is None:
+                tokenizer, family = _load_tokenizer(model_name)
+                counter = TokenCounter(tokenizer, family)
+                _counters[model_name] = counter
+    return counter
+
+def allocate(budget: int, demands: Dict[str, int]) -> Dict[str, int]:
+    """
+    Budget fair auf Abschnitte verteilen (Max-Min-Fairness).
+
+    Abschnitte, die weniger als den gleichen Anteil brauchen, bekommen ihren
+    Bedarf; der Rest wird unter den übrigen gleichmäßig aufgeteilt.
+
+    Returns:
+        Dict[str, int]: Zugeteilte Tokens je Abschnitt (nie mehr als der Bedarf)
+    """
+    allocation = {name: 0 for name in demands}
+    pending = {name: demand for name, demand in demands.items() if demand > 0}
+    remaining = max(0, budget)
+    while pending and remaining > 0:
+        share = remaining // len(pending)
+        satisfied = {name: demand for name, demand in pending.items() if demand <= share}
+        if not satisfied:
+            for name in pending:
+                allocation[name] = share
+            break
+        for name, demand in satisfied.items():
+            allocation[name] = demand
+            remaining -= demand
+            del pending[name]
+    return allocation
+
+class PromptBudget:
+    """
+    Token-Budget einer Chat-Anfrage.
+
+    Args:
+        model_name: Modell (bestimmt Kontextfenster und Zähler)
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.counter = get_token_counter(model_name)
+        self.context_window = context_window(model_name)
+        self.reserved_output = reserved_output(model_name)
+        self.remaining = self.context_window - self.reserved_output
+        self.sections: Dict[str, int] = {}
+        self.truncated: List[str] = []
+
+    def count(self, text: str) -> int:
+        return self.counter.count(text)
+
+    def fit_text(self, name: str, text: str, max_tokens: int) -> str:
+        """Festen Abschnitt (System-Prompt, Nachricht) auf max_tokens kürzen und verbuchen."""
+        fitted = self.counter.truncate(text, max(0, max_tokens))
+        if fitted != text:
+            self.truncated.append(name)
+            logger.warning(f"{name} auf {max_tokens} Tokens gekürzt ({self.model_name})")
+        self.spend(name, self.count(fitted))
+        return fitted
+
+    def spend(self, name: str, tokens: int):
+        """Verbrauch eines Abschnitts verbuchen."""
+        self.sections[name] = self.sections.get(name, 0) + tokens
+        self.remaining -= tokens
+
+    def fit_history(self, history: List[Dict[str, str]], max_tokens: int) -> List[Dict[str, str]]:
+        """Die neuesten Nachrichten des Verlaufs, die in max_tokens passen (beginnend mit einer Frage)."""
+        kept = []
+        used = 0
+        for message in reversed(history):
+            cost = self.count(message.get('content', '')) + MESSAGE_OVERHEAD
+            if used + cost > max_tokens:
+                break
+            kept.append(message)
+            used += cost
+        kept.reverse()
+        while kept and kept[0].get('role') != 'user':
+            used -= self.count(kept.pop(0).get('content', '')) + MESSAGE_OVERHEAD
+        if len(kept) < len(history):
+            self.truncated.append("history")
+        self.spend("history", used)
+        return kept
+
+    def report(self) -> dict:
+        """Aufteilung für die Antwort von /api/chat und die Statistik."""
+        used = sum(self.sections.values())
+        return {
+            "model": self.model_name,
+            "context_window": self.context_window,
+            "reserved_output": self.reserved_output,
+            "exact": self.counter.exact,
+            "sections": dict(self.sections),
+            "total": used,
+            "truncated": list(self.truncated),
+        }
+
+# Kennzahlen über alle Anfragen
+_stats = {"requests": 0, "exact": 0, "total_tokens": 0, "max_tokens": 0, "sections": {}, "truncated": {}}
+_stats_lock = threading.Lock()
+
+def record_budget(report: dict):
+    """Aufteilung einer Anfrage in die Statistik übernehmen."""
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["exact"] += report["exact"]
+        _stats["total_tokens"] += report["total"]
+        _stats["max_tokens"] = max(_stats["max_tokens"], report["total"])
+        for name, tokens in report["sections"].items():
+            _stats["sections"][name] = _stats["sections"].get(name, 0) + tokens
+        for name in report["truncated"]:
+            _stats["truncated"][name] = _stats["truncated"].get(name, 0) + 1
+
+def prompt_budget_stats() -> dict:
+    """Durchschnittliche Tokens je Abschnitt und Anzahl Kürzungen."""
+    with _stats_lock:
+        requests = _stats["requests"]
+        return {
+            "requests": requests,
+            "exact": _stats["exact"],
+            "avg_tokens": round(_stats["total_tokens"] / requests) if requests else 0,
+            "max_tokens": _stats["max_tokens"],
+            "avg_sections": {name: round(tokens / requests) for name, tokens in _stats["sections"].items()},
+            "truncated": dict(_stats["truncated"]),
+        }
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Inhaltsadressierter Cache für TTS-Audiodateien.
+Gleicher Text mit gleicher Stimme, Geschwindigkeit, Tonhöhe und Engine liefert
+die bereits erzeugte Datei statt einer neuen Synthese. Der Cache ist nach
+Gesamtgröße und Alter begrenzt (LRU) und räumt alte TTS-Dateien im
+Audio-Verzeichnis auf.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "tts_cache_"
+CACHE_SUFFIXES = (".mp3", ".wav")
+
+# Sonstige erzeugte Audiodateien, die nach Ablauf von max_age gelöscht werden
+_STALE_PREFIXES = ("tts_", "whisper_tts_", "coqui_tts_")
+_STALE_SUFFIXES = (".mp3", ".wav")
+
+# Übrig gebliebene temporäre Dateien abgebrochener Synthesen
+_TEMP_SUFFIX = ".part"
+
+def tts_cache_key(text: str, voice, rate, pitch, engine: str = "edge") -> str:
+    """
+    Cache-Schlüssel für eine Synthese berechnen.
+
+    Returns:
+        str: SHA-256 (hex) über Engine, Stimme, Geschwindigkeit, Tonhöhe und Text
+    """
+    payload = json.dumps([engine, str(voice), str(rate), str(pitch), text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def is_cache_file(filename: str) -> bool:
+    """Gehört die Datei zum TTS-Cache?"""
+    return filename.startswith(CACHE_PREFIX) and filename.endswith(CACHE_SUFFIXES)
+
+class TTSCache:
+    """
+    LRU-Cache über die Audiodateien in einem Verzeichnis.
+
+    Die Dateien selbst sind der Cache-Inhalt; der Index (Größe und letzte
+    Nutzung je Datei) wird beim ersten Zugriff aus dem Verzeichnis aufgebaut.
+    Die letzte Nutzung wird als mtime gespeichert und überlebt so Neustarts.
+    """
+
+    def __init__(self, directory, max_bytes: int, max_age: float, sweep_interval: float):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()  # Dateiname -> [Größe, letzte Nutzung]
+        self._bytes = 0
+        self._last_sweep = None
+        self._lock = threading.Lock()
+
+    def filename_for(self, key: str, extension: str = ".mp3") -> str:
+        """Dateiname eines Cache-Eintrags (.mp3 für Edge-TTS, .wav für lokale Engines)."""
+        return f"{CACHE_PREFIX}{key[:32]}{extension}"
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _remove_file(self, filename: str):
+        try:
+            os.remove(self._path(filename))
+        except OSError:
+            pass
+
+    def _drop(self, filename: str):
+        size, _ = self._entries.pop(filename)
+        self._bytes -= size
+
+    def lookup(self, key: str, extension: str = ".mp3") -> Optional[str]:
+        """
+        Vorhandene Audiodatei zu einem Schlüssel suchen.
+
+        Returns:
+            Optional[str]: Dateiname bei einem Treffer, sonst None
+        """
+        filename = self.filename_for(key, extension)
+        now = time.time()
+        with self._lock:
+            self._maybe_sweep(now)
+            entry = self._entries.get(filename)
+            if entry and now - entry[1] <= self.max_age and os.path.exists(self._path(filename)):
+                entry[1] = now
+                self._entries.move_to_end(filename)
+                self.hits += 1
+            else:
+                if entry:
+                    self._drop(filename)
+                self.misses += 1
+                return None
+
+        try:
+            os.utime(self._path(filename), (now, now))
+        except OSError:
+            pass
+        logger.debug(f"TTS-Cache-Treffer: {filename}")
+        return filename
+
+    def store(self, key: str, extension: str = ".mp3") -> Optional[str]:
+        """
+        Frisch erzeugte Datei (unter filename_for(key, extension)) in den Cache aufnehmen.
+
+        Returns:
+            Optional[str]: Dateiname, oder None wenn die Datei fehlt
+        """
+        filename = self.filename_for(key, extension)
+        try:
+            size = os.path.getsize(self._path(filename))
+        except OSError:
+            return None
+
+        with self._lock:
+            if filename in self._entries:
+                self._drop(filename)
+            self._entries[filename] = [size, time.time()]
+            self._bytes += size
+            self._evict()
+        return filename
+
+    def _evict(self):
+        """Abgelaufene und (bei Überschreitung der Größe) älteste Einträge löschen."""
+        now = time.time()
+        while self._entries:
+            filename, (size, last_used) = next(iter(self._entries.items()))
+            if self._bytes <= self.max_bytes and now - last_used <= self.max_age:
+                break
+            self._drop(filename)
+            self._remove_file(filename)
+            self.evictions += 1
+
+    def _maybe_sweep(self, now: float):
+        if self._last_sweep is None or now - self._last_sweep >= self.sweep_interval:
+            self._sweep(now)
+
+    def _sweep(self, now: float):
+        """
+        Verzeichnis abgleichen: Cache-Dateien indexieren, alte TTS-Dateien
+        (Zeitstempel-Dateien, Job-Segmente) nach max_age löschen.
+        """
+        self._last_sweep = now
+        try:
+            names = os.listdir(self.directory)
+        except OSError as e:
+            logger.warning(f"TTS-Cache: Verzeichnis nicht lesbar: {e}")
+            return
+
+        found = []
+        removed = 0
+        for name in names:
+            if not (name.startswith(_STALE_PREFIXES) and name.endswith(_STALE_SUFFIXES + (_TEMP_SUFFIX,))):
+                continue
+            try:
+                stat = os.stat(self._path(name))
+            except OSError:
+                continue
+
+            if name.endswith(_TEMP_SUFFIX):
+                # Synthesen dauern Sekunden; was länger liegt, ist verwaist
+                if now - stat.st_mtime > self.sweep_interval:
+                    self._remove_file(name)
+                    removed += 1
+            elif is_cache_file(name):
+                if name not in self._entries:
+                    found.append((stat.st_mtime, name, stat.st_size))
+            elif now - stat.st_mtime > self.max_age:
+                self._remove_file(name)
+                removed += 1
+
+        # Bisher unbekannte Cache-Dateien nach letzter Nutzung einsortieren
+        for mtime, name, size in sorted(found):
+            self._entries[name] = [size, mtime]
+            self._bytes += size
+        if found:
+            self._entries = OrderedDict(sorted(self._entries.items(), key=lambda item: item[1][1]))
+
+        self._evict()
+        if found or removed:
+            logger.info(f"TTS-Cache: {len(found)} Dateien indexiert, {removed} alte Dateien gelöscht")
+
+    def stats(self) -> dict:
+        """Kennzahlen des Caches."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_tts_cache() -> TTSCache:
+    """Gemeinsamen TTS-Cache abrufen (wird beim ersten Aufruf erstellt)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTSCache(
+                    config.AUDIO_OUTPUT_DIR,
+                    max_bytes=config.TTS_CACHE_MAX_BYTES,
+                    max_age=config.TTS_CACHE_MAX_AGE,
+                    sweep_interval=config.TTS_CACHE_SWEEP_INTERVAL
+                )
+    return _cache
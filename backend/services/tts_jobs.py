@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+TTS-Jobs: Sprachsynthese als Hintergrundaufgabe, entkoppelt von der Chat-Antwort.
+Ein Job kann Satz für Satz mit Text gefüttert werden, während die LLM-Tokens
+noch eintreffen. Die Satz-Segmente werden parallel (begrenzt) synthetisiert,
+können in Lesereihenfolge gestreamt werden, sobald sie fertig sind, und werden
+am Ende zu einer MP3-Datei zusammengesetzt.
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional
+
+import config
+from services.reasoning_parser import MIN_REASONING_LENGTH
+from services.tts_cache import is_cache_file
+from services.tts_service import (
+    call_soon_background,
+    run_coroutine_background,
+    run_coroutine_sync,
+    text_to_speech_async,
+    atomic_audio_file
+)
+
+logger = logging.getLogger(__name__)
+
+# Satzende: Satzzeichen gefolgt von Leerraum, oder ein Absatz
+_SENTENCE_END = re.compile(r'(?<=[.!?…:;])\s+|\n\s*\n')
+
+# Job-Zustände
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+
+# Zustände eines Segments (siehe TTSJob.wait_segment)
+SEGMENT_READY = "ready"
+SEGMENT_FAILED = "failed"
+SEGMENT_PENDING = "pending"
+SEGMENT_END = "end"
+
+class SentenceBuffer:
+    """Sammelt gestreamten Text und gibt vollständige Sätze zurück."""
+
+    def __init__(self, min_chars: int = 40):
+        self.min_chars = min_chars
+        self._text = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Text anhängen und fertige Sätze entnehmen.
+
+        Kurze Sätze werden zusammengefasst, bis `min_chars` erreicht ist,
+        damit nicht jedes "Ja." eine eigene Synthese auslöst.
+
+        Returns:
+            List[str]: Vollständige Sätze (ggf. leer)
+        """
+        self._text += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._text):
+            candidate = self._text[start:match.start()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self._text = self._text[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """Restlichen Text als letzten Satz zurückgeben."""
+        rest = self._text.strip()
+        self._text = ""
+        return rest or None
+
+def split_sentences(text: str, min_chars: int = 40) -> List[str]:
+    """
+    Text an Satzgrenzen in Segmente für die Sprachsynthese aufteilen.
+
+    Args:
+        text: Vollständiger Text
+        min_chars: Mindestlänge eines Segments
+
+    Returns:
+        List[str]: Segmente in Lesereihenfolge
+    """
+    buffer = SentenceBuffer(min_chars)
+    sentences = buffer.feed(text)
+    rest = buffer.flush()
+    if rest:
+        sentences.append(rest)
+    return sentences
+
+async def _create_queue():
+    """asyncio.Queue auf der TTS-Event-Loop erstellen."""
+    return asyncio.Queue()
+
+class TTSJob:
+    """
+    Ein TTS-Hintergrundjob.
+
+    Sätze werden auf der persistenten TTS-Event-Loop synthetisiert, höchstens
+    config.TTS_MAX_PARALLEL_SEGMENTS gleichzeitig. feed()/finish() und
+    wait_segment() dürfen aus beliebigen Threads aufgerufen werden. Segmente
+    verwenden immer Edge-TTS, da sich nur MP3-Segmente direkt aneinanderhängen
+    und streamen lassen.
+    """
+
+    def __init__(self, voice=None, rate=None, pitch=None):
+        self.job_id = uuid.uuid4().hex
+        self.voice = voice or config.DEFAULT_TTS_VOICE
+        self.rate = rate or config.DEFAULT_TTS_RATE
+        self.pitch = pitch or config.DEFAULT_TTS_PITCH
+        self.status = PENDING
+        self.error = None
+        self.audio_file = None
+        self.created = time.time()
+        self.finished = None
+
+        self._buffer = SentenceBuffer(config.TTS_SEGMENT_MIN_CHARS)
+        self._segment_count = 0
+        self._segment_total = None
+        self._segment_results = {}
+        self._segments_changed = threading.Condition()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._queue = run_coroutine_sync(_create_queue())
+        self._future = run_coroutine_background(self._run())
+
+    def _enqueue(self, item):
+        call_soon_background(self._queue.put_nowait, item)
+
+    def feed(self, text: str):
+        """Gestreamten Text anhängen; fertige Sätze werden sofort synthetisiert."""
+        with self._lock:
+            if self._closed:
+                return
+            for sentence in self._buffer.feed(text):
+                self._enqueue((self._segment_count, sentence))
+                self._segment_count += 1
+
+    def finish(self, text: Optional[str] = None):
+        """
+        Job abschließen.
+
+        Args:
+            text: Optional der restliche (oder vollständige) Text
+        """
+        with self._lock:
+            if self._closed:
+                return
+            sentences = self._buffer.feed(text) if text else []
+            rest = self._buffer.flush()
+            if rest:
+                sentences.append(rest)
+            for sentence in sentences:
+                self._enqueue((self._segment_count, sentence))
+                self._segment_count += 1
+            self._closed = True
+            self._enqueue(None)
+
+        with self._segments_changed:
+            self._segment_total = self._segment_count
+            self._segments_changed.notify_all()
+
+    @property
+    def final_filename(self) -> str:
+        return f"tts_{self.job_id}.mp3"
+
+    @property
+    def segments(self) -> List[str]:
+        """Fertige Segmentdateien in Lesereihenfolge."""
+        with self._segments_changed:
+            results = dict(self._segment_results)
+        return [results[index] for index in sorted(results) if results[index]]
+
+    async def _synthesize_segment(self, semaphore, index: int, sentence: str):
+        """Ein Segment synthetisieren und wartende Leser benachrichtigen."""
+        async with semaphore:
+            self.status = RUNNING
+            # Segmente laufen über den TTS-Cache: wiederkehrende Sätze kosten keine Synthese
+            filename = await text_to_speech_async(sentence, self.voice, self.rate, self.pitch, engine="edge")
+        if not filename:
+            logger.warning(f"TTS-Job {self.job_id}: Segment {index} fehlgeschlagen")
+
+        with self._segments_changed:
+            self._segment_results[index] = filename
+            self._segments_changed.notify_all()
+
+    async def _run(self):
+        """Segmente parallel synthetisieren und am Ende zusammensetzen."""
+        try:
+            semaphore = asyncio.Semaphore(config.TTS_MAX_PARALLEL_SEGMENTS)
+            tasks = []
+            while True:
+                item = await self._queue.get()
+                if item is None:
+                    break
+                tasks.append(asyncio.ensure_future(self._synthesize_segment(semaphore, *item)))
+
+            if tasks:
+                await asyncio.gather(*tasks)
+
+            if not self.segments:
+                self.status = ERROR
+                self.error = "Keine Audiodaten erzeugt"
+                return
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._combine_segments)
+            self.status = DONE
+            logger.info(f"TTS-Job {self.job_id} fertig: {len(self.segments)} Segmente")
+
+        except Exception as e:
+            logger.error(f"Fehler im TTS-Job {self.job_id}: {e}")
+            self.status = ERROR
+            self.error = str(e)
+        finally:
+            self.finished = time.time()
+            with self._segments_changed:
+                self._segments_changed.notify_all()
+
+    def wait_segment(self, index: int, timeout: Optional[float] = None):
+        """
+        Auf ein Segment warten.
+
+        Args:
+            index: Position des Segments in Lesereihenfolge
+            timeout: Maximale Wartezeit in Sekunden (0 = nicht warten)
+
+        Returns:
+            Tuple[str, Optional[str]]: (Zustand, Dateiname) mit Zustand
+                SEGMENT_READY, SEGMENT_FAILED, SEGMENT_END oder SEGMENT_PENDING
+        """
+        def settled():
+            return (index in self._segment_results
+                    or (self._segment_total is not None and index >= self._segment_total)
+                    or self.finished is not None)
+
+        with self._segments_changed:
+            self._segments_changed.wait_for(settled, timeout)
+            if index in self._segment_results:
+                filename = self._segment_results[index]
+                return (SEGMENT_READY, filename) if filename else (SEGMENT_FAILED, None)
+            if settled():
+                return SEGMENT_END, None
+            return SEGMENT_PENDING, None
+
+    def _combine_segments(self):
+        """MP3-Segmente aneinanderhängen (MP3-Frames sind unabhängig)."""
+        with atomic_audio_file(self.final_filename) as temp_path, open(temp_path, 'wb') as output:
+            for filename in self.segments:
+                with open(os.path.join(config.AUDIO_OUTPUT_DIR, filename), 'rb') as segment:
+                    output.write(segment.read())
+        self.audio_file = self.final_filename
+
+    def remove_segments(self):
+        """Segmentdateien löschen, die nicht dem TTS-Cache gehören (die zusammengesetzte Datei bleibt erhalten)."""
+        for filename in self.segments:
+            if is_cache_file(filename):
+                continue
+            try:
+                os.remove(os.path.join(config.AUDIO_OUTPUT_DIR, filename))
+            except OSError:
+                pass
+
+    def to_dict(self) -> dict:
+        """Status des Jobs für die API."""
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "audio_file": self.audio_file,
+            "audio_url": f"/api/tts/{self.job_id}/audio",
+            "stream_url": f"/assets/audio/stream/{self.job_id}",
+            "segments": self.segments,
+            "error": self.error,
+        }
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+def create_tts_job(voice=None, rate=None, pitch=None) -> TTSJob:
+    """
+    Neuen TTS-Job anlegen. Text wird per feed()/finish() übergeben.
+
+    Returns:
+        TTSJob: Der neue Job
+    """
+    job = TTSJob(voice, rate, pitch)
+    with _jobs_lock:
+        _jobs[job.job_id] = job
+        # Älteste abgeschlossene Jobs vergessen; laufende werden übersprungen
+        excess = len(_jobs) - config.TTS_MAX_JOBS
+        for old_id, old in list(_jobs.items()):
+            if excess <= 0:
+                break
+            if old.status in (DONE, ERROR):
+                old.remove_segments()
+                del _jobs[old_id]
+                excess -= 1
+    return job
+
+def submit_tts_job(text: str, voice=None, rate=None, pitch=None) -> TTSJob:
+    """
+    Vollständigen Text als Hintergrundjob synthetisieren.
+
+    Returns:
+        TTSJob: Der gestartete Job
+    """
+    job = create_tts_job(voice, rate, pitch)
+    job.finish(text)
+    return job
+
+def get_tts_job(job_id: str) -> Optional[TTSJob]:
+    """TTS-Job anhand seiner ID abrufen."""
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def _read_chunks(filename: str, chunk_size: int):
+    with open(os.path.join(config.AUDIO_OUTPUT_DIR, filename), 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def iter_job_audio(job: TTSJob, chunk_size: int = 64 * 1024):
+    """
+    Audio eines Jobs in Lesereihenfolge streamen, sobald die Segmente fertig sind.
+
+    Das erste Segment kann abgespielt werden, während die übrigen noch
+    synthetisiert werden (MP3-Segmente lassen sich direkt aneinanderhängen).
+
+    Yields:
+        bytes: MP3-Daten
+    """
+    index = 0
+    while True:
+        state, filename = job.wait_segment(index, timeout=config.TTS_STREAM_TIMEOUT)
+        if state == SEGMENT_READY:
+            yield from _read_chunks(filename, chunk_size)
+        elif state in (SEGMENT_END, SEGMENT_PENDING):
+            if state == SEGMENT_PENDING:
+                logger.warning(f"TTS-Stream {job.job_id}: Timeout bei Segment {index}")
+            break
+        index += 1
+
+async def aiter_job_audio(job: TTSJob, chunk_size: int = 64 * 1024, poll_interval: float = 0.05):
+    """Asynchrone Variante von iter_job_audio (für den ASGI-Server)."""
+    index = 0
+    waited = 0.0
+    while True:
+        state, filename = job.wait_segment(index, timeout=0)
+        if state == SEGMENT_PENDING:
+            if waited >= config.TTS_STREAM_TIMEOUT:
+                logger.warning(f"TTS-Stream {job.job_id}: Timeout bei Segment {index}")
+                break
+            await asyncio.sleep(poll_interval)
+            waited += poll_interval
+            continue
+
+        waited = 0.0
+        if state == SEGMENT_END:
+            break
+        if state == SEGMENT_READY:
+            for chunk in _read_chunks(filename, chunk_size):
+                yield chunk
+        index += 1
+
+class StreamTTSFeeder:
+    """
+    Leitet die Answer-Tokens eines Chat-Streams an einen TTS-Job weiter.
+
+    Live gesprochen wird nur, was der Stream-Parser bereits sicher der
+    Antwort zugeordnet hat: Answer-Tokens nach einem geschlossenen,
+    ausreichend langen Reasoning-Block. Ob eine Antwort ohne Marker noch
+    per Heuristik getrennt wird, steht erst beim "done"-Event fest; dann
+    wird die finale Antwort synthetisiert (Satz für Satz parallel).
+    """
+
+    def __init__(self, job: TTSJob):
+        self.job = job
+        self._reasoning_chars = 0
+        self._fed = False
+
+    def on_event(self, event: dict):
+        """Ein Stream-Event verarbeiten (siehe stream_ollama_with_reasoning)."""
+        event_type = event.get('type')
+        if event_type == 'reasoning':
+            self._reasoning_chars += len(event['content'].strip())
+        elif event_type == 'answer' and self._reasoning_chars > MIN_REASONING_LENGTH:
+            # Answer-Tokens nach dem Reasoning-Block (Text davor kommt als Reasoning-Event nie hierher)
+            self.job.feed(event['content'])
+            self._fed = True
+        elif event_type == 'done':
+            self.job.finish(None if self._fed else event['answer'])
+        elif event_type == 'error':
+            self.job.finish()
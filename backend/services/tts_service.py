@@ -4,32 +4,42 @@ TTS-Service für die Sprachausgabe.
 Unterstützt Edge-TTS und optional Whisper.
 """
 import logging
-import time
 import os
 import asyncio
+import concurrent.futures
+import threading
+import uuid
+from contextlib import contextmanager
 import edge_tts
 from edge_tts import VoicesManager  # VoicesManager-Import hinzugefügt
 import config
+from services.tts_cache import get_tts_cache, tts_cache_key
+from services.local_tts import LOCAL_ENGINES, engine_available, get_local_engine
 
 logger = logging.getLogger(__name__)
 
-# Versuchen Sie, Whisper TTS zu importieren, wenn verfügbar
-try:
-    from whisper_tts import WhisperTTS
-    import torch
-    WHISPER_AVAILABLE = True
-    logger.info("Whisper TTS erfolgreich importiert")
-except ImportError:
-    WHISPER_AVAILABLE = False
+# Persistente Event-Loop für synchrone Aufrufer (statt asyncio.run pro Anfrage)
+_background_loop = None
+_background_loop_lock = threading.Lock()
+
+# Endung halb geschriebener Audiodateien (werden nie ausgeliefert)
+TEMP_SUFFIX = ".part"
+
+# Laufende Synthesen je Cache-Schlüssel (gleicher Text wird nur einmal erzeugt)
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+# Lokale Engines prüfen (Modelle werden erst in den Worker-Prozessen geladen)
+WHISPER_AVAILABLE = engine_available("whisper")
+if WHISPER_AVAILABLE:
+    logger.info("Whisper TTS verfügbar")
+else:
     logger.warning("Whisper TTS nicht verfügbar. Nur Edge-TTS wird verwendet.")
 
-# Versuchen Sie, Coqui TTS zu importieren, wenn verfügbar
-try:
-    from TTS.api import TTS
-    COQUI_TTS_AVAILABLE = True
-    logger.info("Coqui TTS erfolgreich importiert")
-except ImportError:
-    COQUI_TTS_AVAILABLE = False
+COQUI_TTS_AVAILABLE = engine_available("coqui")
+if COQUI_TTS_AVAILABLE:
+    logger.info("Coqui TTS verfügbar")
+else:
     logger.warning("Coqui TTS nicht verfügbar")
 
 # Vollständige Liste aller Edge-TTS-Stimmen
@@ -153,6 +163,72 @@ ALL_EDGE_TTS_VOICES = [
     {"name": "vi-VN-NamMinhNeural", "gender": "Male", "locale": "vi-VN", "display_name": "vi-VN - NamMinh (Male)"}
 ]
 
+def _get_background_loop():
+    """Event-Loop in einem Hintergrund-Thread starten (einmalig) und zurückgeben."""
+    global _background_loop
+    if _background_loop is None:
+        with _background_loop_lock:
+            if _background_loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="tts-event-loop", daemon=True)
+                thread.start()
+                _background_loop = loop
+                logger.info("TTS-Event-Loop gestartet")
+    return _background_loop
+
+def run_coroutine_background(coro):
+    """
+    Coroutine auf der persistenten Event-Loop starten, ohne zu warten.
+    
+    Args:
+        coro: Auszuführende Coroutine
+        
+    Returns:
+        concurrent.futures.Future: Future mit dem Ergebnis der Coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_background_loop())
+
+def call_soon_background(callback, *args):
+    """Callback thread-sicher auf der persistenten Event-Loop einplanen."""
+    _get_background_loop().call_soon_threadsafe(callback, *args)
+
+def run_coroutine_sync(coro):
+    """
+    Coroutine auf der persistenten Event-Loop ausführen und auf das Ergebnis warten.
+    
+    Args:
+        coro: Auszuführende Coroutine
+        
+    Returns:
+        Ergebnis der Coroutine
+    """
+    return run_coroutine_background(coro).result()
+
+def is_temp_audio_file(filename):
+    """Ist die Datei eine noch nicht veröffentlichte (halb geschriebene) Audiodatei?"""
+    return filename.endswith(TEMP_SUFFIX)
+
+@contextmanager
+def atomic_audio_file(filename):
+    """
+    Audiodatei atomar veröffentlichen: in eine temporäre Datei schreiben und
+    erst nach Erfolg umbenennen, damit nie eine halbe Datei ausgeliefert wird.
+    
+    Args:
+        filename (str): Endgültiger Dateiname im Audio-Verzeichnis
+        
+    Yields:
+        str: Pfad der temporären Datei, in die geschrieben werden soll
+    """
+    output_path = os.path.join(config.AUDIO_OUTPUT_DIR, filename)
+    temp_path = f"{output_path}.{uuid.uuid4().hex[:8]}{TEMP_SUFFIX}"
+    try:
+        yield temp_path
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
 async def get_voices_async():
     """
     Verfügbare Edge-TTS-Stimmen asynchron abrufen.
@@ -179,7 +255,7 @@ def get_available_voices():
     logger.debug("Starte get_available_voices...")
     
     try:
-        voices = asyncio.run(get_voices_async())
+        voices = run_coroutine_sync(get_voices_async())
         logger.info(f"Erfolgreich {len(voices)} Stimmen abgerufen")
         return voices
     except Exception as e:
@@ -188,7 +264,7 @@ def get_available_voices():
         logger.error(traceback.format_exc())
         return []
 
-async def edge_tts_async(text, voice, rate, pitch):
+async def edge_tts_async(text, voice, rate, pitch, filename=None):
     """
     Text mit Edge-TTS in Sprache umwandeln (async).
     
@@ -197,14 +273,14 @@ async def edge_tts_async(text, voice, rate, pitch):
         voice (str): Zu verwendende Stimme
         rate (str): Sprechgeschwindigkeit
         pitch (str): Tonhöhe (wird ignoriert, da nicht direkt unterstützt)
+        filename (str, optional): Dateiname der Ausgabe, Standard tts_<uuid>.mp3
         
     Returns:
         str: Dateiname der generierten Audiodatei
     """
     try:
-        timestamp = int(time.time())
-        filename = f"tts_{timestamp}.mp3"
-        output_path = os.path.join(config.AUDIO_OUTPUT_DIR, filename)
+        if filename is None:
+            filename = f"tts_{uuid.uuid4().hex}.mp3"
         
         # Konvertiere die Rate für Edge-TTS
         rate_percent = int((float(rate) - 1.0) * 100)
@@ -215,8 +291,9 @@ async def edge_tts_async(text, voice, rate, pitch):
         # Kommunizieren mit Edge-TTS nur mit Rate (pitch wird nicht direkt unterstützt)
         communicate = edge_tts.Communicate(text=text, voice=voice, rate=rate_value)
         
-        # Speichere die Audiodatei
-        await communicate.save(output_path)
+        # Speichere die Audiodatei (erst nach vollständigem Schreiben sichtbar)
+        with atomic_audio_file(filename) as temp_path:
+            await communicate.save(temp_path)
         logger.info(f"Audio erstellt: {filename}")
         return filename
     
@@ -226,15 +303,59 @@ async def edge_tts_async(text, voice, rate, pitch):
         logger.error(traceback.format_exc())
         return None
 
-def text_to_speech(text, voice=None, rate=None, pitch=None):
+async def local_tts_async(text, voice, engine, filename=None):
     """
-    Text in Sprache umwandeln.
+    Text mit einer lokalen Engine (Whisper, Coqui) in Sprache umwandeln.
+    Die Synthese läuft in einem warmen Worker-Prozess (siehe local_tts).
+    
+    Args:
+        text (str): Umzuwandelnder Text
+        voice (str): Zu verwendende Stimme (falls das Modell sie kennt)
+        engine (str): "whisper" oder "coqui"
+        filename (str, optional): Dateiname der Ausgabe, Standard <engine>_tts_<uuid>.wav
+        
+    Returns:
+        str: Dateiname der generierten WAV-Datei
+    """
+    try:
+        if filename is None:
+            filename = f"{engine}_tts_{uuid.uuid4().hex}.wav"
+        
+        with atomic_audio_file(filename) as temp_path:
+            await asyncio.wrap_future(get_local_engine(engine).submit(text, voice, temp_path))
+        logger.info(f"Audio erstellt ({engine}): {filename}")
+        return filename
+    
+    except Exception as e:
+        logger.error(f"Fehler bei {engine}-TTS: {e}")
+        return None
+
+def _resolve_engine(engine):
+    """Gewünschte Engine prüfen, bei Nichtverfügbarkeit auf Edge-TTS zurückfallen."""
+    engine = engine or config.TTS_ENGINE
+    if engine in LOCAL_ENGINES and engine_available(engine):
+        return engine
+    if engine != "edge":
+        logger.warning(f"TTS-Engine {engine} nicht verfügbar, verwende Edge-TTS")
+    return "edge"
+
+async def _synthesize(text, voice, rate, pitch, engine, filename=None):
+    if engine == "edge":
+        return await edge_tts_async(text, voice, rate, pitch, filename)
+    return await local_tts_async(text, voice, engine, filename)
+
+async def text_to_speech_async(text, voice=None, rate=None, pitch=None, filename=None, engine=None):
+    """
+    Text in Sprache umwandeln (async, für den ASGI-Server und TTS-Jobs).
     
     Args:
         text (str): Umzuwandelnder Text
         voice (str): Zu verwendende Stimme
         rate (str): Sprechgeschwindigkeit
         pitch (str): Tonhöhe
+        filename (str, optional): Dateiname der Ausgabe (ohne Angabe wird der
+            TTS-Cache verwendet)
+        engine (str, optional): "edge", "whisper" oder "coqui", Standard config.TTS_ENGINE
         
     Returns:
         str: Dateiname der generierten Audiodatei
@@ -247,11 +368,56 @@ def text_to_speech(text, voice=None, rate=None, pitch=None):
     if pitch is None:
         pitch = config.DEFAULT_TTS_PITCH
     
+    engine = _resolve_engine(engine)
+    
     # Debug-Ausgabe
-    logger.debug(f"TTS-Anfrage: Text={text[:30]}..., Voice={voice}, Rate={rate}, Pitch={pitch}")
+    logger.debug(f"TTS-Anfrage: Text={text[:30]}..., Voice={voice}, Rate={rate}, Pitch={pitch}, Engine={engine}")
     
-    # Edge-TTS verwenden (Standard)
-    return asyncio.run(edge_tts_async(text, voice, rate, pitch))
+    if filename is not None or not config.TTS_CACHE_ENABLED:
+        return await _synthesize(text, voice, rate, pitch, engine, filename)
+    
+    # Gleicher Text mit gleichen Einstellungen: vorhandene Datei wiederverwenden
+    cache = get_tts_cache()
+    key = tts_cache_key(text, voice, rate, pitch, engine=engine)
+    extension = ".mp3" if engine == "edge" else ".wav"
+    cached = cache.lookup(key, extension)
+    if cached:
+        return cached
+    
+    # Läuft dieselbe Synthese bereits (evtl. auf einer anderen Event-Loop), auf sie warten
+    with _inflight_lock:
+        pending = _inflight.get(key)
+        if pending is None:
+            _inflight[key] = concurrent.futures.Future()
+    if pending is not None:
+        logger.debug(f"TTS-Synthese läuft bereits, warte: {key[:12]}")
+        return await asyncio.wrap_future(pending)
+    
+    filename = None
+    try:
+        filename = await _synthesize(text, voice, rate, pitch, engine, cache.filename_for(key, extension))
+        if filename:
+            cache.store(key, extension)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key).set_result(filename)
+    return filename
+
+def text_to_speech(text, voice=None, rate=None, pitch=None, engine=None):
+    """
+    Text in Sprache umwandeln.
+    
+    Args:
+        text (str): Umzuwandelnder Text
+        voice (str): Zu verwendende Stimme
+        rate (str): Sprechgeschwindigkeit
+        pitch (str): Tonhöhe
+        engine (str, optional): "edge", "whisper" oder "coqui", Standard config.TTS_ENGINE
+        
+    Returns:
+        str: Dateiname der generierten Audiodatei
+    """
+    return run_coroutine_sync(text_to_speech_async(text, voice, rate, pitch, engine=engine))
 
 def whisper_tts(text, voice="en-US-Neural2-F"):
     """
@@ -268,23 +434,5 @@ def whisper_tts(text, voice="en-US-Neural2-F"):
         logger.error("Whisper TTS nicht verfügbar")
         return None
     
-    try:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        model = WhisperTTS.from_pretrained("openai/whisper-large-v2").to(device)
-        
-        # Sprache generieren
-        audio = model.generate_speech(text, voice=voice)
-        
-        # In Datei speichern
-        timestamp = int(time.time())
-        filename = f"whisper_tts_{timestamp}.wav"
-        filepath = os.path.join(config.AUDIO_OUTPUT_DIR, filename)
-        
-        import soundfile as sf
-        sf.write(filepath, audio, 24000)
-        
-        return filename
-    
-    except Exception as e:
-        logger.error(f"Fehler bei Whisper TTS: {e}")
-        return None
+    # Das Modell bleibt im Worker-Prozess geladen statt pro Aufruf neu geladen zu werden
+    return run_coroutine_sync(local_tts_async(text, voice, "whisper"))
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Zwischenspeicher für hochgeladene Dateien.
+Uploads werden blockweise direkt in eine Datei unter UPLOAD_DIR geschrieben
+(nie vollständig im Arbeitsspeicher) und erhalten eine ID, über die
+/api/chat sie referenziert ("file_ids"). Uploads verfallen nach UPLOAD_TTL.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from typing import Iterable, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Blockgröße beim Lesen des Request-Bodys
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+_FILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+class UploadError(Exception):
+    """Upload abgelehnt (status: 400 ohne Dateien, 413 zu groß)."""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+class UploadWriter:
+    """
+    Schreibt einen Upload blockweise in eine temporäre Datei.
+
+    Als Kontextmanager verwendet, wird die Datei verworfen, wenn commit()
+    nicht erreicht wurde (Fehler, Abbruch der Verbindung).
+    """
+
+    def __init__(self, store: "UploadStore", name: str, content_type: str):
+        self.store = store
+        self.name = name
+        self.content_type = content_type
+        self.size = 0
+        # Hash schon beim Hochladen berechnen (für den Parse-Cache, ohne die Datei erneut zu lesen)
+        self._sha256 = hashlib.sha256()
+        fd, self._temp_path = tempfile.mkstemp(dir=store.directory, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+        self._committed = False
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.store.max_bytes:
+            raise UploadError(f"Datei {self.name} ist größer als {self.store.max_bytes // (1024 * 1024)} MB", 413)
+        self._file.write(chunk)
+        self._sha256.update(chunk)
+
+    def commit(self) -> dict:
+        """
+        Upload abschließen.
+
+        Returns:
+            dict: {"file_id", "name", "type", "size", "sha256", "created"}
+        """
+        self._file.close()
+        if self.size == 0:
+            raise UploadError(f"Datei {self.name} ist leer", 400)
+        file_id = uuid.uuid4().hex
+        meta = {"file_id": file_id, "name": self.name, "type": self.content_type,
+                "size": self.size, "sha256": self._sha256.hexdigest(), "created": time.time()}
+        os.replace(self._temp_path, self.store._data_path(file_id))
+        with open(self.store._meta_path(file_id), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self._committed = True
+        self.store._record(self.size)
+        logger.info(f"Upload gespeichert: {self.name} ({self.size} Bytes, {file_id})")
+        return meta
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self._temp_path)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "UploadWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self._committed:
+            self.abort()
+
+class UploadStore:
+    """
+    Hochgeladene Dateien auf der Festplatte (Daten und Metadaten je ID).
+
+    Args:
+        directory: Verzeichnis der Uploads
+        max_bytes: Höchstgröße einer Upload-Anfrage
+        ttl: Sekunden, die ein Upload abrufbar bleibt
+    """
+
+    def __init__(self, directory, max_bytes: int, ttl: float):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.uploads = 0
+        self.bytes = 0
+        self.expired = 0
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _data_path(self, file_id: str) -> str:
+        return os.path.join(self.directory, f"{file_id}.bin")
+
+    def _meta_path(self, file_id: str) -> str:
+        return os.path.join(self.directory, f"{file_id}.json")
+
+    def _record(self, size: int):
+        with self._lock:
+            self.uploads += 1
+            self.bytes += size
+
+    def check_length(self, content_length):
+        """Anfrage vorab ablehnen, wenn Content-Length die Höchstgröße überschreitet (413)."""
+        if content_length and int(content_length) > self.max_bytes:
+            raise UploadError(f"Upload ist größer als {self.max_bytes // (1024 * 1024)} MB", 413)
+
+    def begin(self, name: Optional[str], content_type: Optional[str]) -> UploadWriter:
+        """Neuen Upload beginnen (räumt vorher gelegentlich abgelaufene Uploads auf)."""
+        self._maybe_sweep()
+        return UploadWriter(self, name or "upload", content_type or "application/octet-stream")
+
+    def save(self, name: Optional[str], content_type: Optional[str], chunks: Iterable[bytes]) -> dict:
+        """Upload aus einer Folge von Blöcken speichern (siehe UploadWriter.commit)."""
+        with self.begin(name, content_type) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+            return writer.commit()
+
+    def get(self, file_id: str) -> Optional[dict]:
+        """
+        Upload abrufen.
+
+        Returns:
+            dict: Metadaten plus "path" der Daten, oder None (unbekannt/abgelaufen)
+        """
+        if not isinstance(file_id, str) or not _FILE_ID.match(file_id):
+            return None
+        try:
+            with open(self._meta_path(file_id), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("created", 0) + self.ttl <= time.time():
+            self.delete(file_id)
+            return None
+        return {**meta, "path": self._data_path(file_id)}
+
+    def delete(self, file_id: str):
+        for path in (self._meta_path(file_id), self._data_path(file_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _maybe_sweep(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep < 60:
+                return
+            self._last_sweep = now
+        self.sweep()
+
+    def sweep(self):
+        """Abgelaufene Uploads und liegengebliebene Teil-Dateien löschen."""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.stat().st_mtime > cutoff:
+                    continue
+                os.remove(entry.path)
+            except OSError:
+                continue
+            removed += entry.name.endswith(".bin")
+        if removed:
+            with self._lock:
+                self.expired += removed
+            logger.info(f"{removed} abgelaufene Uploads gelöscht")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"uploads": self.uploads, "bytes": self.bytes, "expired": self.expired}
+
+_store: Optional[UploadStore] = None
+_store_lock = threading.Lock()
+
+def get_upload_store() -> UploadStore:
+    """Gemeinsamen Upload-Speicher abrufen (wird beim ersten Aufruf erstellt)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = UploadStore(config.UPLOAD_DIR, config.UPLOAD_MAX_BYTES, config.UPLOAD_TTL)
+    return _store
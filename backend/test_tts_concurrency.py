@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Stresstest für gleichzeitige TTS-Synthesen.
+
+Server-Modus: feuert viele gleichzeitige /api/chat-Anfragen mit TTS ab und prüft,
+dass jede Antwort eine vollständige, abrufbare Audiodatei liefert.
+    python fake_ollama.py --port 11435 --latency 0.2
+    OLLAMA_BASE_URL=http://127.0.0.1:11435 python app.py
+    python test_tts_concurrency.py --url http://127.0.0.1:5000 -n 100
+
+Direkt-Modus (ohne Server): ruft text_to_speech aus vielen Threads gleichzeitig auf,
+mit verschiedenen und identischen Texten, und prüft Dateinamen und Inhalte.
+    python test_tts_concurrency.py --direct -n 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+import config
+from services.tts_service import TEMP_SUFFIX
+
+def _leftover_temp_files():
+    return [name for name in os.listdir(config.AUDIO_OUTPUT_DIR) if name.endswith(TEMP_SUFFIX)]
+
+async def _chat_with_tts(session, url, index):
+    """Eine Chat-Anfrage mit TTS senden und die Audiodatei herunterladen."""
+    payload = {"message": f"Stresstest Anfrage {index}", "enable_tts": True}
+    async with session.post(f"{url}/api/chat", json=payload) as response:
+        if response.status != 200:
+            return f"Anfrage {index}: HTTP {response.status}"
+        data = await response.json()
+    if data.get("error"):
+        return f"Anfrage {index}: Chat-Fehler {data.get('response')}"
+
+    audio_file = data.get("audio_file")
+    if not audio_file:
+        return f"Anfrage {index}: keine Audiodatei"
+    async with session.get(f"{url}/assets/audio/{audio_file}") as response:
+        body = await response.read()
+        if response.status != 200 or not body:
+            return f"Anfrage {index}: {audio_file} nicht abrufbar (HTTP {response.status}, {len(body)} Bytes)"
+        expected = response.headers.get("Content-Length")
+        if expected is not None and int(expected) != len(body):
+            return f"Anfrage {index}: {audio_file} unvollständig"
+    return None
+
+async def run_server_test(url, total):
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        results = await asyncio.gather(*(_chat_with_tts(session, url, i) for i in range(total)))
+    return [error for error in results if error]
+
+def run_direct_test(total):
+    from services.tts_service import text_to_speech
+
+    # Hälfte verschiedene Texte, Hälfte identisch (Single-Flight über den Cache)
+    texts = [f"Das ist Stresstest-Satz Nummer {i}." for i in range(total // 2)]
+    texts += ["Dieser Satz wird von vielen gleichzeitig angefragt."] * (total - len(texts))
+
+    with ThreadPoolExecutor(max_workers=total) as pool:
+        filenames = list(pool.map(text_to_speech, texts))
+
+    errors = []
+    for text, filename in zip(texts, filenames):
+        if not filename:
+            errors.append(f"Keine Audiodatei für: {text}")
+            continue
+        path = os.path.join(config.AUDIO_OUTPUT_DIR, filename)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            errors.append(f"{filename} fehlt oder ist leer")
+
+    by_text = dict(zip(texts, filenames))
+    if len(set(by_text.values())) != len(by_text):
+        errors.append("Verschiedene Texte haben sich eine Audiodatei geteilt")
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="Server-URL")
+    parser.add_argument("-n", "--requests", type=int, default=50, help="Anzahl gleichzeitiger Anfragen")
+    parser.add_argument("--direct", action="store_true", help="text_to_speech direkt aufrufen statt über den Server")
+    args = parser.parse_args()
+
+    if args.direct:
+        errors = run_direct_test(args.requests)
+    else:
+        errors = asyncio.run(run_server_test(args.url, args.requests))
+
+    # Im Server-Modus nur aussagekräftig, wenn der Server auf dieses Verzeichnis schreibt
+    errors += [f"Temporäre Datei übrig: {name}" for name in _leftover_temp_files()]
+
+    for error in errors:
+        print(f"❌ {error}")
+    if errors:
+        print(f"{len(errors)} Fehler bei {args.requests} gleichzeitigen Anfragen")
+        sys.exit(1)
+    print(f"✅ {args.requests} gleichzeitige TTS-Anfragen ohne Fehler")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""
+Gemeinsame Einstellungen für die pytest-Tests des Backends.
+Die Services importieren `config` und `services.*` als Top-Level-Module,
+daher muss das backend-Verzeichnis im Suchpfad liegen.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Verdrängung im Antwort-Cache, im TTS-Cache und bei TTS-Jobs."""
+import os
+import time
+
+import config
+from services import tts_jobs
+from services.response_cache import ResponseCache
+from services.tts_cache import TTSCache
+
+def test_response_cache_lru():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.put("a", "A", {"answer": "A"}, "m")
+    cache.put("b", "B", {"answer": "B"}, "m")
+    assert cache.get("a")["raw"] == "A"
+    cache.put("c", "C", {"answer": "C"}, "m")
+    # "b" war am längsten unbenutzt
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_response_cache_ttl():
+    cache = ResponseCache(max_entries=2, ttl=0.01)
+    cache.put("a", "A", {"answer": "A"}, "m")
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+def test_response_cache_disk_tier(tmp_path):
+    cache = ResponseCache(max_entries=1, ttl=60, directory=tmp_path)
+    cache.put("a", "A", {"answer": "A"}, "m")
+    cache.put("b", "B", {"answer": "B"}, "m")
+    # Aus dem Arbeitsspeicher verdrängt, aber noch auf der Festplatte
+    assert cache.get("a")["raw"] == "A"
+    assert cache.stats()["disk_hits"] == 1
+
+def _write(cache: TTSCache, key: str, size: int) -> str:
+    with open(os.path.join(cache.directory, cache.filename_for(key)), "wb") as f:
+        f.write(b"\0" * size)
+    return cache.store(key)
+
+def test_tts_cache_evicts_least_recently_used(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=250, max_age=3600, sweep_interval=3600)
+    first = _write(cache, "a" * 32, 100)
+    second = _write(cache, "b" * 32, 100)
+    assert cache.lookup("a" * 32) == first
+    third = _write(cache, "c" * 32, 100)
+    assert not os.path.exists(tmp_path / second)
+    assert os.path.exists(tmp_path / first) and os.path.exists(tmp_path / third)
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] == 200
+
+def test_tts_jobs_forget_oldest_finished(monkeypatch):
+    monkeypatch.setattr(config, "TTS_MAX_JOBS", 2)
+    jobs = []
+    for _ in range(2):
+        job = tts_jobs.create_tts_job()
+        job.finish()
+        jobs.append(job)
+    running = tts_jobs.create_tts_job()
+    deadline = time.monotonic() + 5
+    while any(job.status not in (tts_jobs.DONE, tts_jobs.ERROR) for job in jobs) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    newest = tts_jobs.create_tts_job()
+    # Abgeschlossene Jobs werden vergessen, der laufende bleibt
+    assert tts_jobs.get_tts_job(jobs[0].job_id) is None
+    assert tts_jobs.get_tts_job(running.job_id) is running
+    assert tts_jobs.get_tts_job(newest.job_id) is newest
+    running.finish()
+    newest.finish()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""LLMScheduler: Zulassung (429), Wartezeit (503) und Reihenfolge nach Priorität."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.llm_scheduler import AdmissionError, LLMScheduler
+
+def test_full_queue_is_rejected():
+    scheduler = LLMScheduler(concurrency=1, max_queue=1, timeout=5)
+    active = scheduler.enqueue("m")
+    waiting = scheduler.enqueue("m")
+    with pytest.raises(AdmissionError) as error:
+        scheduler.enqueue("m")
+    assert error.value.status == 429
+    assert scheduler.stats()["m"]["rejected"] == 1
+    waiting.release()
+    active.release()
+
+def test_wait_timeout_returns_503():
+    scheduler = LLMScheduler(concurrency=1, max_queue=5, timeout=0.1)
+    with scheduler.slot("m"):
+        with pytest.raises(AdmissionError) as error:
+            with scheduler.slot("m"):
+                pass
+    assert error.value.status == 503
+    stats = scheduler.stats()["m"]
+    assert stats["timed_out"] == 1
+    assert stats["active"] == 0 and stats["queued"] == 0
+
+def test_granted_ticket_does_not_expire():
+    scheduler = LLMScheduler(concurrency=1, max_queue=5, timeout=0.05)
+    active = scheduler.enqueue("m")
+    waiting = scheduler.enqueue("m")
+    time.sleep(0.1)
+    # Platz wird nach Ablauf der Frist, aber vor der Prüfung frei
+    active.release()
+    waiting.check_deadline()
+    assert waiting.granted
+    assert scheduler.stats()["m"]["timed_out"] == 0
+    waiting.release()
+
+def test_priority_order():
+    scheduler = LLMScheduler(concurrency=1, max_queue=10, timeout=5)
+    order = []
+    blocker = scheduler.enqueue("m")
+
+    def run(priority):
+        with scheduler.slot("m", priority):
+            order.append(priority)
+
+    threads = []
+    for priority in ("low", "normal", "high"):
+        thread = threading.Thread(target=run, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        # Warten, bis die Anfrage eingereiht ist (Reihenfolge der Ankunft festlegen)
+        while scheduler.stats()["m"]["queued"] < len(threads):
+            time.sleep(0.001)
+    blocker.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["high", "normal", "low"]
+
+def test_models_are_independent():
+    scheduler = LLMScheduler(concurrency=1, max_queue=0, timeout=5)
+    first = scheduler.enqueue("a")
+    second = scheduler.enqueue("b")
+    assert first.granted and second.granted
+    first.release()
+    second.release()
+
+def test_async_waiter_registered_once():
+    scheduler = LLMScheduler(concurrency=1, max_queue=5, timeout=5)
+
+    async def main():
+        active = scheduler.enqueue("m")
+        waiting = scheduler.enqueue("m")
+        for _ in range(3):
+            assert not await waiting.wait_async(0.01)
+        assert len(waiting._waiters) == 1
+        active.release()
+        assert await waiting.wait_async(1)
+        waiting.release()
+
+    asyncio.run(main())
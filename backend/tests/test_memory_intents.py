@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""Memory-Befehle: nur ausdrückliche Befehle werden ohne LLM beantwortet."""
+import pytest
+
+from services.memory_manager import RECALL, SAVE, MemoryManager
+
+@pytest.mark.parametrize("message, expected", [
+    ("/remember Der Server läuft auf Port 8080", (SAVE, "Der Server läuft auf Port 8080")),
+    ("Merke dir, dass mein Hund Bello heißt", (SAVE, "dass mein Hund Bello heißt")),
+    ("Remember: I prefer dark mode", (SAVE, "I prefer dark mode")),
+    ("/recall Bello", (RECALL, "Bello")),
+    ("/memories", (RECALL, None)),
+])
+def test_commands(message, expected):
+    assert MemoryManager().match_intent(message) == expected
+
+@pytest.mark.parametrize("message", [
+    "Note that I use Python 3.8, how do I parse JSON?",
+    "Keep in mind I am vegan, suggest a recipe",
+    "Remember that the meeting moved, what is the new agenda",
+    "Merke dir, dass ich Python nutze. Wie installiere ich numpy?",
+    "Wie speichere ich eine Datei mit pandas als CSV?",
+])
+def test_questions_reach_the_llm(message):
+    assert MemoryManager().match_intent(message) == (None, None)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""OllamaRouter: Ausweichen auf andere Knoten bei Verbindungsfehlern und 503."""
+import socket
+
+import pytest
+import requests
+
+import fake_ollama
+from services.ollama_router import OllamaRouter
+
+REQUEST = {"model": "llama2", "prompt": "Hallo", "stream": False}
+
+@pytest.fixture(scope="module")
+def healthy():
+    return fake_ollama.start_in_thread(latency=0.0, tokens=5, token_delay=0.0)[0]
+
+@pytest.fixture(scope="module")
+def failing():
+    return fake_ollama.start_in_thread(latency=0.0, tokens=5, token_delay=0.0, fail_rate=1.0)[0]
+
+def _dead_url() -> str:
+    """URL eines Ports, auf dem niemand lauscht."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+def _generate(router: OllamaRouter) -> int:
+    with router.request("POST", "/api/generate", model="llama2", json=REQUEST) as response:
+        return response.status_code
+
+def test_connect_error_fails_over(healthy):
+    router = OllamaRouter([_dead_url(), healthy.url], max_failures=1, eject_seconds=60)
+    statuses = [_generate(router) for _ in range(3)]
+    assert statuses == [200, 200, 200]
+    # Nach dem ersten Fehler ist der tote Knoten ausgeschlossen
+    assert router.failovers <= 1
+    assert router.nodes[0].errors <= 1
+
+def test_unavailable_node_fails_over(healthy, failing):
+    router = OllamaRouter([failing.url, healthy.url], max_failures=3, eject_seconds=60)
+    handled = healthy.handled
+    for _ in range(4):
+        assert _generate(router) == 200
+    assert healthy.handled - handled == 4
+    assert router.failovers >= 1
+
+def test_last_node_error_is_raised():
+    router = OllamaRouter([_dead_url()], max_failures=1, eject_seconds=60)
+    with pytest.raises(requests.ConnectionError):
+        _generate(router)
+    assert router.failovers == 0
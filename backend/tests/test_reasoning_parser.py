@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Reasoning-Trennung: Stream-Parser und Volltext-Parser müssen übereinstimmen."""
+import pytest
+
+from services.reasoning_parser import ReasoningStreamParser, parse_reasoning_text
+
+LONG = "Ich prüfe die Frage Schritt für Schritt und vergleiche alle Möglichkeiten sorgfältig."
+
+SAMPLES = [
+    f"<thinking>{LONG}</thinking>Die Antwort ist 42.",
+    f"Vorrede <reasoning>{LONG}</reasoning>\n\nAntwort.",
+    f"**Reasoning:** {LONG}\n\n**Answer:** 42",
+    # Gemischte Marker: der früheste öffnende Marker entscheidet
+    f"**Reasoning:** {LONG} <thinking>{LONG}</thinking> mitte **Answer:** final",
+    f"<thinking>{LONG}</thinking> antwort **Reasoning:** kurz **Answer:** b",
+    f"<reasoning>kurz</reasoning> a <thinking>{LONG}</thinking> b",
+    # Nicht geschlossener Marker, zu kurzes Reasoning, keine Marker
+    f"<thinking>{LONG}",
+    "<thinking>kurz</thinking>Antwort",
+    "Eine ganz normale Antwort ohne Reasoning.",
+    f"Let me think about it. {LONG}\n\nFinal answer: 42",
+]
+
+def _stream(text, chunk_size):
+    parser = ReasoningStreamParser()
+    for start in range(0, len(text), chunk_size):
+        parser.feed(text[start:start + chunk_size])
+    return parser.result()
+
+@pytest.mark.parametrize("text", SAMPLES)
+@pytest.mark.parametrize("chunk_size", [1, 3, 16, 10000])
+def test_stream_matches_full_text(text, chunk_size):
+    assert _stream(text, chunk_size) == parse_reasoning_text(text)
+
+def test_mixed_markers_use_earliest_marker():
+    result = parse_reasoning_text(f"**Reasoning:** {LONG} <thinking>x</thinking> mitte **Answer:** final")
+    assert result["has_reasoning"]
+    assert result["answer"] == "final"
+    assert result["reasoning"].endswith("mitte")
+
+def test_stream_events_keep_marker_split_across_chunks():
+    parser = ReasoningStreamParser()
+    events = []
+    for chunk in ["<thin", "king>", LONG, "</thi", "nking>", "Antwort"]:
+        events.extend(parser.feed(chunk))
+    events.extend(parser.close())
+    assert "".join(text for channel, text in events if channel == "reasoning") == LONG
+    assert "".join(text for channel, text in events if channel == "answer") == "Antwort"
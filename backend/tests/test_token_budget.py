@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Token-Budget: faire Aufteilung und Kürzung der Prompt-Teile."""
+import config
+from services.token_budget import MESSAGE_OVERHEAD, PromptBudget, allocate
+
+def test_allocate_small_demands_are_met():
+    assert allocate(1000, {"memories": 100, "files": 5000, "history": 2000}) == \
+        {"memories": 100, "files": 450, "history": 450}
+
+def test_allocate_everything_fits():
+    demands = {"memories": 10, "files": 20, "history": 0}
+    assert allocate(1000, demands) == demands
+
+def test_allocate_never_exceeds_budget():
+    shares = allocate(99, {"a": 1000, "b": 1000, "c": 1000})
+    assert sum(shares.values()) <= 99
+    assert allocate(0, {"a": 10}) == {"a": 0}
+
+def _budget(monkeypatch, window=1000, output=200) -> PromptBudget:
+    monkeypatch.setattr(config, "CONTEXT_WINDOW", window)
+    monkeypatch.setattr(config, "MODEL_CONTEXT_OVERRIDES", {})
+    monkeypatch.setattr(config, "DEFAULT_MAX_TOKENS", output)
+    return PromptBudget("kein-tokenizer-modell")
+
+def test_prompt_budget_reserves_output(monkeypatch):
+    budget = _budget(monkeypatch)
+    assert budget.remaining == 800
+    assert _budget(monkeypatch, window=1000, output=900).remaining == 500
+
+def test_fit_text_truncates_and_spends(monkeypatch):
+    budget = _budget(monkeypatch)
+    text = budget.fit_text("message", "x" * 4000, 100)
+    assert budget.count(text) <= 100
+    report = budget.report()
+    assert report["truncated"] == ["message"]
+    assert report["sections"]["message"] == budget.count(text)
+    assert budget.remaining == 800 - budget.count(text)
+
+def test_fit_history_keeps_newest_turns(monkeypatch):
+    budget = _budget(monkeypatch)
+    history = []
+    for turn in range(5):
+        history.append({"role": "user", "content": f"Frage {turn} " + "a" * 36})
+        history.append({"role": "assistant", "content": f"Antwort {turn} " + "b" * 36})
+    per_message = budget.count(history[0]["content"]) + MESSAGE_OVERHEAD
+    kept = budget.fit_history(history, per_message * 5)
+    # Fünf Nachrichten passen, aber der Verlauf beginnt mit einer Frage
+    assert kept == history[-4:]
+    assert kept[0]["role"] == "user"
+    assert "history" in budget.truncated
+    assert budget.sections["history"] <= per_message * 5
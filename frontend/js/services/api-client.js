@@ -10,6 +10,8 @@ class ApiClient {
     this.MODELS_ENDPOINT = "/api/models";
     this.VOICES_ENDPOINT = "/api/voices";
     this.CHAT_ENDPOINT = "/api/chat";
+    this.SESSIONS_ENDPOINT = "/api/sessions";
+    this.UPLOAD_ENDPOINT = "/api/upload";
     this.MEMORY_ENDPOINT = "/api/memory";
     this.MEMORIES_ENDPOINT = "/api/memories";
   }
@@ -80,10 +82,50 @@ class ApiClient {
     }
   }
 
+  /**
+   * Datei hochladen (der Browser streamt sie als Body, ohne Base64).
+   * @param {File} file - Die hochzuladende Datei
+   * @returns {Promise<Object>} - {file_id, name, type, size}
+   */
+  async uploadFile(file) {
+    try {
+      const response = await fetch(`${this.UPLOAD_ENDPOINT}?name=${encodeURIComponent(file.name)}`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': file.type || 'application/octet-stream',
+        },
+        body: file
+      });
+      
+      const data = await this.handleResponse(response);
+      return data.files[0];
+    } catch (error) {
+      console.error('Fehler beim Hochladen der Datei:', error);
+      throw error;
+    }
+  }
+
   /**
    * ⭐ NEUE Memory-Funktionen
    */
 
+  /**
+   * Sitzung auf dem Server verwerfen (Verlauf und Dokumente).
+   * @param {string} sessionId - Die ID der Sitzung
+   * @returns {Promise<Object>} - {deleted: boolean}
+   */
+  async deleteSession(sessionId) {
+    try {
+      const response = await fetch(`${this.SESSIONS_ENDPOINT}/${encodeURIComponent(sessionId)}`, {
+        method: 'DELETE'
+      });
+      return await this.handleResponse(response);
+    } catch (error) {
+      console.error('Fehler beim Löschen der Sitzung:', error);
+      throw error;
+    }
+  }
+
   /**
    * Erinnerungen vom Server abrufen.
    * @returns {Promise<Array>} - Liste der Erinnerungen
@@ -126,15 +168,13 @@ class ApiClient {
    * @returns {boolean} - True wenn Memory-Befehl
    */
   isMemoryCommand(message) {
+    // Entspricht den Befehlen des Servers (memory_manager.INTENT_PATTERN): nur am Anfang
     const memoryKeywords = [
-      '/remember', '/merken', '/recall', '/memory', '/memories',
-      'merke dir', 'erinnere dich', 'remember this', 'save this',
-      'was weißt du noch', 'what do you remember', 'vergiss nicht'
+      '/remember', '/merken', '/save', '/recall', '/memory', '/memories', '/erinnerungen',
+      'merke dir', 'merk dir', 'notiere dir', 'das ist wichtig:', 'wichtig zu wissen:', 'remember:'
     ];
     
-    const lowerMessage = message.toLowerCase();
-    return memoryKeywords.some(keyword => 
-      lowerMessage.includes(keyword.toLowerCase())
-    );
+    const lowerMessage = message.trim().toLowerCase().replace(/^(bitte|please)\s+/, '');
+    return memoryKeywords.some(keyword => lowerMessage.startsWith(keyword));
   }
 }
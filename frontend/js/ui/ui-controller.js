@@ -555,8 +555,7 @@ class UIController {
             <li><code>/remember [text]</code> - Save information</li>
             <li><code>Merke dir: [text]</code> - Speichere Info (DE)</li>
             <li><code>Remember: [text]</code> - Save info (EN)</li>
-            <li><code>Was weißt du noch?</code> - Recall memories (DE)</li>
-            <li><code>What do you remember?</code> - Recall memories (EN)</li>
+            <li><code>/memories [term]</code> - Recall memories</li>
           </ul>
         </div>
       `;
@@ -1205,14 +1204,14 @@ async analyzeFiles() {
   }
   
   try {
-    // Dateien für Upload vorbereiten
-    const fileData = await this.prepareFilesForUpload();
+    // Dateien hochladen
+    const fileIds = await this.prepareFilesForUpload();
     
     // Nachricht mit Dateien senden
     const message = `Please analyze the uploaded files and provide insights about their content, structure, and any important information.`;
     
     // Temporär die normale sendMessage verwenden, aber mit Files
-    await this.sendMessageWithFiles(message, fileData);
+    await this.sendMessageWithFiles(message, fileIds);
     
   } catch (error) {
     console.error('Error analyzing files:', error);
@@ -1221,32 +1220,17 @@ async analyzeFiles() {
 }
 
 /**
- * Dateien für Upload vorbereiten.
+ * Dateien hochladen; der Chat referenziert sie danach über ihre IDs.
  */
 async prepareFilesForUpload() {
-  const filePromises = this.selectedFiles.map(file => {
-    return new Promise((resolve, reject) => {
-      const reader = new FileReader();
-      reader.onload = (e) => {
-        resolve({
-          name: file.name,
-          type: file.type,
-          size: file.size,
-          data: e.target.result.split(',')[1] // Base64 ohne "data:..." Teil
-        });
-      };
-      reader.onerror = reject;
-      reader.readAsDataURL(file);
-    });
-  });
-  
-  return Promise.all(filePromises);
+  const uploads = await Promise.all(this.selectedFiles.map(file => this.api.uploadFile(file)));
+  return uploads.map(upload => upload.file_id);
 }
 
 /**
  * Nachricht mit Dateien senden.
  */
-async sendMessageWithFiles(message, fileData) {
+async sendMessageWithFiles(message, fileIds) {
   this.isProcessing = true;
   this.userInput.placeholder = 'Analyzing files...';
   this.sendBtn.disabled = true;
@@ -1279,7 +1263,7 @@ async sendMessageWithFiles(message, fileData) {
       rate,
       pitch,
       context,
-      files: fileData // ⭐ Dateien hinzufügen
+      file_ids: fileIds // ⭐ Hochgeladene Dateien referenzieren
     });
    
    